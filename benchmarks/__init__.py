@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""
+Stand-alone benchmarks, run from the project root, e.g.
+
+    python -m benchmarks.call_record_log
+"""
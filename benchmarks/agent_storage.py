@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Round trips and latency per dialer event for each agent storage backend.
+
+Without --url the Redis backend talks to the in-process stand in from the tests, pass a real server with
+--url redis://localhost:6379/0
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import power_dialer.power_dialer
+from power_dialer.agent_storage.agent_storage import create_agent_storage_backend
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import PowerDialer
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--agents', '-n', type=int, default=200, help='number of agents')
+    parser.add_argument('--url', '-u', default=None, help='Redis URL, default is an in-process stand in')
+    return parser.parse_args()
+
+
+def run_agents(agents: int) -> int:
+    events = 0
+    for i in range(agents):
+        agent_id = f'agent_{i:04d}'
+        PowerDialer(agent_id).on_agent_login()
+        number = '(212) 555-%04d' % i
+        PowerDialer(agent_id).on_call_started(number)
+        PowerDialer(agent_id).on_call_ended(number)
+        PowerDialer(agent_id).on_agent_logout()
+        events += 4
+    return events
+
+
+def bench(name, backend, agents, round_trips=None):
+    power_dialer.power_dialer.AgentStorage = backend
+    started = time.perf_counter()
+    events = run_agents(agents)
+    elapsed = time.perf_counter() - started
+    trips = f'{round_trips() / events:5.2f}' if round_trips else '    -'
+    print(f'{name:10s} {events:8d} events  {elapsed * 1e6 / events:8.1f} us/event  {trips} round trips/event')
+
+
+def main():
+    options = get_command_line_arguments()
+    NumberManager(synchronous=True)
+    server = None
+    url = options.url
+    if url is None:
+        from test.redis_stand_in import RedisStandIn
+        server = RedisStandIn()
+        url = server.url
+    try:
+        bench('memory', create_agent_storage_backend('memory://'), options.agents)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'agents.map')
+            mapped = create_agent_storage_backend('mmap://' + path)
+            bench('mmap', mapped, options.agents)
+            mapped.close()
+            started = time.perf_counter()
+            mapped = create_agent_storage_backend('mmap://' + path)
+            print(f'{"":10s} reopened {len(mapped)} agents in {(time.perf_counter() - started) * 1e3:.2f} ms')
+            mapped.close()
+        redis = create_agent_storage_backend(url)
+        bench('redis', redis, options.agents, lambda: redis.pool.round_trips)
+        redis.flush()
+        redis.pool.close()
+    finally:
+        if server is not None:
+            server.stop()
+        CallMetrics.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Events per second handled one at a time by `PowerDialer` and in batches by `BatchDialer`, on the same traffic.
+
+Without --url agent state is kept in the Redis stand in from the tests, where a batch's bulk reads and writes save the
+most; pass memory:// for the in-process store or a real server with --url redis://localhost:6379/0
+"""
+import argparse
+import time
+
+import power_dialer.batch_dialer
+import power_dialer.power_dialer
+from power_dialer.agent_storage.agent_storage import create_agent_storage_backend
+from power_dialer.batch_dialer import BatchDialer, BatchEvent
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.event_log import CALLBACKS, EventType
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import PowerDialer
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--agents', '-n', type=int, default=200, help='number of agents')
+    parser.add_argument('--calls', '-c', type=int, default=5, help='calls per agent')
+    parser.add_argument('--batch', '-b', type=int, nargs='+', default=[10, 100, 1000], help='batch sizes')
+    parser.add_argument('--url', '-u', default=None, help='agent storage URL, default is an in-process Redis stand in')
+    return parser.parse_args()
+
+
+def make_events(agents: int, calls: int):
+    """
+    Each agent logs in, takes some calls and logs out, the agents' events interleaved as a queue would deliver them
+    """
+    rounds = []
+    for i in range(agents):
+        agent_id = f'agent_{i:04d}'
+        events = [BatchEvent(agent_id, EventType.agent_login)]
+        for call in range(calls):
+            number = '(212) 555-%04d' % ((i * calls + call) % 10000)
+            events.append(BatchEvent(agent_id, EventType.call_started, number))
+            events.append(BatchEvent(agent_id, EventType.call_ended, number))
+        events.append(BatchEvent(agent_id, EventType.agent_logout))
+        rounds.append(events)
+    return [events[i] for i in range(2 * calls + 2) for events in rounds]
+
+
+def one_at_a_time(events):
+    for event in events:
+        getattr(PowerDialer(event.agent_id), CALLBACKS[event.event_type])(*event.args)
+
+
+def batched(events, size: int):
+    dialer = BatchDialer()
+    for start in range(0, len(events), size):
+        dialer.process(events[start:start + size])
+
+
+def bench(name, run, events, round_trips=None):
+    before = round_trips() if round_trips else 0
+    started = time.perf_counter()
+    run(events)
+    elapsed = time.perf_counter() - started
+    trips = f'{(round_trips() - before) / len(events):6.3f}' if round_trips else '     -'
+    print(f'{name:12s} {len(events):8d} events  {len(events) / elapsed:10.0f} events/s  {trips} round trips/event')
+
+
+def main():
+    options = get_command_line_arguments()
+    NumberManager(synchronous=True)
+    server = None
+    url = options.url
+    if url is None:
+        from test.redis_stand_in import RedisStandIn
+        server = RedisStandIn()
+        url = server.url
+    storage = create_agent_storage_backend(url)
+    power_dialer.power_dialer.AgentStorage = power_dialer.batch_dialer.AgentStorage = storage
+    pool = getattr(storage, 'pool', None)
+    round_trips = (lambda: pool.round_trips) if pool is not None else None
+    events = make_events(options.agents, options.calls)
+    try:
+        bench('single', one_at_a_time, events, round_trips)
+        for size in options.batch:
+            bench(f'batch {size}', lambda e: batched(e, size), events, round_trips)
+        if pool is not None:
+            storage.flush()
+            pool.close()
+    finally:
+        if server is not None:
+            server.stop()
+        CallMetrics.shutdown()
+
+
+if __name__ == '__main__':
+    main()
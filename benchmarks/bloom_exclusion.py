@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory and lookup speed of the exclusion window held as a ring of Bloom filters against the exact dict
+`NumberManager.calls` uses, with --numbers dialed across the window (50M by default).
+
+Building a 50M entry dict takes several GB, past --dict-limit numbers its memory is measured at the limit and
+scaled up, those lines are marked as extrapolated.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from power_dialer.exclusion.bloom_exclusion import BloomExclusionStore, DAY
+
+BATCH = 10000
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--numbers', '-n', type=int, default=50000000, help='numbers dialed across the window')
+    parser.add_argument('--days', '-d', type=int, default=7, help='exclusion window in days, one filter per day')
+    parser.add_argument('--error-rate', '-e', type=float, default=0.001, help='false positive rate')
+    parser.add_argument('--lookups', '-l', type=int, default=200000, help='lookups to time')
+    parser.add_argument('--dict-limit', type=int, default=5000000, help='largest dict to actually build')
+    return parser.parse_args()
+
+
+def numbers(count: int, seed: int):
+    rng = random.Random(seed)
+    return [str(rng.randrange(2002000000, 9999999999)) for _ in range(count)]
+
+
+def bench_bloom(options, probes):
+    window = options.days * DAY
+    store = BloomExclusionStore(window, DAY, capacity=options.numbers // options.days + 1,
+                                error_rate=options.error_rate)
+    started = time.perf_counter()
+    for i in range(0, options.numbers, BATCH):
+        now = i / options.numbers * window
+        store.reserve(numbers(min(BATCH, options.numbers - i), i), now, window)
+    built = time.perf_counter() - started
+    store.positives = 0
+    # Into a fresh bucket, with every day of the window still live
+    now = window
+    started = time.perf_counter()
+    for i in range(0, len(probes), BATCH):
+        store.reserve(probes[i:i + BATCH], now, window)
+    lookup = (time.perf_counter() - started) / len(probes)
+    false_positives = store.positives / len(probes)
+    print(f'bloom  {store.nbytes / 2 ** 20:10.1f} MB  {store.nbytes / options.numbers:6.2f} B/number  '
+          f'{lookup * 1e6:6.2f} us/lookup  build {built:.0f}s  false positives {false_positives:.4%}')
+
+
+def bench_dict(options, probes):
+    count = min(options.numbers, options.dict_limit)
+    tracemalloc.start()
+    calls = {}
+    for i in range(0, count, BATCH):
+        for number in numbers(min(BATCH, count - i), i):
+            calls[number] = float(i)
+    size = tracemalloc.get_traced_memory()[0] * options.numbers / count
+    tracemalloc.stop()
+    cutoff = 0.0
+    started = time.perf_counter()
+    for number in probes:
+        timestamp = calls.get(number)
+        if timestamp is None or timestamp <= cutoff:
+            calls[number] = 1.0
+    lookup = (time.perf_counter() - started) / len(probes)
+    note = ' (extrapolated)' if count < options.numbers else ''
+    print(f'dict   {size / 2 ** 20:10.1f} MB  {size / options.numbers:6.2f} B/number  '
+          f'{lookup * 1e6:6.2f} us/lookup{note}')
+
+
+def main():
+    options = get_command_line_arguments()
+    # Never dialed, so every positive is a false one
+    probes = numbers(options.lookups, -1)
+    print(f'{options.numbers:,} numbers over {options.days} days, {options.lookups:,} lookups')
+    bench_dict(options, probes)
+    bench_bloom(options, probes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare the throughput of logging finished calls against inserting them straight into SQLite the way the storage
+thread does without a log.
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from power_dialer.call_metrics.call_record import CallRecord
+from power_dialer.call_metrics.call_record_log import CallRecordLog
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', '-n', type=int, default=20000, help='number of call records')
+    parser.add_argument('--sync-every', '-s', type=int, default=64, help='records per fsync group')
+    return parser.parse_args()
+
+
+def make_records(count):
+    now = datetime.datetime.utcnow()
+    then = now + datetime.timedelta(seconds=60)
+    return [CallRecord(f'agent_{i % 500:04d}', f'(212) 555-{i % 10000:04d}', now, then) for i in range(count)]
+
+
+def bench_sqlite(directory, records):
+    database = os.path.join(directory, 'direct.db')
+    storage = CallMetricsRelationalStorage(None, database)
+    connection = sqlite3.connect(database)
+    started = time.perf_counter()
+    for record in records:
+        storage.save_call_record(connection, record)
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return elapsed
+
+
+def bench_log(directory, records, sync_every):
+    log = CallRecordLog(os.path.join(directory, 'calls.log'), sync_every)
+    started = time.perf_counter()
+    for record in records:
+        log.append(record)
+    log.sync()
+    elapsed = time.perf_counter() - started
+    log.close()
+    return elapsed
+
+
+def main():
+    options = get_command_line_arguments()
+    records = make_records(options.records)
+    directory = tempfile.mkdtemp()
+    try:
+        for name, elapsed in (('sqlite insert+commit', bench_sqlite(directory, records)),
+                              (f'log append (fsync/{options.sync_every})',
+                               bench_log(directory, records, options.sync_every))):
+            print(f'{name:30s} {len(records) / elapsed:12,.0f} records/s  {elapsed * 1e6 / len(records):8.1f} us/record')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Size and query speed of the call metrics database before and after the integer schema, and how the online migration
+between them affects the storage thread.
+
+'text' is the old CALL_RECORDS table with its covering indexes on the text columns. It's migrated in place with
+`CallRecordsMigration` while a writer keeps committing batches, then vacuumed and queried with `CallMetricsQueries`,
+which includes turning rows back into `CallRecord`s.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from power_dialer.call_metrics.call_metrics_queries import CallMetricsQueries
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage
+from power_dialer.call_metrics.call_record import CallRecord
+from power_dialer.call_metrics.call_records_migration import CallRecordsMigration, LEGACY_INSERT_QUERY, \
+    LEGACY_SCHEMA, MIGRATION_CHUNK, MIGRATION_PAUSE
+from power_dialer.latency import format_percentiles, percentiles
+
+AGENTS = 200
+# The text schema as it was just before the integer one, with its covering indexes
+TEXT_INDEXES = """
+DROP INDEX IF EXISTS agent_idx;
+CREATE INDEX IF NOT EXISTS agent_start_idx ON CALL_RECORDS(agent_id, call_start, call_end, called_number);
+CREATE INDEX IF NOT EXISTS start_idx ON CALL_RECORDS(call_start, agent_id, called_number, call_end);
+CREATE INDEX IF NOT EXISTS number_idx ON CALL_RECORDS(called_number, call_start, agent_id, call_end);
+"""
+TEXT_QUERIES = {
+    'agent_stats': ('SELECT agent_id, COUNT(*), SUM(call_end - call_start) FROM CALL_RECORDS WHERE agent_id = ? '
+                    'GROUP BY agent_id', lambda: (_agent(),)),
+    'calls_between': ('SELECT * FROM CALL_RECORDS WHERE call_start >= ? AND call_start < ? ORDER BY call_start',
+                      lambda: _range()),
+    'last_call_to': ('SELECT * FROM CALL_RECORDS WHERE called_number = ? ORDER BY call_start DESC LIMIT 1',
+                     lambda: (_number(),)),
+}
+START = time.time() - 30 * 86400
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', '-n', type=int, default=1000000, help='call records to migrate')
+    parser.add_argument('--queries', '-q', type=int, default=2000, help='queries of each kind to time')
+    parser.add_argument('--batch', '-b', type=int, default=64, help='records per write transaction during migration')
+    parser.add_argument('--chunk', '-c', type=int, default=MIGRATION_CHUNK, help='rows per migration transaction')
+    parser.add_argument('--pause', '-p', type=float, default=MIGRATION_PAUSE, help='seconds between chunks')
+    return parser.parse_args()
+
+
+def _agent() -> str:
+    return f'agent_{random.randrange(AGENTS):04d}'
+
+
+def _number() -> str:
+    return f'(212) 555-{random.randrange(10000):04d}'
+
+
+def _range():
+    start = START + random.uniform(0, 86400)
+    return start, start + 60
+
+
+def rows(count: int, start: float):
+    for i in range(count):
+        started = start + i * 0.5
+        yield _agent(), _number(), started, started + random.uniform(5, 300)
+
+
+def size(path: str, count: int) -> str:
+    size = os.path.getsize(path)
+    return f'{count:,} rows {size / 2 ** 20:8.1f} MB {size / count:6.1f} bytes/row'
+
+
+def time_queries(name: str, operations: dict, count: int):
+    for operation, run in operations.items():
+        latencies = []
+        for _ in range(count):
+            begin = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - begin)
+        print(f'  {name:8s} {operation:14s} {format_percentiles(percentiles(latencies))}')
+
+
+def writer(stop: threading.Event, path: str, batch: int, latencies: list):
+    """
+    Commit batches to the new tables the way the storage thread does, timing each commit
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    fromtimestamp = datetime.datetime.fromtimestamp
+    start = time.time()
+    while not stop.is_set():
+        records = [CallRecord(agent_id, number, fromtimestamp(started), fromtimestamp(ended))
+                   for agent_id, number, started, ended in rows(batch, start)]
+        begin = time.perf_counter()
+        with connection:
+            CallMetricsRelationalStorage.insert_records(connection, records)
+        latencies.append(time.perf_counter() - begin)
+        start += batch
+    connection.close()
+
+
+def main():
+    options = get_command_line_arguments()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'metrics.db')
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL').fetchone()
+        connection.executescript(LEGACY_SCHEMA + TEXT_INDEXES)
+        with connection:
+            connection.executemany(LEGACY_INSERT_QUERY, rows(options.rows, START))
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        print(f'text     {size(path, options.rows)}')
+        time_queries('text', {name: (lambda q=query, p=parameters: connection.execute(q, p()).fetchall())
+                              for name, (query, parameters) in TEXT_QUERIES.items()}, options.queries)
+        connection.close()
+
+        # The storage renames the old table and puts the compatibility view up. Its background migration is stopped
+        # and run again here so it can be timed.
+        instance, CallMetricsRelationalStorage._instance = CallMetricsRelationalStorage._instance, None
+        try:
+            storage = CallMetricsRelationalStorage(None, path)
+        finally:
+            CallMetricsRelationalStorage._instance = instance
+        storage.migration.stop()
+        migration = CallRecordsMigration(path, options.chunk, options.pause)
+        stop = threading.Event()
+        latencies = []
+        thread = threading.Thread(target=writer, args=(stop, path, options.batch, latencies))
+        thread.start()
+        begin = time.perf_counter()
+        migration.run()
+        elapsed = time.perf_counter() - begin
+        stop.set()
+        thread.join()
+        print(f'migrated {migration.migrated:,} rows in {migration.chunks} chunks, {elapsed:.1f}s, '
+              f'{migration.migrated / elapsed:,.0f} rows/s ({storage.migration.migrated:,} before it was stopped)')
+        print(f'  writer commits during migration {format_percentiles(percentiles(latencies))}')
+
+        connection = sqlite3.connect(path)
+        connection.execute('VACUUM')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        count, = connection.execute('SELECT COUNT(*) FROM CALLS').fetchone()
+        connection.close()
+        print(f'integer  {size(path, count)} after VACUUM')
+        queries = CallMetricsQueries(path)
+        fromtimestamp = datetime.datetime.fromtimestamp
+        time_queries('integer', {
+            'agent_stats': lambda: queries.agent_stats(_agent()),
+            'calls_between': lambda: queries.calls_between(*(fromtimestamp(t) for t in _range())),
+            'last_call_to': lambda: queries.last_call_to(_number()),
+        }, options.queries)
+        queries.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exclusion for concurrent campaigns: memory and lookup cost of a recent call dict for every campaign, against the
+`NumberManager` shared index of one dial time per number and a campaign bit mask.
+"""
+import argparse
+import random
+import threading
+import time
+import tracemalloc
+
+from power_dialer.latency import format_percentiles, percentiles
+from power_dialer.number_manager import NumberManager
+
+HOUR = 3600
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dialed', '-n', type=int, default=200000, help='numbers dialed recently')
+    parser.add_argument('--campaigns', '-c', type=int, default=20, help='concurrent campaigns')
+    parser.add_argument('--per-number', '-p', type=int, default=4, help='campaigns that dialed each number, at most')
+    parser.add_argument('--lookups', '-l', type=int, default=200000, help='exclusion checks to time')
+    parser.add_argument('--repeat', '-r', type=float, default=0.3, help='share of leads already dialed')
+    return parser.parse_args()
+
+
+def number(i: int) -> str:
+    return str(2000000000 + i)
+
+
+def dialed(options):
+    """
+    :return: Campaign index to [(number index, seconds ago)] for the numbers each campaign dialed
+    """
+    rng = random.Random(1)
+    campaigns = [[] for _ in range(options.campaigns)]
+    for i in range(options.dialed):
+        ago = rng.uniform(0, HOUR)
+        for campaign in rng.sample(range(options.campaigns), rng.randint(1, options.per_number)):
+            campaigns[campaign].append((i, ago))
+    return campaigns
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, used
+
+
+def leads(options, seed: int):
+    rng = random.Random(seed)
+    return [number(rng.randrange(options.dialed)) if rng.random() < options.repeat else
+            str(5000000000 + rng.randrange(4000000000)) for _ in range(options.lookups)]
+
+
+def time_lookups(name: str, check, options, windows):
+    """
+    A thread per campaign checking leads at once
+    """
+    now = time.time()
+    samples = []
+
+    def run(campaign):
+        timings = []
+        perf_counter = time.perf_counter
+        for lead in leads(options, campaign):
+            started = perf_counter()
+            check(lead, now, campaign)
+            timings.append(perf_counter() - started)
+        samples.extend(timings)
+
+    threads = [threading.Thread(target=run, args=(campaign,)) for campaign in range(len(windows))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    print(f'{name:10s} {len(samples) / elapsed:12,.0f} checks/s  {format_percentiles(percentiles(samples))}')
+
+
+def main():
+    options = get_command_line_arguments()
+    now = time.time()
+    campaigns = dialed(options)
+    windows = [HOUR * (i + 1) / options.campaigns for i in range(options.campaigns)]
+    entries = sum(len(calls) for calls in campaigns)
+    print(f'{options.dialed:,} numbers, {entries:,} campaign dials across {options.campaigns} campaigns')
+
+    def separate_dicts():
+        # What a number manager per campaign would hold
+        return [{number(i): now - ago for i, ago in calls} for calls in campaigns]
+
+    def shared_index():
+        instance, NumberManager._instance = NumberManager._instance, None
+        try:
+            client = NumberManager(HOUR, synchronous=True)
+        finally:
+            NumberManager._instance = instance
+        for i, calls in enumerate(campaigns):
+            client.add_campaign(f'campaign_{i}', windows[i])
+            client.warm_cache({number(n): now - ago for n, ago in calls}, campaign=f'campaign_{i}')
+        return client
+
+    separate, used = measure(separate_dicts)
+    print(f'{"separate":10s} {used / 2 ** 20:8.1f} MB  {used / options.dialed:6.1f} bytes/number')
+    client, used = measure(shared_index)
+    print(f'{"shared":10s} {used / 2 ** 20:8.1f} MB  {used / options.dialed:6.1f} bytes/number  '
+          f'{len(set(client.campaign_members.values()))} distinct masks')
+
+    # Each campaign's number manager would have its own lock
+    locks = [threading.Lock() for _ in range(options.campaigns)]
+
+    def check_separate(lead, at, campaign):
+        with locks[campaign]:
+            timestamp = separate[campaign].get(lead)
+            return timestamp is not None and at - timestamp < windows[campaign]
+
+    members = [client.campaigns[f'campaign_{i}'] for i in range(options.campaigns)]
+
+    def check_shared(lead, at, campaign):
+        with client.call_lock:
+            return client._excluded(lead, at, members[campaign])
+
+    time_lookups('separate', check_separate, options, windows)
+    time_lookups('shared', check_shared, options, windows)
+
+
+if __name__ == '__main__':
+    main()
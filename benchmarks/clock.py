@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+What reading the time costs in each clock mode, on its own and per dialer event.
+
+Each event reads the clock a few times: the number manager, call metrics, the agent timeline and event dedupe all
+take the time.
+"""
+import argparse
+import time
+
+from power_dialer import clock
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.clock import CoarseClock, ManualClock, WallClock
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import PowerDialer
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reads', '-r', type=int, default=1000000, help='clock reads to time')
+    parser.add_argument('--agents', '-n', type=int, default=500, help='number of agents')
+    parser.add_argument('--resolution', type=float, default=0.01, help='coarse clock resolution in seconds')
+    return parser.parse_args()
+
+
+def time_reads(read, reads: int) -> float:
+    started = time.perf_counter()
+    for _ in range(reads):
+        read()
+    return (time.perf_counter() - started) * 1e9 / reads
+
+
+def run_agents(agents: int, run: str) -> int:
+    events = 0
+    for i in range(agents):
+        agent_id = f'agent_{i:04d}'
+        number = '(212) 555-%04d' % i
+        PowerDialer(agent_id).on_agent_login(event_id=f'{run}-{agent_id}-login')
+        PowerDialer(agent_id).on_call_started(number, event_id=f'{run}-{agent_id}-started')
+        PowerDialer(agent_id).on_call_ended(number, event_id=f'{run}-{agent_id}-ended')
+        PowerDialer(agent_id).on_agent_logout(event_id=f'{run}-{agent_id}-logout')
+        events += 4
+    return events
+
+
+def main():
+    options = get_command_line_arguments()
+    NumberManager(synchronous=True)
+    modes = [('wall', WallClock()), ('coarse', CoarseClock(options.resolution)), ('manual', ManualClock(time.time()))]
+    try:
+        # Start the services and warm up before anything is timed
+        run_agents(options.agents, 'warmup')
+        for name, mode in modes:
+            clock.use_clock(mode)
+            now = time_reads(clock.now, options.reads)
+            utcnow = time_reads(clock.utcnow, options.reads)
+            started = time.perf_counter()
+            events = run_agents(options.agents, name)
+            elapsed = time.perf_counter() - started
+            print(f'{name:8s} now {now:6.1f} ns  utcnow {utcnow:6.1f} ns  {elapsed * 1e6 / events:7.1f} us/event')
+    finally:
+        for _, mode in modes:
+            mode.shutdown()
+        clock.use_clock(None)
+        CallMetrics.shutdown()
+
+
+if __name__ == '__main__':
+    main()
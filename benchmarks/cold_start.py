@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cold start cost, each sample is a fresh interpreter: the time to import the dialer and the latency of the first
+event, once with services built lazily and once with them all built up front the way they used to be at import.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+SCRIPT = """
+import json, os, sys, tempfile, time
+started = time.perf_counter()
+import power_dialer.power_dialer as dialer
+from power_dialer.lazy_service import start_all, shutdown_all
+from power_dialer.number_manager import NumberManager
+if {eager}:
+    start_all()
+imported = time.perf_counter()
+event = dialer.PowerDialer('agent_0001')
+getattr(event, {event!r})(*{args!r})
+finished = time.perf_counter()
+NumberManager().shutdown()
+shutdown_all()
+print(json.dumps([imported - started, finished - imported]))
+"""
+
+EVENTS = (
+    ('on_agent_login', ()),
+    ('on_call_failed', ('(212) 555-0100',)),
+    ('on_call_started', ('(212) 555-0100',)),
+)
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', '-n', type=int, default=10, help='fresh interpreters per measurement')
+    return parser.parse_args()
+
+
+def sample(eager: bool, event: str, args: tuple):
+    script = SCRIPT.format(eager=eager, event=event, args=args)
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    options = get_command_line_arguments()
+    print(f'{"":8s} {"event":16s} {"import ms":>10s} {"first event ms":>15s} {"total ms":>9s}')
+    for eager in (True, False):
+        for event, args in EVENTS:
+            samples = [sample(eager, event, args) for _ in range(options.samples)]
+            imported = statistics.median(s[0] for s in samples) * 1e3
+            first = statistics.median(s[1] for s in samples) * 1e3
+            print(f'{"eager" if eager else "lazy":8s} {event:16s} {imported:10.2f} {first:15.2f} {imported + first:9.2f}')
+
+
+if __name__ == '__main__':
+    main()
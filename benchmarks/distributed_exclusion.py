@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Throughput and correctness of the distributed exclusion store with several dialer processes against several
+exclusion node processes on this machine. Every dialer draws from the same pool of numbers so they collide, no
+number may be reserved by more than one of them.
+"""
+import argparse
+import multiprocessing
+import random
+import time
+
+from power_dialer.exclusion.distributed_exclusion import DistributedExclusionStore
+from power_dialer.exclusion.exclusion_node import start_node_process
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', '-n', type=int, default=3, help='exclusion node processes')
+    parser.add_argument('--dialers', '-d', type=int, default=4, help='dialer processes')
+    parser.add_argument('--batches', '-b', type=int, default=2000, help='batches per dialer')
+    parser.add_argument('--batch-size', '-s', type=int, default=8, help='numbers per batch')
+    parser.add_argument('--pool', '-p', type=int, default=200000, help='distinct numbers to draw from')
+    return parser.parse_args()
+
+
+def dialer(members, batches, batch_size, pool, seed):
+    store = DistributedExclusionStore(members)
+    rng = random.Random(seed)
+    reserved = []
+    latencies = []
+    for _ in range(batches):
+        numbers = [str(2125550000 + rng.randrange(pool)) for _ in range(batch_size)]
+        started = time.perf_counter()
+        flags = store.reserve(numbers, time.time(), 3600)
+        latencies.append(time.perf_counter() - started)
+        reserved.extend(number for number, flag in zip(numbers, flags) if flag)
+    store.close()
+    return reserved, latencies
+
+
+def main():
+    options = get_command_line_arguments()
+    nodes = [start_node_process() for _ in range(options.nodes)]
+    members = [address for _process, address in nodes]
+    try:
+        with multiprocessing.get_context('spawn').Pool(options.dialers) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(dialer, [(members, options.batches, options.batch_size, options.pool, seed)
+                                            for seed in range(options.dialers)])
+            elapsed = time.perf_counter() - started
+        reserved = [number for numbers, _latencies in results for number in numbers]
+        latencies = sorted(latency for _numbers, latencies in results for latency in latencies)
+        checked = options.dialers * options.batches * options.batch_size
+        print(f'{options.dialers} dialers, {options.nodes} nodes: {checked / elapsed:,.0f} numbers/s, '
+              f'{len(latencies) / elapsed:,.0f} batches/s')
+        print(f'batch latency p50 {latencies[len(latencies) // 2] * 1e6:.0f}us '
+              f'p99 {latencies[int(len(latencies) * .99)] * 1e6:.0f}us')
+        print(f'{len(reserved)} reserved, {len(reserved) - len(set(reserved))} reserved twice')
+    finally:
+        for process, _address in nodes:
+            process.terminate()
+
+
+if __name__ == '__main__':
+    main()
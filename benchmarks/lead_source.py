@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ingest rate and memory of the lead source for a generated lead file.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from power_dialer.leads.lead_source import LeadSource
+from power_dialer.services import get_lead_phone_number_to_dial
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', '-n', type=int, default=1000000, help='rows in the lead file')
+    parser.add_argument('--duplicates', '-d', type=int, default=5, help='percentage of duplicate rows')
+    parser.add_argument('--file', '-f', default=None, help='ingest this file instead of generating one')
+    return parser.parse_args()
+
+
+def write_leads(path, rows, duplicate_rate):
+    recent = []
+    with open(path, 'wt') as f:
+        f.write('number,priority\n')
+        for _ in range(rows):
+            if recent and random.randint(1, 100) <= duplicate_rate:
+                number = random.choice(recent)
+            else:
+                number = get_lead_phone_number_to_dial()
+                if len(recent) < 10000:
+                    recent.append(number)
+            f.write(f'{number},{random.randint(1, 5)}\n')
+
+
+def main():
+    options = get_command_line_arguments()
+    directory = tempfile.mkdtemp()
+    try:
+        path = options.file
+        if path is None:
+            path = os.path.join(directory, 'leads.csv')
+            print(f'Writing {options.rows} leads...')
+            write_leads(path, options.rows, options.duplicates)
+        print(f'File is {os.path.getsize(path) / 2 ** 20:.1f}MB')
+        source = LeadSource(max(options.rows, 1), start_hour=0, end_hour=24, spool_directory=directory)
+        print(source.ingest(path, priority_column=None if options.file else 1))
+        started = time.perf_counter()
+        served = 0
+        for _ in range(min(len(source), 100000)):
+            source.next_lead()
+            served += 1
+        elapsed = time.perf_counter() - started
+        print(f'Served {served} leads at {served / elapsed:,.0f} leads/s')
+        source.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
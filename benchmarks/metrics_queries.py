@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Report query latency while a writer commits call records, the way the storage thread does.
+
+'ad hoc' is how reports used to run: a fresh connection per query against a rollback journal database in the old text
+schema with only the agent index. 'pooled' is `CallMetricsQueries` on the WAL database with covering indexes.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from power_dialer.call_metrics.call_metrics_queries import CallMetricsQueries
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage
+from power_dialer.call_metrics.call_record import CallRecord
+from power_dialer.call_metrics.call_records_migration import LEGACY_INSERT_QUERY, LEGACY_SCHEMA
+from power_dialer.latency import percentiles, format_percentiles
+
+AGENTS = 200
+LEGACY_AGENT_STATS_QUERY = 'SELECT agent_id, COUNT(*), SUM(call_end - call_start) FROM CALL_RECORDS ' \
+                           'WHERE agent_id = ? GROUP BY agent_id'
+LEGACY_CALLS_BETWEEN_QUERY = 'SELECT * FROM CALL_RECORDS WHERE call_start >= ? AND call_start < ?'
+LEGACY_LAST_CALL_QUERY = 'SELECT * FROM CALL_RECORDS WHERE called_number = ? ORDER BY call_start DESC LIMIT 1'
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', '-n', type=int, default=200000, help='call records before the run')
+    parser.add_argument('--readers', '-r', type=int, default=4, help='reader threads')
+    parser.add_argument('--time', '-t', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--batch', '-b', type=int, default=64, help='records per write transaction')
+    return parser.parse_args()
+
+
+def rows(count: int, start: float):
+    for i in range(count):
+        started = start + i * 0.01
+        yield (f'agent_{random.randrange(AGENTS):04d}', f'(212) 555-{random.randrange(10000):04d}', started,
+               started + random.uniform(5, 300))
+
+
+def insert(connection: sqlite3.Connection, legacy: bool, new_rows):
+    if legacy:
+        connection.executemany(LEGACY_INSERT_QUERY, new_rows)
+        return
+    fromtimestamp = datetime.datetime.fromtimestamp
+    CallMetricsRelationalStorage.insert_records(
+        connection, [CallRecord(agent_id, number, fromtimestamp(started), fromtimestamp(ended))
+                     for agent_id, number, started, ended in new_rows])
+
+
+def create_database(path: str, count: int, legacy: bool):
+    if legacy:
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=DELETE')
+        connection.executescript(LEGACY_SCHEMA)
+    else:
+        instance, CallMetricsRelationalStorage._instance = CallMetricsRelationalStorage._instance, None
+        try:
+            CallMetricsRelationalStorage(None, path)
+        finally:
+            CallMetricsRelationalStorage._instance = instance
+        connection = sqlite3.connect(path)
+    with connection:
+        insert(connection, legacy, rows(count, time.time() - count * 0.01))
+    connection.close()
+
+
+def writer(path: str, legacy: bool, batch: int, stop: threading.Event, written: list):
+    connection = sqlite3.connect(path, timeout=30)
+    start = time.time()
+    while not stop.is_set():
+        with connection:
+            insert(connection, legacy, rows(batch, start))
+        written[0] += batch
+        start += batch * 0.01
+    connection.close()
+
+
+def ad_hoc(path: str):
+    def query(sql, parameters):
+        connection = sqlite3.connect(path, timeout=30)
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        finally:
+            connection.close()
+
+    return {
+        'agent_stats': lambda: query(LEGACY_AGENT_STATS_QUERY, (f'agent_{random.randrange(AGENTS):04d}',)),
+        'calls_between': lambda: query(LEGACY_CALLS_BETWEEN_QUERY, _range()),
+        'last_call_to': lambda: query(LEGACY_LAST_CALL_QUERY, (f'(212) 555-{random.randrange(10000):04d}',)),
+    }
+
+
+def pooled(queries: CallMetricsQueries):
+    return {
+        'agent_stats': lambda: queries.agent_stats(f'agent_{random.randrange(AGENTS):04d}'),
+        'calls_between': lambda: queries.calls_between(*(datetime.datetime.fromtimestamp(t) for t in _range())),
+        'last_call_to': lambda: queries.last_call_to(f'(212) 555-{random.randrange(10000):04d}'),
+    }
+
+
+def _range():
+    start = time.time() - random.uniform(60, 600)
+    return start, start + 1
+
+
+def reader(operations: dict, stop: threading.Event, samples: dict):
+    names = list(operations)
+    while not stop.is_set():
+        name = random.choice(names)
+        begin = time.perf_counter()
+        operations[name]()
+        samples[name].append(time.perf_counter() - begin)
+
+
+def run(name: str, path: str, legacy: bool, operations: dict, options):
+    stop = threading.Event()
+    written = [0]
+    samples = {operation: [] for operation in operations}
+    threads = [threading.Thread(target=writer, args=(path, legacy, options.batch, stop, written))]
+    threads += [threading.Thread(target=reader, args=(operations, stop, samples)) for _ in range(options.readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(options.time)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f'{name}: {written[0] / options.time:,.0f} rows/s written')
+    for operation, latencies in samples.items():
+        print(f'  {operation:14s} {len(latencies) / options.time:8,.0f}/s  {format_percentiles(percentiles(latencies))}')
+
+
+def main():
+    options = get_command_line_arguments()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'ad_hoc.db')
+        create_database(path, options.rows, legacy=True)
+        run('ad hoc', path, True, ad_hoc(path), options)
+
+        path = os.path.join(directory, 'pooled.db')
+        create_database(path, options.rows, legacy=False)
+        queries = CallMetricsQueries(path, options.readers)
+        run('pooled', path, False, pooled(queries), options)
+        queries.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Number normalizations per dial and their cost, with numbers passed around as strings and each service normalizing
+them again, against `PhoneNumber` values parsed once.
+
+Each cycle is an agent logging in, one call failing, one starting and ending, the number listener recording the dials
+and the events being recorded, as an event log is during a capture.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import power_dialer.event_log
+import power_dialer.number_manager
+import power_dialer.phone_number
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.event_log import EventRecorder
+from power_dialer.number_manager import NumberManager
+from power_dialer.phone_number import NUMBER_DIGITS, PhoneNumber, normalize_number, parse_numbers
+from power_dialer.power_dialer import PowerDialer
+from power_dialer.power_dialer_interface import PowerDialerInterface
+
+# Every module that normalizes, so the counting version can be swapped in
+MODULES = (power_dialer.phone_number, power_dialer.number_manager, power_dialer.event_log)
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cycles', '-n', type=int, default=20000, help='dial cycles to run')
+    parser.add_argument('--bulk', '-b', type=int, default=100000, help='numbers for the bulk parser')
+    return parser.parse_args()
+
+
+def string_normalize(number: str) -> str:
+    """
+    How numbers were normalized before `PhoneNumber`
+    """
+    return ''.join(c for c in number if c in NUMBER_DIGITS)
+
+
+def cycle(client: NumberManager, i: int):
+    agent_id = f'agent_{i % 500:04d}'
+    dialer = PowerDialer(agent_id)
+    dialer.on_agent_login()
+    failed, connected = dialer.numbers
+    # Numbers come back from the telephony side as text
+    PowerDialer(agent_id).on_call_failed(str(failed))
+    PowerDialer(agent_id).on_call_started(str(connected))
+    PowerDialer(agent_id).on_call_ended(str(connected))
+    PowerDialer(agent_id).on_agent_logout()
+    client.CALL_QUEUE.put(None)
+    client.number_listener()
+
+
+def run(name: str, client: NumberManager, cycles: int, as_strings: bool) -> dict:
+    """
+    :return: Normalizations, parses of text and parses of numbers already parsed, per cycle
+    """
+    counts = {'normalized': 0, 'parsed': 0, 'passed': 0}
+    original = power_dialer.phone_number.normalize_number
+    parse = PhoneNumber.__dict__['parse']
+
+    def counting(number):
+        if number.__class__ is not PhoneNumber:
+            counts['normalized'] += 1
+            if as_strings:
+                return string_normalize(number)
+        return original(number)
+
+    def parsing(cls, number):
+        if as_strings:
+            return str(number)
+        counts['passed' if number.__class__ is PhoneNumber else 'parsed'] += 1
+        return parse.__func__(cls, number)
+
+    for module in MODULES:
+        module.normalize_number = counting
+    PhoneNumber.parse = classmethod(parsing)
+    try:
+        cycle(client, -1)
+        counts = dict.fromkeys(counts, 0)
+        for i in range(cycles):
+            cycle(client, i)
+    finally:
+        for module in MODULES:
+            module.normalize_number = original
+        PhoneNumber.parse = parse
+    per_cycle = {key: value / cycles for key, value in counts.items()}
+    print(f'{name:8s} {per_cycle["normalized"]:5.1f} normalizations/cycle  {per_cycle["parsed"]:5.1f} parses/cycle  '
+          f'{per_cycle["passed"]:5.1f} already parsed')
+    return per_cycle
+
+
+def time_each(work, items) -> float:
+    """
+    :return: Nanoseconds per item
+    """
+    started = time.perf_counter()
+    for item in items:
+        work(item)
+    return (time.perf_counter() - started) * 1e9 / len(items)
+
+
+def main():
+    options = get_command_line_arguments()
+    client = NumberManager(synchronous=True)
+    with tempfile.TemporaryDirectory() as directory:
+        PowerDialerInterface.recorder = EventRecorder(os.path.join(directory, 'events.log'))
+        try:
+            as_strings = run('strings', client, options.cycles, True)
+            as_values = run('parsed', client, options.cycles, False)
+        finally:
+            PowerDialerInterface.recorder.close()
+            PowerDialerInterface.recorder = None
+            CallMetrics.shutdown()
+
+    numbers = ['(212) 555-%04d' % (i % 10000) if i % 2 else '%010d' % (2000000000 + i) for i in range(options.bulk)]
+    generator = time_each(string_normalize, numbers)
+    translate = time_each(normalize_number, numbers)
+    PhoneNumber._interned.clear()
+    started = time.perf_counter()
+    parse_numbers(numbers)
+    first = (time.perf_counter() - started) * 1e9 / len(numbers)
+    interned = time_each(PhoneNumber.parse, numbers)
+    parsed = parse_numbers(numbers)
+    passed = time_each(PhoneNumber.parse, parsed)
+    print(f'ns a number: generator {generator:.0f}, translate {translate:.0f}, first parse {first:.0f}, '
+          f'interned {interned:.0f}, already parsed {passed:.0f}')
+    before = as_strings['normalized'] * generator
+    # Near enough every normalization is a first parse, the other parses of text find the number interned
+    after = (as_values['normalized'] * first + max(0.0, as_values['parsed'] - as_values['normalized']) * interned +
+             as_values['passed'] * passed)
+    print(f'estimated per cycle: {before / 1e3:.2f}us normalizing strings, {after / 1e3:.2f}us parsing once')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A 30 day exclusion window held in the tiered store: `get_number` latency, hit rate per tier and cold tier queries,
+screening leads one at a time against screening them in batches.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from power_dialer.exclusion.tiered_exclusion import TieredExclusionStore
+from power_dialer.latency import format_percentiles
+from power_dialer.number_manager import NumberManager
+
+DAY = 86400
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dialed', '-n', type=int, default=1000000, help='numbers dialed in the last 30 days')
+    parser.add_argument('--calls', '-c', type=int, default=50000, help='get_number calls to time')
+    parser.add_argument('--repeat', '-r', type=float, default=0.3, help='share of leads already dialed')
+    parser.add_argument('--batches', '-b', type=int, nargs='+', default=[1, 8, 32], help='reserve batch sizes')
+    return parser.parse_args()
+
+
+class Leads:
+    """
+    Stands in for a lead source, a share of leads are numbers dialed recently
+    """
+
+    def __init__(self, dialed: int, repeat: float, seed: int):
+        self.dialed = dialed
+        self.repeat = repeat
+        self.rng = random.Random(seed)
+
+    def next_lead(self) -> str:
+        if self.rng.random() < self.repeat:
+            return str(2000000000 + self.rng.randrange(self.dialed))
+        return str(5000000000 + self.rng.randrange(4000000000))
+
+
+def build(path: str, dialed: int, now: float) -> TieredExclusionStore:
+    store = TieredExclusionStore(path)
+    batch = 100000
+    for i in range(0, dialed, batch):
+        store.warm({str(2000000000 + n): now - 30 * DAY * n / dialed for n in range(i, min(dialed, i + batch))})
+        store.demote(now - store.hot_seconds)
+    return store
+
+
+def main():
+    options = get_command_line_arguments()
+    client = NumberManager(30 * DAY, synchronous=True)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'exclusion.db')
+        started = time.perf_counter()
+        store = build(path, options.dialed, time.time())
+        print(f'{store.cold_size():,} numbers on disk, {len(store.hot):,} hot, built in '
+              f'{time.perf_counter() - started:.1f}s')
+        client.exclusion = store
+        for batch in options.batches:
+            client.reserve_batch = batch
+            client.lead_source = Leads(options.dialed, options.repeat, batch)
+            client._reserved.clear()
+            client.latencies.clear()
+            store.lookups = store.hot_hits = store.cold_hits = store.cold_queries = 0
+            for _ in range(options.calls):
+                client.get_number()
+                client.CALL_QUEUE.get_nowait()
+            rates = store.hit_rates()
+            print(f'batch {batch:3d}  {format_percentiles(client.latency_percentiles())}  '
+                  f'hot {rates["hot"]:.1%} cold {rates["cold"]:.1%} miss {rates["miss"]:.1%}  '
+                  f'{store.cold_queries / options.calls:.3f} cold queries/number')
+        store.close()
+    client.exclusion = None
+    client.lead_source = None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Open loop load test: fire dialer events at rising arrival rates across a population of agents with a fixed pool of
+workers, and report throughput, latency and queue depths at each rate. Unlike `dialer-sim.py`, arrivals don't wait
+for the dialer, so the steps past its capacity show where latency falls apart.
+
+Save the curve with --output and pass it to another build's run with --baseline to compare the two.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from power_dialer import clock
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.load_generator import AgentPopulation, LoadGenerator, rate_steps
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import PowerDialer
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-agents', '-n', type=int, default=1000, help='number of agents')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='worker threads handling events')
+    parser.add_argument('--call-fail', '-f', type=int, default=50, help='chance of call fail 0-100')
+    parser.add_argument('--start', type=float, default=500, help='first arrival rate, events per second')
+    parser.add_argument('--step', type=float, default=500, help='rate increase per step')
+    parser.add_argument('--steps', type=int, default=10, help='number of steps')
+    parser.add_argument('--duration', '-t', type=float, default=10, help='seconds per step')
+    parser.add_argument('--warm-up', type=float, default=1, help='seconds at the first rate before measuring')
+    parser.add_argument('--stop-after', type=int, default=2, help='stop after this many saturated steps, 0 never')
+    parser.add_argument('--even', action='store_true', default=False, help='evenly spaced arrivals, not Poisson')
+    parser.add_argument('--seed', type=int, default=None, help='seed for repeatable traffic')
+    parser.add_argument('--clock', default=clock.CLOCK, help='wall, coarse or coarse:<resolution seconds>')
+    parser.add_argument('--output', '-o', default=None, help='write the curve as JSON')
+    parser.add_argument('--baseline', '-b', default=None, help='curve from another build to compare with')
+    return parser.parse_args()
+
+
+def compare(baseline: list, current: list):
+    """
+    Steps are matched by rate
+    """
+    before = {step['rate']: step for step in baseline}
+    print(f'{"rate/s":>8s} {"done/s":>17s} {"p50 ms":>17s} {"p99 ms":>17s} {"p99.9 ms":>17s}')
+    print(f'{"":8s}' + f' {"baseline":>8s}{"now":>9s}' * 4)
+    for step in current:
+        old = before.get(step['rate'])
+        if old is None:
+            continue
+        columns = [f'{old["throughput"]:8,.0f}{step["throughput"]:9,.0f}']
+        columns += [f'{old["percentiles"][point] * 1e3:8.1f}{step["percentiles"][point] * 1e3:9.1f}'
+                    for point in ('50', '99', '99.9')]
+        print(f'{step["rate"]:8,.0f} ' + ' '.join(columns))
+
+
+def main():
+    # Events for an agent can overtake each other, so expect warnings about unlikely transitions
+    logging.getLogger('power_dialer').setLevel(logging.ERROR)
+    options = get_command_line_arguments()
+    clock.use_clock(clock.create_clock(options.clock))
+    numbers = NumberManager()
+    population = AgentPopulation(options.num_agents, options.call_fail / 100, options.seed)
+    generator = LoadGenerator(PowerDialer, population, options.workers,
+                              [NumberManager.CALL_QUEUE, CallMetrics._storage_queue], not options.even,
+                              seed=options.seed)
+    try:
+        if options.warm_up:
+            # Start the services and fill the caches
+            generator.run_step(options.start, options.warm_up)
+        curve = generator.run(rate_steps(options.start, options.step, options.steps), options.duration,
+                              options.stop_after, lambda step: print(step.report()))
+    finally:
+        generator.shutdown()
+        CallMetrics.shutdown()
+        numbers.shutdown()
+        clock.get_clock().shutdown()
+    summary = [step.summary() for step in curve]
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as f:
+            compare(json.load(f), summary)
+
+
+if __name__ == '__main__':
+    main()
+    sys.exit(0)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replay an event log captured with `dialer-sim.py --record` (or by setting `PowerDialerInterface.recorder`) through
+this checkout's dialer. Save the results with --output and pass them to another build's run with --baseline to
+compare the two on the same traffic.
+"""
+import argparse
+import json
+import logging
+import sys
+
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.event_log import read_events
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import PowerDialer
+from power_dialer.replay import replay
+
+
+def get_command_line_arguments():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('log', help='recorded event log')
+    parser.add_argument('--paced', '-p', action='store_true', default=False, help='keep the recorded pacing')
+    parser.add_argument('--speed', '-s', type=float, default=1.0, help='speed up a paced replay')
+    parser.add_argument('--output', '-o', default=None, help='write the results as JSON')
+    parser.add_argument('--baseline', '-b', default=None, help='results from another build to compare with')
+    return parser.parse_args()
+
+
+def compare(baseline: dict, current: dict):
+    print(f'{"":12s} {"baseline":>12s} {"this build":>12s} {"change":>8s}')
+    rows = [('events/s', baseline['rate'], current['rate'])]
+    rows += [(f'p{point} us', baseline['percentiles'][point] * 1e6, value * 1e6)
+             for point, value in current['percentiles'].items()]
+    for name, before, after in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        print(f'{name:12s} {before:12.1f} {after:12.1f} {change:+7.1f}%')
+
+
+def main():
+    logging.getLogger('power_dialer').setLevel(logging.WARNING)
+    options = get_command_line_arguments()
+    NumberManager(synchronous=True)
+    try:
+        stats = replay(read_events(options.log), PowerDialer, options.paced, options.speed)
+    finally:
+        CallMetrics.shutdown()
+        NumberManager().shutdown()
+    print(stats.report())
+    summary = stats.summary()
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as f:
+            compare(json.load(f), summary)
+
+
+if __name__ == '__main__':
+    main()
+    sys.exit(0)
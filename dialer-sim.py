@@ -4,7 +4,6 @@ import argparse
 import sys
 import threading
 import time
-from dataclasses import dataclass
 import logging
 import os
 import random
@@ -12,33 +11,21 @@ import sqlite3
 import tempfile
 from typing import List
 
+from power_dialer import clock
+from power_dialer.agent_timeline import Timeline
+from power_dialer.event_log import EventRecorder
+from power_dialer.latency import format_percentiles
+from power_dialer.memory_budget import Memory
 from power_dialer.power_dialer import PowerDialer
+from power_dialer.power_dialer_interface import PowerDialerInterface
 from power_dialer.call_metrics.call_metrics import CallMetrics
+from power_dialer.call_metrics.call_metrics_queries import CallMetricsQueries
+from power_dialer.call_metrics.call_records_migration import LEGACY_TABLE
 from power_dialer.number_manager import NumberManager
 
 DB_NAME = os.path.join(tempfile.gettempdir(), 'powerdialer.db')
 
 
-@dataclass
-class ReportRecord:
-    agent_id: str
-    number_of_calls: int
-    average_call_time: float
-
-    def __repr__(self):
-        return f'Agent: {self.agent_id:10s} # Calls: {self.number_of_calls:-3d}, Avg Call Time: {self.average_call_time:5.2f}s'
-
-
-def report_row_factory(cursor, row: tuple) -> ReportRecord:
-    """
-    Return a Report Record
-    :param cursor: DB cursor
-    :param row: db row
-    :return: `ReportRecord` object
-    """
-    return ReportRecord(*row)
-
-
 def get_command_line_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument('--num-agents', '-n', type=int, default=50, help='number of agents to run')
@@ -46,6 +33,8 @@ def get_command_line_arguments():
     parser.add_argument('--call-length', '-l', type=int, default=10, help='average call length in seconds')
     parser.add_argument('--time-to-run', '-t', type=int, default=300, help='time to run sim')
     parser.add_argument('--clean-start', '-c', action='store_true', default=False, help='wipe db first')
+    parser.add_argument('--record', '-r', default=None, help='record dialer events here for dialer-replay.py')
+    parser.add_argument('--clock', default=clock.CLOCK, help='wall, coarse or coarse:<resolution seconds>')
     return parser.parse_args()
 
 
@@ -135,8 +124,13 @@ class Agent:
 def shutdown():
     print('Shutting down.')
     CallMetrics.shutdown()
+    if PowerDialerInterface.recorder is not None:
+        PowerDialerInterface.recorder.close()
+    PowerDialerInterface.dedupe.report()
     client = NumberManager()
     client.shutdown()
+    clock.get_clock().shutdown()
+    Memory.shutdown()
     print('Done.')
 
 
@@ -144,16 +138,29 @@ def clean_start():
     connection = sqlite3.connect(DB_NAME)
     with connection:
         cursor = connection.cursor()
-        cursor.execute('DELETE FROM CALL_RECORDS')
+        tables = {name for name, in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        # An old database keeps its calls in a CALL_RECORDS table, or in the legacy table while it's migrated, drop
+        # them rather than migrate them back in. Storage recreates the CALL_RECORDS view
+        for table in ('CALL_RECORDS', LEGACY_TABLE):
+            if table in tables:
+                cursor.execute(f'DROP TABLE {table}')
+        for table in ('CALLS', 'AGENTS'):
+            if table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+    connection.close()
 
 
 def report():
-    connection = sqlite3.connect(DB_NAME)
-    connection.row_factory = report_row_factory
-    cursor = connection.cursor()
-    cursor.execute('SELECT agent_id, COUNT(agent_id), AVG(call_end - call_start) FROM CALL_RECORDS GROUP BY agent_id')
-    for row in cursor.fetchall():
+    queries = CallMetricsQueries(DB_NAME)
+    for row in queries.agent_stats():
         print(row)
+    queries.close()
+    summary = Timeline.summary()
+    print(summary['utilization'])
+    print('Time to next call:', format_percentiles(summary['time_to_next_call'], 1, 's'))
+    for usage in Memory.usage():
+        print(usage)
+    print(f'Memory budget {Memory.budget or "unlimited"}, {len(Memory.events)} sheds')
 
 
 if __name__ == '__main__':
@@ -173,8 +180,11 @@ if __name__ == '__main__':
     logger.addHandler(handler)
 
     options = get_command_line_arguments()
+    clock.use_clock(clock.create_clock(options.clock))
     if options.clean_start:
         clean_start()
+    if options.record:
+        PowerDialerInterface.recorder = EventRecorder(options.record)
 
     print('Starting {} agents for {} seconds'.format(options.num_agents, options.time_to_run))
     try:
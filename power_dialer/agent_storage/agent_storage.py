@@ -1,12 +1,51 @@
 # -*- coding: utf-8 -*-
+import os
+from urllib.parse import urlparse
+
+from power_dialer.agent_storage.agent_storage_backend import AgentStorageBackend
 from power_dialer.agent_storage.agent_storage_handler import AgentStorageHandler
+from power_dialer.lazy_service import LazyService
+
+# memory:// for the in-process store, mmap:///path/to/file to keep it across restarts or redis://host:port/db
+AGENT_STORAGE_URL = os.environ.get('POWER_DIALER_AGENT_STORAGE', 'memory://')
+
+
+def _redis_backend(url: str) -> AgentStorageBackend:
+    from power_dialer.agent_storage.redis_agent_storage import RedisAgentStorage
+    return RedisAgentStorage.from_url(url)
+
+
+def _mmap_backend(url: str) -> AgentStorageBackend:
+    from power_dialer.agent_storage.mmap_agent_storage import AGENT_STATE_FILE, MmapAgentStorage
+    parsed = urlparse(url)
+    return MmapAgentStorage(parsed.netloc + parsed.path or AGENT_STATE_FILE)
+
+
+# URL scheme to a factory taking the URL
+BACKENDS = {
+    'memory': lambda url: AgentStorageHandler(),
+    'mmap': _mmap_backend,
+    'redis': _redis_backend,
+}
+
+
+def create_agent_storage_backend(url: str) -> AgentStorageBackend:
+    """
+    Build the agent storage backend for a URL
 
-AgentStorage = None
+    :param url: Storage URL, the scheme picks the backend
+    :return: The backend
+    """
+    scheme = urlparse(url).scheme
+    try:
+        factory = BACKENDS[scheme]
+    except KeyError:
+        raise ValueError(f'Unknown agent storage backend {url!r}') from None
+    return factory(url)
 
 
-def _create_agent_storage():
-    global AgentStorage
-    AgentStorage = AgentStorageHandler()
+def _create_agent_storage() -> AgentStorageBackend:
+    return create_agent_storage_backend(AGENT_STORAGE_URL)
 
 
-_create_agent_storage()
+AgentStorage = LazyService('agent_storage', _create_agent_storage)
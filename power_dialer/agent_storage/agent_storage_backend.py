@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List
+
+from power_dialer.dialer_state_machine import AgentState
+
+
+class AgentStorageBackend(ABC):
+    """
+    What the dialer needs from an agent state store. Missing agents read as `AgentState.offline`.
+
+    The bulk methods default to a loop, backends that talk to a server should do them in one round trip.
+    """
+
+    @abstractmethod
+    def __getitem__(self, agent_id: str) -> AgentState:
+        raise NotImplementedError
+
+    @abstractmethod
+    def __setitem__(self, agent_id: str, state: AgentState):
+        raise NotImplementedError
+
+    def get_many(self, agent_ids: Iterable[str]) -> List[AgentState]:
+        """
+        Fetch the states of several agents
+
+        :param agent_ids: Agent ids
+        :return: States in the same order as `agent_ids`
+        """
+        return [self[agent_id] for agent_id in agent_ids]
+
+    def set_many(self, states: Dict[str, AgentState]):
+        """
+        Store the states of several agents
+
+        :param states: Agent id to state
+        """
+        for agent_id, state in states.items():
+            self[agent_id] = state
+
+    @abstractmethod
+    def flush(self):
+        raise NotImplementedError
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
-from power_dialer.singleton import Singleton
+from power_dialer.singleton import AbstractSingleton
 from power_dialer.dialer_state_machine import AgentState
+from power_dialer.memory_budget import DictCache, account
+from .agent_storage_backend import AgentStorageBackend
 
 
-class AgentStorageHandler(metaclass=Singleton):
+class AgentStorageHandler(AgentStorageBackend, metaclass=AbstractSingleton):
     """
     Store information about the agent.
 
@@ -15,6 +17,9 @@ class AgentStorageHandler(metaclass=Singleton):
 
     def __init__(self):
         self._agents = {}
+        # An agent that isn't stored reads as offline, so offline agents can go for nothing
+        account(DictCache('agent_states', self, '_agents',
+                          sheddable=lambda agent_id, state: state is AgentState.offline))
 
     def __getitem__(self, agent_id) -> AgentState:
         try:
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+import logging
+import mmap
+import os
+import struct
+from threading import Lock
+from typing import Dict, List, Optional
+
+from power_dialer import clock
+from power_dialer.dialer_state_machine import AgentState
+from .agent_storage_backend import AgentStorageBackend
+
+logger = logging.getLogger('power_dialer.agent_storage.mmap_agent_storage')
+
+AGENT_STATE_FILE = 'agent_states.map'
+# Agent ids, one per line, the line number is the agent's slot
+NAMES_SUFFIX = '.agents'
+INITIAL_SLOTS = 1024
+MAGIC = b'PDAS'
+VERSION = 1
+# magic, version, slot count
+HEADER = struct.Struct('<4sHxxQ')
+# agent index + 1 (0 is an empty slot), state value, last transition time
+SLOT = struct.Struct('<IBxxxd')
+_STATES = {state.value: state for state in AgentState}
+
+
+class MmapAgentStorage(AgentStorageBackend):
+    """
+    Agent states in a memory mapped file of fixed width slots, so they survive a restart.
+
+    Each agent is interned to a slot the first time it's stored, its id is appended to a names file alongside the
+    map and the line it's on is its slot. Reads and writes are an unpack or pack in place, and reopening the file
+    only reads the names back in. A slot holds the agent's index, so one interned just before a crash, whose state
+    never made it to the map, reads as offline like any other unknown agent.
+
+    Writes go to the page cache and survive the process dying; call `sync` to have them survive the machine too.
+    One process should have the file open at a time.
+    """
+
+    def __init__(self, path: str = AGENT_STATE_FILE, slots: int = INITIAL_SLOTS):
+        self.path = path
+        self.names_path = path + NAMES_SUFFIX
+        self._lock = Lock()
+        self._slots: Dict[str, int] = {}
+        self._names = self._load_names()
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        self.capacity = self._load_capacity(max(slots, len(self._slots), 1))
+        self._map = mmap.mmap(self._file.fileno(), self._size(self.capacity))
+
+    def __getitem__(self, agent_id: str) -> AgentState:
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            # No agent information, so they're new or their information got expunged, so either way they're offline.
+            return AgentState.offline
+        index, state, _ = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+        return _STATES[state] if index == slot + 1 else AgentState.offline
+
+    def __setitem__(self, agent_id: str, state: AgentState):
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            slot = self._intern(agent_id)
+        offset = HEADER.size + slot * SLOT.size
+        index, current, _ = SLOT.unpack_from(self._map, offset)
+        if index != slot + 1 or current != state.value:
+            SLOT.pack_into(self._map, offset, slot + 1, state.value, clock.now())
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def last_transition(self, agent_id: str) -> Optional[float]:
+        """
+        :return: When the agent's stored state last changed, None for an unknown agent
+        """
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            return None
+        index, _, timestamp = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)
+        return timestamp if index == slot + 1 else None
+
+    def agents(self) -> List[str]:
+        return list(self._slots)
+
+    def flush(self):
+        with self._lock:
+            self._map[HEADER.size:] = bytes(self.capacity * SLOT.size)
+            self._names.truncate(0)
+            self._slots = {}
+
+    def sync(self):
+        """
+        Write the map and names through to disk
+        """
+        self._map.flush()
+        self._names.flush()
+        os.fsync(self._names.fileno())
+
+    def close(self):
+        self.sync()
+        self._map.close()
+        self._file.close()
+        self._names.close()
+
+    def _intern(self, agent_id: str) -> int:
+        if '\n' in agent_id:
+            raise ValueError(f'Agent id {agent_id!r} contains a newline')
+        with self._lock:
+            slot = self._slots.get(agent_id)
+            if slot is not None:
+                return slot
+            slot = len(self._slots)
+            if slot >= self.capacity:
+                self._grow(self.capacity * 2)
+            # The name goes down before the slot is used, a slot never refers to a name that was lost
+            self._names.write(agent_id.encode('utf-8') + b'\n')
+            self._names.flush()
+            self._slots[agent_id] = slot
+            return slot
+
+    def _grow(self, capacity: int):
+        self._file.truncate(self._size(capacity))
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, VERSION, capacity))
+        self._file.flush()
+        # Readers may still hold the old map, it maps the same file so it's left for the collector rather than closed
+        self._map = mmap.mmap(self._file.fileno(), self._size(capacity))
+        self.capacity = capacity
+        logger.info('Agent state map %s grown to %d slots', self.path, capacity)
+
+    def _load_names(self):
+        """
+        Read the interned ids back, dropping a line torn by a crash, and open the names file for appending
+        """
+        data = b''
+        if os.path.exists(self.names_path):
+            with open(self.names_path, 'rb') as f:
+                data = f.read()
+        complete = data.rfind(b'\n') + 1
+        names = open(self.names_path, 'ab')
+        if complete < len(data):
+            logger.warning('Dropping torn agent id at the end of %s', self.names_path)
+            names.truncate(complete)
+        for slot, name in enumerate(data[:complete].split(b'\n')[:-1]):
+            self._slots[name.decode('utf-8')] = slot
+        return names
+
+    def _load_capacity(self, slots: int) -> int:
+        """
+        Check an existing file's header, or write a new one, and make sure the file covers every slot
+        """
+        header = self._file.read(HEADER.size)
+        if len(header) == HEADER.size:
+            magic, version, capacity = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{self.path} is not a version {VERSION} agent state map')
+        else:
+            capacity = 0
+        if capacity < slots:
+            capacity = slots
+            self._file.seek(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, capacity))
+        if os.fstat(self._file.fileno()).st_size < self._size(capacity):
+            self._file.truncate(self._size(capacity))
+        self._file.flush()
+        return capacity
+
+    @staticmethod
+    def _size(capacity: int) -> int:
+        return HEADER.size + capacity * SLOT.size
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Iterable, List
+
+from power_dialer.dialer_state_machine import AgentState
+from .agent_storage_backend import AgentStorageBackend
+from .redis_connection import RedisConnectionPool, RedisError
+
+# HMGET/HSET argument lists are split so one huge batch doesn't stall the server
+CHUNK_SIZE = 512
+# A state is stored as the single byte of its value
+_ENCODE = {state: b'%d' % state.value for state in AgentState}
+_DECODE = {code: state for state, code in _ENCODE.items()}
+
+
+class RedisAgentStorage(AgentStorageBackend):
+    """
+    Agent states in a single Redis hash keyed by agent id.
+
+    A small hash is packed by Redis into a listpack, so this costs a few bytes per agent rather than a key each.
+    Bulk reads and writes are pipelined, a batch of any size is one round trip.
+    """
+
+    def __init__(self, pool: RedisConnectionPool, key: str = 'power_dialer:agents'):
+        self.pool = pool
+        self.key = key
+
+    @classmethod
+    def from_url(cls, url: str) -> 'RedisAgentStorage':
+        return cls(RedisConnectionPool.from_url(url))
+
+    def __getitem__(self, agent_id: str) -> AgentState:
+        return self._decode(self.pool.execute('HGET', self.key, agent_id))
+
+    def __setitem__(self, agent_id: str, state: AgentState):
+        self._check(self.pool.execute('HSET', self.key, agent_id, _ENCODE[state]))
+
+    def get_many(self, agent_ids: Iterable[str]) -> List[AgentState]:
+        agent_ids = list(agent_ids)
+        if not agent_ids:
+            return []
+        commands = [('HMGET', self.key, *agent_ids[i:i + CHUNK_SIZE]) for i in range(0, len(agent_ids), CHUNK_SIZE)]
+        states = []
+        for reply in self.pool.pipeline(commands):
+            self._check(reply)
+            states.extend(self._decode(value) for value in reply)
+        return states
+
+    def set_many(self, states: Dict[str, AgentState]):
+        if not states:
+            return
+        arguments = []
+        for agent_id, state in states.items():
+            arguments.append(agent_id)
+            arguments.append(_ENCODE[state])
+        step = CHUNK_SIZE * 2
+        commands = [('HSET', self.key, *arguments[i:i + step]) for i in range(0, len(arguments), step)]
+        for reply in self.pool.pipeline(commands):
+            self._check(reply)
+
+    def flush(self):
+        self._check(self.pool.execute('DEL', self.key))
+
+    @staticmethod
+    def _decode(value) -> AgentState:
+        if isinstance(value, RedisError):
+            raise value
+        if value is None:
+            # No agent information, so they're new or their information got expunged, so either way they're offline.
+            return AgentState.offline
+        return _DECODE[value]
+
+    @staticmethod
+    def _check(reply):
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import logging
+import socket
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from threading import BoundedSemaphore, Lock
+from typing import List, Sequence
+from urllib.parse import urlparse
+
+logger = logging.getLogger('power_dialer.agent_storage.redis_connection')
+
+
+class RedisError(Exception):
+    """
+    An error reply from the server
+    """
+
+
+class RedisConnection:
+    """
+    Just enough of the Redis serialization protocol (RESP) to pipeline commands.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, timeout: float = 1.0):
+        self._socket = socket.create_connection((host, port), timeout)
+        # Commands are small and we always wait for the reply, don't let Nagle hold them back
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        return self.pipeline((args,))[0]
+
+    def pipeline(self, commands: Sequence[Sequence]) -> List:
+        """
+        Send all the commands in one write then read all the replies.
+
+        :param commands: Each command is a sequence of arguments
+        :return: The replies in order. Error replies are returned as `RedisError` rather than raised so one bad
+                 command doesn't lose the rest.
+        """
+        self._socket.sendall(b''.join(self._encode(command) for command in commands))
+        return [self._read_reply() for _ in commands]
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+    @staticmethod
+    def _encode(command: Sequence) -> bytes:
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if isinstance(arg, str):
+                arg = arg.encode('utf-8')
+            elif isinstance(arg, int):
+                arg = b'%d' % arg
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read_reply(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body
+        if kind == b'-':
+            return RedisError(body.decode('utf-8', 'replace'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(body)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f'Unexpected reply {line!r}')
+
+
+class RedisConnectionPool:
+    """
+    A bounded pool of connections. Connections that fail are thrown away rather than returned.
+    """
+
+    def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 0, max_connections: int = 8,
+                 timeout: float = 1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._idle = LifoQueue()
+        self._slots = BoundedSemaphore(max_connections)
+        self._lock = Lock()
+        self.round_trips = 0
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisConnectionPool':
+        """
+        :param url: redis://host:port/db
+        """
+        parts = urlparse(url)
+        db = int(parts.path.lstrip('/') or 0)
+        return cls(parts.hostname or 'localhost', parts.port or 6379, db, **kwargs)
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError('No Redis connection available')
+        connection = None
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                connection = RedisConnection(self.host, self.port, self.db, self.timeout)
+            yield connection
+            self._idle.put(connection)
+        except (OSError, ConnectionError):
+            logger.exception('Redis connection to %s:%d failed', self.host, self.port)
+            if connection is not None:
+                connection.close()
+            raise
+        finally:
+            self._slots.release()
+
+    def pipeline(self, commands: Sequence[Sequence]) -> List:
+        with self.connection() as connection:
+            replies = connection.pipeline(commands)
+        with self._lock:
+            self.round_trips += 1
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline((args,))[0]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import logging
+from array import array
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from . import clock
+from .dialer_state_machine import AgentState
+from .latency import percentiles
+from .lazy_service import LazyService
+
+logger = logging.getLogger('power_dialer.agent_timeline')
+
+# Transitions kept per agent, older ones are overwritten
+TIMELINE_SIZE = 1024
+_STATES = {state.value: state for state in AgentState}
+
+
+@dataclass
+class Utilization:
+    idle: float = 0.0
+    busy: float = 0.0
+    offline: float = 0.0
+
+    @property
+    def utilization(self) -> float:
+        """
+        Share of logged in time spent on calls
+        """
+        logged_in = self.idle + self.busy
+        return self.busy / logged_in if logged_in else 0.0
+
+    def __repr__(self):
+        return f'Idle: {self.idle:8.1f}s Busy: {self.busy:8.1f}s Utilization: {self.utilization:6.1%}'
+
+
+class _Ring:
+    """
+    One agent's transitions, preallocated so recording one is two stores and an index bump
+    """
+    __slots__ = ('times', 'states', 'head', 'count')
+
+    def __init__(self, size: int):
+        self.times = array('d', bytes(8 * size))
+        self.states = bytearray(size)
+        self.head = 0
+        self.count = 0
+
+    def record(self, state: int, timestamp: float):
+        head = self.head
+        self.times[head] = timestamp
+        self.states[head] = state
+        head += 1
+        size = len(self.states)
+        self.head = 0 if head == size else head
+        if self.count < size:
+            self.count += 1
+
+    def events(self) -> List[Tuple[float, AgentState]]:
+        size = len(self.states)
+        start = (self.head - self.count) % size
+        return [(self.times[i % size], _STATES[self.states[i % size]]) for i in range(start, start + self.count)]
+
+
+class AgentTimeline:
+    """
+    When each agent changed state, recorded by `PowerDialer` for every transition. Each agent gets a fixed size ring
+    of its most recent transitions; utilization, idle gaps and time to next call are worked out from them when
+    asked for, nothing is computed on the event path.
+    """
+
+    def __init__(self, size: int = TIMELINE_SIZE):
+        self.size = size
+        self._rings: Dict[str, _Ring] = {}
+        self._lock = Lock()
+
+    def record(self, agent_id: str, state: AgentState, timestamp: float = None):
+        ring = self._rings.get(agent_id)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.setdefault(agent_id, _Ring(self.size))
+        ring.record(state.value, clock.now() if timestamp is None else timestamp)
+
+    def agents(self) -> List[str]:
+        return sorted(self._rings)
+
+    def events(self, agent_id: str) -> List[Tuple[float, AgentState]]:
+        """
+        :return: The agent's recorded transitions, oldest first, as (timestamp, new state)
+        """
+        ring = self._rings.get(agent_id)
+        return ring.events() if ring is not None else []
+
+    def utilization(self, agent_id: str, start: float = None, end: float = None) -> Utilization:
+        """
+        Time in each state between `start` (the oldest transition by default) and `end` (now by default)
+        """
+        end = clock.now() if end is None else end
+        used = Utilization()
+        for state, began, ended in self._periods(agent_id, end):
+            if start is not None:
+                began = max(began, start)
+            ended = min(ended, end)
+            if ended > began:
+                setattr(used, state.name, getattr(used, state.name) + ended - began)
+        return used
+
+    def idle_gaps(self, agent_id: str) -> List[float]:
+        """
+        :return: How long each finished idle stretch lasted, whatever ended it
+        """
+        return [ended - began for state, began, ended in self._periods(agent_id) if state is AgentState.idle]
+
+    def time_to_next_call(self, agent_id: str) -> List[float]:
+        """
+        :return: For each call, how long the agent had been idle before it started
+        """
+        periods = self._periods(agent_id)
+        return [ended - began for (state, began, ended), following in zip(periods, periods[1:])
+                if state is AgentState.idle and following[0] is AgentState.busy]
+
+    def summary(self, start: float = None, end: float = None) -> dict:
+        """
+        Across every agent: total time per state, utilization and time to next call percentiles
+        """
+        total = Utilization()
+        waits = []
+        for agent_id in self.agents():
+            used = self.utilization(agent_id, start, end)
+            total.idle += used.idle
+            total.busy += used.busy
+            total.offline += used.offline
+            waits.extend(self.time_to_next_call(agent_id))
+        return {'utilization': total, 'time_to_next_call': percentiles(waits)}
+
+    def _periods(self, agent_id: str, end: float = None) -> List[Tuple[AgentState, float, float]]:
+        """
+        The agent's history as (state, from, to), repeats of a state are merged. The current state runs to `end`,
+        without an end it is left out as it hasn't finished.
+        """
+        periods = []
+        state = began = None
+        for timestamp, new_state in self.events(agent_id):
+            if new_state is state:
+                continue
+            if state is not None:
+                periods.append((state, began, timestamp))
+            state, began = new_state, timestamp
+        if state is not None and end is not None:
+            periods.append((state, began, end))
+        return periods
+
+
+Timeline = LazyService('agent_timeline', AgentTimeline)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from power_dialer import clock
+from power_dialer.agent_storage.agent_storage import AgentStorage
+from power_dialer.call_metrics.call_metrics import CallMetrics
+from .dialer_state_machine import AgentState
+from .event_log import CALLBACKS, EventType
+from .leads.lead_source import LeadsExhausted
+from .number_manager import NumberManager
+from .power_dialer import DIAL_RATIO, PowerDialer
+from .services import dial
+
+logger = logging.getLogger('power_dialer.batch_dialer')
+
+
+class BatchEvent(NamedTuple):
+    agent_id: str
+    event_type: EventType
+    number: Optional[str] = None
+    event_id: Optional[str] = None
+    # When it happened, seconds since the epoch as `clock.now()`; otherwise calls are timed as they're handled
+    timestamp: Optional[float] = None
+
+    @property
+    def args(self) -> tuple:
+        return () if self.number is None else (self.number,)
+
+
+class _Batch:
+    """
+    What a batch's handlers asked for: agents waiting on a call and call starts and ends, in order
+    """
+    __slots__ = ('pending', 'calls')
+
+    def __init__(self):
+        self.pending: List['_BatchAgent'] = []
+        self.calls: List[Tuple[bool, str, str, datetime.datetime]] = []
+
+
+class _BatchAgent(PowerDialer):
+    """
+    A `PowerDialer` whose side effects are collected by the batch instead of done one event at a time
+    """
+
+    def __init__(self, agent_id: str, dial_ratio: int, state: AgentState, batch: _Batch, campaign: str = None):
+        self._batch = batch
+        # The timestamp of the event being handled, if it has one
+        self.event_time: Optional[float] = None
+        super().__init__(agent_id, dial_ratio, state, campaign)
+
+    def _save_agent_state(self):
+        # Saved with everyone else's at the end of the batch
+        pass
+
+    def _initiate_call(self):
+        self._batch.pending.append(self)
+
+    def _record_call_start(self, phone_number: str):
+        self._batch.calls.append((True, self.agent_id, phone_number, self._call_time()))
+
+    def _record_call_end(self, phone_number: str):
+        self._batch.calls.append((False, self.agent_id, phone_number, self._call_time()))
+
+    def _call_time(self) -> datetime.datetime:
+        if self.event_time is None:
+            return clock.utcnow()
+        return datetime.datetime.utcfromtimestamp(self.event_time)
+
+
+class BatchDialer:
+    """
+    Handle a batch of events for many agents the way a queue consumer receives them.
+
+    Events are grouped by agent, keeping each agent's events in order, and run through the same handlers as
+    `PowerDialer`. The agents' states are read and written in bulk, every call the batch places gets its number from
+    one reservation, and finished calls go to metrics in one enqueue.
+    """
+
+    def __init__(self, dial_ratio: int = DIAL_RATIO, campaign: str = None):
+        """
+        :param dial_ratio: Calls placed for an agent at a time
+        :param campaign: The campaign every agent in a batch is dialing for, see `NumberManager.add_campaign`
+        """
+        self.dial_ratio = dial_ratio
+        self.campaign = campaign
+
+    def process(self, events: Sequence[BatchEvent]) -> Dict[str, List[str]]:
+        """
+        :param events: Events for any number of agents, in the order they were received
+        :return: Agent id to the numbers dialed for it
+        """
+        batch = _Batch()
+        by_agent: Dict[str, List[BatchEvent]] = {}
+        for event in events:
+            by_agent.setdefault(event.agent_id, []).append(event)
+        agent_ids = list(by_agent)
+        states = AgentStorage.get_many(agent_ids)
+
+        agents = {}
+        for agent_id, state in zip(agent_ids, states):
+            agent = agents[agent_id] = _BatchAgent(agent_id, self.dial_ratio, state, batch, self.campaign)
+            for event in by_agent[agent_id]:
+                agent.event_time = event.timestamp
+                getattr(agent, CALLBACKS[event.event_type])(*event.args, event_id=event.event_id)
+
+        self._dial(batch.pending)
+        AgentStorage.set_many({agent_id: agent._agent_state.state for agent_id, agent in agents.items()})
+        if batch.calls:
+            CallMetrics.calls_batch(batch.calls)
+        return {agent_id: agent.numbers for agent_id, agent in agents.items()}
+
+    def _dial(self, pending: List[_BatchAgent]):
+        if not pending:
+            return
+        try:
+            numbers = NumberManager().get_numbers(len(pending), self.campaign)
+        except LeadsExhausted:
+            logger.warning('No leads left for %d calls', len(pending))
+            return
+        if len(numbers) < len(pending):
+            logger.warning('Only %d leads left for %d calls', len(numbers), len(pending))
+        for agent, number in zip(pending, numbers):
+            agent.numbers.append(number)
+            dial(agent.agent_id, number)
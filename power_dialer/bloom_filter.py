@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import math
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(key: int) -> int:
+    """
+    splitmix64 finalizer, spreads nearby phone numbers across the whole 64 bit range
+    """
+    key = (key + 0x9E3779B97F4A7C15) & _MASK
+    key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & _MASK
+    return key ^ (key >> 31)
+
+
+class BloomFilter:
+    """
+    Set membership for integer keys in a fixed amount of memory.
+
+    There are no false negatives, false positives happen at about `error_rate` once `capacity` keys have been added.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+    def positions(self, key: int) -> list:
+        """
+        Bit positions for a key, filters of the same size and hash count share these so a key only needs hashing
+        once to check several of them, see `add_at` and `contains_at`
+        """
+        return self._positions(key)
+
+    def add_at(self, positions: list):
+        bits = self._bits
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def contains_at(self, positions: list) -> bool:
+        bits = self._bits
+        for p in positions:
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def _positions(self, key: int):
+        # Double hashing, two halves of one good hash give us as many as we need
+        h = _mix(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: int):
+        bits = self._bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def add_if_absent(self, key: int) -> bool:
+        """
+        Add a key
+
+        :return: True if the key was not (probably) there already
+        """
+        bits = self._bits
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, key: int) -> bool:
+        bits = self._bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self):
+        self._bits = bytearray(len(self._bits))
+        self.count = 0
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import pickle
+import struct
+import tempfile
+from dataclasses import dataclass
+from enum import Enum, auto
+from queue import Queue, Full
+
+logger = logging.getLogger('power_dialer.bounded_queue')
+
+# Every spilled item is a little endian length followed by its pickle
+_LENGTH = struct.Struct('<I')
+
+
+class OverflowPolicy(Enum):
+    # Wait up to the queue timeout for room, then raise `queue.Full`
+    block = auto()
+    # Throw the item away and count it
+    drop = auto()
+    # Append the item to a disk buffer that is fed back, in order, as the consumer catches up
+    spill = auto()
+
+
+@dataclass
+class QueueStats:
+    name: str
+    depth: int
+    spilled_depth: int
+    high_water: int
+    dropped: int
+    spilled: int
+
+
+class SpillBuffer:
+    """
+    Append-only disk buffer, items are read back in the order they were written.
+
+    The file is only created on the first spill and is truncated whenever it drains, so a healthy consumer costs
+    nothing on disk.
+    """
+
+    def __init__(self, prefix: str = 'powerdialer-', directory: str = None):
+        self._prefix = prefix
+        self._directory = directory
+        self._file = None
+        self._read_offset = 0
+        self._write_offset = 0
+        self.path = None
+        self.count = 0
+
+    def append(self, item):
+        if self._file is None:
+            fd, self.path = tempfile.mkstemp(prefix=self._prefix, suffix='.spill', dir=self._directory)
+            self._file = os.fdopen(fd, 'w+b')
+        payload = pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+        self._file.seek(self._write_offset)
+        self._file.write(_LENGTH.pack(len(payload)))
+        self._file.write(payload)
+        self._write_offset += _LENGTH.size + len(payload)
+        self.count += 1
+
+    def pop(self):
+        self._file.seek(self._read_offset)
+        length, = _LENGTH.unpack(self._file.read(_LENGTH.size))
+        item = pickle.loads(self._file.read(length))
+        self._read_offset += _LENGTH.size + length
+        self.count -= 1
+        if not self.count:
+            # Drained, reclaim the disk
+            self._file.truncate(0)
+            self._read_offset = self._write_offset = 0
+        return item
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self.path)
+            self._file = None
+            self.path = None
+        self._read_offset = self._write_offset = 0
+        self.count = 0
+
+
+class BoundedQueue(Queue):
+    """
+    A `Queue` with a capacity and an explicit policy for what happens when the consumer falls behind.
+
+    `None` is used as the shutdown sentinel throughout the dialer, so it is never dropped or refused; it is queued
+    behind anything already waiting.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: OverflowPolicy = OverflowPolicy.block, timeout: float = None,
+                 name: str = 'queue', spill_directory: str = None):
+        super().__init__(maxsize)
+        self.policy = policy
+        self.timeout = timeout
+        self.name = name
+        self.high_water = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._spill = SpillBuffer(f'powerdialer-{name}-', spill_directory)
+
+    def configure(self, maxsize: int = None, policy: OverflowPolicy = None, timeout: float = None):
+        """
+        Change the capacity or overflow policy of a live queue. Items already on disk stay there, and puts keep
+        following them to disk until it drains, whatever the new policy, so the consumer still sees them in order.
+
+        :param maxsize: New capacity, 0 for unbounded
+        :param policy: New overflow policy
+        :param timeout: Seconds to wait for room under `OverflowPolicy.block`
+        """
+        with self.mutex:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if policy is not None:
+                self.policy = policy
+            if timeout is not None:
+                self.timeout = timeout
+            self.not_full.notify_all()
+
+    def put(self, item, block=True, timeout=None):
+        # Anything on disk, e.g. from before a policy change, has to come out before new items
+        if item is None or self.maxsize <= 0 or self.policy is OverflowPolicy.spill or self._spill.count:
+            self._put_or_spill(item)
+        elif self.policy is OverflowPolicy.block:
+            super().put(item, block, self.timeout if timeout is None else timeout)
+        else:
+            try:
+                super().put(item, block=False)
+            except Full:
+                with self.mutex:
+                    self.dropped += 1
+                    dropped = self.dropped
+                # Don't flood the log when we're already in trouble
+                if dropped & (dropped - 1) == 0:
+                    logger.warning('Queue %s full, %d items dropped', self.name, dropped)
+
+    def qsize(self):
+        with self.mutex:
+            return self._qsize() + self._spill.count
+
+    def stats(self) -> QueueStats:
+        with self.mutex:
+            return QueueStats(self.name, self._qsize() + self._spill.count, self._spill.count, self.high_water,
+                              self.dropped, self.spilled)
+
+    def report(self):
+        """
+        Log the queue statistics
+        """
+        stats = self.stats()
+        logger.info('Queue %s: depth %d (%d on disk), high water %d, dropped %d, spilled %d',
+                    stats.name, stats.depth, stats.spilled_depth, stats.high_water, stats.dropped, stats.spilled)
+
+    def reset_high_water(self):
+        with self.mutex:
+            self.high_water = self._qsize() + self._spill.count
+
+    def page_out(self, count: int) -> int:
+        """
+        Move up to `count` of the most recently queued items to the disk buffer to free memory. They're read back
+        in order. Only a queue whose puts follow the disk buffer can page out, and only while nothing is on disk yet.
+        The oldest item always stays in memory.
+
+        :return: Items paged out
+        """
+        with self.mutex:
+            if self._spill.count or (self.maxsize > 0 and self.policy is not OverflowPolicy.spill):
+                return 0
+            # `get` waits on the items in memory and refills from disk as it takes them, so the head stays
+            count = min(count, self._qsize() - 1)
+            if count <= 0:
+                return 0
+            paged = [self.queue.pop() for _ in range(count)]
+            for item in reversed(paged):
+                self._spill.append(item)
+            self.spilled += count
+            return count
+
+    def close(self):
+        """
+        Throw away anything spilled to disk and remove the buffer
+        """
+        with self.mutex:
+            self._spill.close()
+
+    def _put_or_spill(self, item):
+        """
+        Queue an item regardless of capacity. Once anything is on disk everything goes to disk until it drains so
+        the consumer still sees items in order.
+        """
+        with self.not_full:
+            over = 0 < self.maxsize <= self._qsize()
+            if self._spill.count or (over and self.policy is OverflowPolicy.spill):
+                self._spill.append(item)
+                self.spilled += 1
+                self._track_high_water()
+            else:
+                self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    # These are called by `Queue` with the mutex held
+    def _put(self, item):
+        super()._put(item)
+        self._track_high_water()
+
+    def _get(self):
+        item = super()._get()
+        if self._spill.count:
+            # Refill from disk as room becomes available
+            super()._put(self._spill.pop())
+        return item
+
+    def _track_high_water(self):
+        depth = self._qsize() + self._spill.count
+        if depth > self.high_water:
+            self.high_water = depth
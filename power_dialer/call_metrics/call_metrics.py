@@ -1,13 +1,11 @@
 # -*- coding: utf-8 -*-
-from power_dialer.call_metrics.call_metrics_handler import CallMetricsHandler
-
-CallMetrics = None
+from power_dialer.lazy_service import LazyService
 
 
 def _create_call_metrics():
-    global CallMetrics
-    if not CallMetrics:
-        CallMetrics = CallMetricsHandler()
+    # Imported here, sqlite and the storage thread are only paid for when metrics are first recorded
+    from power_dialer.call_metrics.call_metrics_handler import CallMetricsHandler
+    return CallMetricsHandler()
 
 
-_create_call_metrics()
+CallMetrics = LazyService('call_metrics', _create_call_metrics)
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
+import atexit
 import datetime
 import logging
 import os
 import tempfile
-from queue import Queue
 from threading import Thread
+from typing import List, Tuple
 
 from .call_metrics_relational_storage import CallMetricsRelationalStorage
 from .call_record import CallRecord
+from .call_record_log import CallRecordLog
+from power_dialer import clock
+from power_dialer.bounded_queue import BoundedQueue, OverflowPolicy
+from power_dialer.memory_budget import DictCache, QueueCache, account
+from power_dialer.phone_number import PhoneNumber
 from power_dialer.singleton import Singleton
 
 logger = logging.getLogger('power_dialer.call_metrics.handler')
@@ -17,6 +23,9 @@ logger = logging.getLogger('power_dialer.call_metrics.handler')
 # represent that.
 # Depending on the call volume this might involve sending it via Kinesis instead of directly persisting it.
 DB_NAME = os.path.join(tempfile.gettempdir(), 'powerdialer.db')
+# If SQLite stalls we'd rather page records out to disk than grow without bound
+STORAGE_QUEUE_SIZE = 10000
+STORAGE_QUEUE_POLICY = OverflowPolicy.spill
 
 
 #  We're going to keep track of the agent call volume and duration
@@ -25,10 +34,17 @@ class CallMetricsHandler(metaclass=Singleton):
     Pretend interface to a distributed cache
     """
 
-    def __init__(self, db_name=DB_NAME, synchronous=False):
+    def __init__(self, db_name=DB_NAME, synchronous=False, queue_size: int = STORAGE_QUEUE_SIZE,
+                 overflow_policy: OverflowPolicy = STORAGE_QUEUE_POLICY, overflow_timeout: float = None,
+                 log_name: str = None):
         self._volatile = {}
-        self._storage_queue = Queue()
-        self._relation_client = CallMetricsRelationalStorage(self._storage_queue, db_name)
+        self._storage_queue = BoundedQueue(queue_size, overflow_policy, overflow_timeout, name='storage_queue')
+        # With a log, finished calls survive a crash; the storage thread tails the log instead of the queue
+        self._log = None
+        if log_name:
+            self._log = CallRecordLog(log_name)
+            atexit.register(self._log.close)
+        self._relation_client = CallMetricsRelationalStorage(self._storage_queue, db_name, self._log)
         # Start a thread that handles storing call info because in testing we'll be making multiple dialers
         self._storage_thread = None
         if not synchronous:
@@ -36,25 +52,59 @@ class CallMetricsHandler(metaclass=Singleton):
             t.daemon = True
             t.start()
             self._storage_thread = t
+        # A call shed while in progress isn't recorded when it ends
+        account(DictCache('calls_in_progress', self, '_volatile', priority=2))
+        account(QueueCache(self._storage_queue))
 
     def call_started(self, agent_id, number):
-        call = CallRecord(agent_id, number, datetime.datetime.utcnow())
+        call = CallRecord(agent_id, PhoneNumber.parse(number), clock.utcnow())
         self._volatile[agent_id] = call
 
     def call_ended(self, agent_id, number):
-        call = self._volatile[agent_id]
-        if call.number != number:
-            # oops something went wrong here.
+        call = self._volatile.pop(agent_id, None)
+        if call is None or call.number != number:
+            # oops something went wrong here, or the call was shed to stay in the memory budget.
             logging.error('Call ended for call not in progress: Agent Id: %s, number: %s', agent_id, number)
-            del self._volatile[agent_id]
             return
-        call.ended = datetime.datetime.utcnow()
-        del self._volatile[agent_id]
-        self._storage_queue.put(call)
+        call.ended = clock.utcnow()
+        if self._log is not None:
+            self._log.append(call)
+        else:
+            self._storage_queue.put(call)
+
+    def calls_batch(self, calls: List[Tuple[bool, str, str, datetime.datetime]]):
+        """
+        Calls started and ended by a batch of events, in the order they happened. Finished calls go to storage
+        together in one enqueue.
+
+        :param calls: (started, agent id, number, when), started is False for a call ending and when is UTC as
+            `clock.utcnow()`
+        """
+        finished = []
+        for started, agent_id, number, when in calls:
+            if started:
+                self._volatile[agent_id] = CallRecord(agent_id, PhoneNumber.parse(number), when)
+                continue
+            call = self._volatile.pop(agent_id, None)
+            if call is None or call.number != number:
+                logging.error('Call ended for call not in progress: Agent Id: %s, number: %s', agent_id, number)
+                continue
+            call.ended = when
+            finished.append(call)
+        if not finished:
+            return
+        if self._log is not None:
+            self._log.append_many(finished)
+        else:
+            self._storage_queue.put(finished)
 
     def shutdown(self):
         logger.info('Shutting Down')
+        if self._log is not None:
+            self._log.close()
+            return
         self._storage_queue.put(None)
+        self._storage_queue.report()
         # Uncomment to clean up between runs
         # os.unlink(DB_NAME)
 
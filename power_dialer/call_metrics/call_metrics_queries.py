@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+import sqlite3
+from contextlib import contextmanager
+from dataclasses import dataclass
+from queue import Queue, Empty
+from threading import Lock
+from typing import List, Optional
+
+from .call_metrics_handler import DB_NAME
+from .call_record import CallRecord
+from power_dialer.phone_number import format_number, number_value
+
+logger = logging.getLogger('power_dialer.call_metrics.queries')
+
+POOL_SIZE = 4
+
+AGENT_STATS_QUERY = """SELECT AGENTS.agent_id, COUNT(*), SUM(call_end - call_start) / 1000.0
+                       FROM CALLS JOIN AGENTS ON AGENTS.id = CALLS.agent {where}
+                       GROUP BY CALLS.agent
+                       ORDER BY AGENTS.agent_id
+                    """
+
+AGENT_WHERE = 'WHERE CALLS.agent = (SELECT id FROM AGENTS WHERE agent_id = ?)'
+
+CALLS_BETWEEN_QUERY = """SELECT AGENTS.agent_id, number, call_start, call_end
+                         FROM CALLS INDEXED BY calls_start_idx JOIN AGENTS ON AGENTS.id = CALLS.agent
+                         WHERE call_start >= ? AND call_start < ?
+                         ORDER BY call_start
+                      """
+
+AGENT_CALLS_BETWEEN_QUERY = """SELECT AGENTS.agent_id, number, call_start, call_end
+                               FROM CALLS INDEXED BY calls_agent_idx JOIN AGENTS ON AGENTS.id = CALLS.agent
+                               WHERE CALLS.agent = (SELECT id FROM AGENTS WHERE agent_id = ?)
+                                 AND call_start >= ? AND call_start < ?
+                               ORDER BY call_start
+                            """
+
+LAST_CALL_QUERY = """SELECT AGENTS.agent_id, number, call_start, call_end
+                     FROM CALLS INDEXED BY calls_number_idx JOIN AGENTS ON AGENTS.id = CALLS.agent
+                     WHERE number = ?
+                     ORDER BY call_start DESC
+                     LIMIT 1
+                  """
+
+
+@dataclass
+class AgentStats:
+    agent_id: str
+    number_of_calls: int
+    total_call_time: float
+
+    @property
+    def average_call_time(self) -> float:
+        return self.total_call_time / self.number_of_calls if self.number_of_calls else 0.0
+
+    def __repr__(self):
+        return f'Agent: {self.agent_id:10s} # Calls: {self.number_of_calls:-3d}, ' \
+               f'Avg Call Time: {self.average_call_time:5.2f}s'
+
+
+def _agent_stats(row: tuple) -> AgentStats:
+    return AgentStats(*row)
+
+
+def _call_record(row: tuple) -> CallRecord:
+    agent_id, number, started, ended = row
+    # Stored as milliseconds of `datetime.timestamp()`, this gives back the datetime that was stored
+    return CallRecord(agent_id, format_number(str(number)), datetime.datetime.fromtimestamp(started / 1000),
+                      datetime.datetime.fromtimestamp(ended / 1000))
+
+
+def _millis(when: datetime.datetime) -> int:
+    return round(when.timestamp() * 1000)
+
+
+class CallMetricsQueries:
+    """
+    Read side of the call metrics. A small pool of read only connections, the database is in WAL mode so these read
+    a snapshot beside the storage thread's writes instead of queueing behind them.
+
+    Queries read the integer tables, while an old database is being migrated its calls show up chunk by chunk.
+
+    Safe to share between threads.
+    """
+
+    def __init__(self, database: str = DB_NAME, pool_size: int = POOL_SIZE):
+        self.database = database
+        self.pool_size = pool_size
+        self._idle = Queue()
+        self._opened = 0
+        # Threads waiting in `_acquire` for a connection to come back, `close` wakes each with a None
+        self._waiting = 0
+        self._lock = Lock()
+        self.closed = False
+
+    def agent_stats(self, agent_id: str = None) -> List[AgentStats]:
+        """
+        Calls and call time per agent
+
+        :param agent_id: Just this agent, otherwise every agent
+        :return: Stats ordered by agent id
+        """
+        if agent_id is None:
+            return self._fetch(AGENT_STATS_QUERY.format(where=''), (), _agent_stats)
+        return self._fetch(AGENT_STATS_QUERY.format(where=AGENT_WHERE), (agent_id,), _agent_stats)
+
+    def calls_between(self, start: datetime.datetime, end: datetime.datetime,
+                      agent_id: str = None) -> List[CallRecord]:
+        """
+        Calls started in [start, end)
+
+        :param start: From
+        :param end: Up to, but not including
+        :param agent_id: Just this agent's calls
+        :return: Calls in start order
+        """
+        if agent_id is None:
+            return self._fetch(CALLS_BETWEEN_QUERY, (_millis(start), _millis(end)), _call_record)
+        return self._fetch(AGENT_CALLS_BETWEEN_QUERY, (agent_id, _millis(start), _millis(end)), _call_record)
+
+    def last_call_to(self, number: str) -> Optional[CallRecord]:
+        """
+        :param number: The number, in any format
+        :return: The most recent call to it, None if it has never been called
+        """
+        calls = self._fetch(LAST_CALL_QUERY, (number_value(number),), _call_record)
+        return calls[0] if calls else None
+
+    def close(self):
+        """
+        Close the idle connections, and the busy ones as they come back. Threads waiting for a connection are woken
+        and raise `sqlite3.ProgrammingError`, as any query after this does.
+        """
+        with self._lock:
+            self.closed = True
+            waiting = self._waiting
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                break
+            if connection is not None:
+                connection.close()
+        for _ in range(waiting):
+            self._idle.put(None)
+
+    def _fetch(self, query: str, parameters: tuple, factory) -> list:
+        with self._connection() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+        return [factory(row) for row in rows]
+
+    @contextmanager
+    def _connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            # Under the lock so `close` can't miss a connection coming back as it closes the idle ones
+            with self._lock:
+                closed = self.closed
+                if not closed:
+                    self._idle.put(connection)
+            if closed:
+                connection.close()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            connection = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                if self.closed:
+                    raise sqlite3.ProgrammingError('Call metrics queries are closed')
+                opening = self._opened < self.pool_size
+                if opening:
+                    self._opened += 1
+                else:
+                    self._waiting += 1
+            if opening:
+                connection = sqlite3.connect(f'file:{self.database}?mode=ro', uri=True, check_same_thread=False)
+                connection.execute('PRAGMA query_only = 1')
+                logger.debug('Opened read connection %d to %s', self._opened, self.database)
+                return connection
+            # Every connection is busy, wait for one to come back, or for `close`
+            connection = self._idle.get()
+            with self._lock:
+                self._waiting -= 1
+        if connection is None:
+            raise sqlite3.ProgrammingError('Call metrics queries are closed')
+        return connection
@@ -2,29 +2,70 @@
 import logging
 from queue import Queue, Empty
 import sqlite3
+from typing import Iterable
 
 from .call_record import CallRecord
+from .call_record_log import CallRecordLog
+from .call_records_migration import CallRecordsMigration, prepare_migration
+from power_dialer.phone_number import number_value
 from power_dialer.singleton import Singleton
 
 logger = logging.getLogger('power_dialer.call_metrics.relational_storage')
 
-INSERT_QUERY = """INSERT INTO CALL_RECORDS
-                  VALUES(?, ?, ?, ?)
+AGENT_INSERT_QUERY = """INSERT OR IGNORE INTO AGENTS(agent_id)
+                        VALUES(?)
+                     """
+
+INSERT_QUERY = """INSERT INTO CALLS
+                  VALUES((SELECT id FROM AGENTS WHERE agent_id = ?), ?, ?, ?)
                """
 
+# One row, the offset in the call record log that has been committed here
+CHECKPOINT_QUERY = """INSERT OR REPLACE INTO CALL_LOG_CHECKPOINT
+                      VALUES(0, ?, ?)
+                   """
+
+# SQL LITE has a rowid, so no need to keep an explicit autoincrement primary key
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS AGENTS(
+id INTEGER PRIMARY KEY,
+agent_id TEXT NOT NULL UNIQUE
+);
+-- Numbers are their digits as an integer, times are milliseconds since the epoch
+CREATE TABLE IF NOT EXISTS CALLS(
+agent INTEGER NOT NULL REFERENCES AGENTS(id),
+number INTEGER NOT NULL,
+call_start INTEGER NOT NULL,
+call_end INTEGER NOT NULL
+);
+-- Covering indexes for the queries in call_metrics_queries, these answer without touching the table
+CREATE INDEX IF NOT EXISTS calls_agent_idx ON CALLS(agent, call_start, call_end, number);
+CREATE INDEX IF NOT EXISTS calls_start_idx ON CALLS(call_start, agent, number, call_end);
+CREATE INDEX IF NOT EXISTS calls_number_idx ON CALLS(number, call_start, agent, call_end);
+CREATE TABLE IF NOT EXISTS CALL_LOG_CHECKPOINT(
+id INTEGER PRIMARY KEY CHECK (id = 0),
+generation INTEGER NOT NULL,
+log_offset INTEGER NOT NULL
+);
+"""
+
 
 class CallMetricsRelationalStorage(metaclass=Singleton):
     """
     Pretend interface to persistence layer
     """
 
-    def __init__(self, storage_queue: Queue, database: str):
+    def __init__(self, storage_queue: Queue, database: str, log: CallRecordLog = None):
         logging.info('Database is %s', database)
         self.database = database
         self.queue = storage_queue
+        self.log = log
+        self.migration = None
         self._create_schema()
 
     def save_call_records(self):
+        if self.log is not None:
+            return self.save_logged_call_records()
         # Can only talk on the thread the connection was made on...
         connection = sqlite3.connect(self.database)
         while True:
@@ -35,31 +76,78 @@ class CallMetricsRelationalStorage(metaclass=Singleton):
                     return
             except Empty:
                 continue
+            if isinstance(record, list):
+                # A batch from `CallMetricsHandler.calls_batch`
+                with connection:
+                    self.insert_records(connection, record)
+                continue
             self.save_call_record(connection, record)
 
-    @staticmethod
-    def save_call_record(connection, record):
+    def save_logged_call_records(self):
+        """
+        Tail the call record log, committing each batch with the log offset it ends at. Whatever is past the
+        checkpoint when we start is a replay of records that were logged but never committed.
+        """
+        log = self.log
+        connection = sqlite3.connect(self.database)
+        generation, offset = connection.execute('SELECT generation, log_offset FROM CALL_LOG_CHECKPOINT').fetchone() or \
+            (None, None)
+        if generation != log.generation:
+            offset = log.start
+        replaying = True
+        while True:
+            records, next_offset = log.read(offset)
+            if records:
+                if replaying:
+                    logger.info('Replaying call record log from offset %d', offset)
+                    replaying = False
+                with connection:
+                    self.insert_records(connection, records)
+                    connection.execute(CHECKPOINT_QUERY, (log.generation, next_offset))
+                offset = next_offset
+                continue
+            replaying = False
+            if log.compact(offset):
+                offset = log.start
+                with connection:
+                    connection.execute(CHECKPOINT_QUERY, (log.generation, offset))
+            if not log.wait(offset, timeout=1.0) and log.closed:
+                logger.info('Shutting down relational storage')
+                return
+
+    @classmethod
+    def save_call_record(cls, connection, record):
         cursor = connection.cursor()
-        agent_id = record.agent_id
-        number = record.number
-        start = record.started.timestamp()
-        ended = record.ended.timestamp()
-        cursor.execute(INSERT_QUERY, (agent_id, number, start, ended))
+        cursor.execute(AGENT_INSERT_QUERY, (record.agent_id,))
+        cursor.execute(INSERT_QUERY, cls._record_row(record))
         connection.commit()
 
+    @classmethod
+    def insert_records(cls, connection, records: Iterable[CallRecord]):
+        """
+        Insert call records, and any agents not seen before, in the caller's transaction
+        """
+        rows = [cls._record_row(record) for record in records]
+        connection.executemany(AGENT_INSERT_QUERY, {(row[0],) for row in rows})
+        connection.executemany(INSERT_QUERY, rows)
+
+    @staticmethod
+    def _record_row(record: CallRecord) -> tuple:
+        return (record.agent_id, number_value(record.number), round(record.started.timestamp() * 1000),
+                round(record.ended.timestamp() * 1000))
+
     def _create_schema(self):
         connection = sqlite3.connect(self.database)
         cursor = connection.cursor()
-        # SQL LITE has a rowid, so no need to keep an explicit autoincrement primary key
-        cursor.executescript("""
-        CREATE TABLE IF NOT EXISTS CALL_RECORDS(
-        agent_id TEXT NOT NULL,
-        called_number TEXT NOT NULL,
-        call_start INTEGER NOT NULL,
-        call_end INTEGER NOT NULL
-        );
-        CREATE INDEX IF NOT EXISTS agent_idx ON CALL_RECORDS(agent_id);
-        """)
+        # Readers (see `CallMetricsQueries`) run beside the writer rather than waiting for it
+        cursor.execute('PRAGMA journal_mode=WAL').fetchone()
+        cursor.executescript(SCHEMA)
 
         connection.commit()
+        # A database from before the integer schema is migrated in the background, CALL_RECORDS becomes a view
+        connection.isolation_level = None
+        migrating = prepare_migration(connection)
         connection.close()
+        if migrating:
+            self.migration = CallRecordsMigration(self.database)
+            self.migration.start()
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+import os
+import random
+import struct
+import time
+import zlib
+from threading import Condition
+from typing import List, Tuple
+
+from .call_record import CallRecord
+
+logger = logging.getLogger('power_dialer.call_metrics.call_record_log')
+
+MAGIC = b'PDCL'
+VERSION = 1
+# magic, version, generation
+HEADER = struct.Struct('<4sHxxq')
+# payload length, crc32 of payload
+ENTRY = struct.Struct('<II')
+# started, ended, agent id length, number length
+RECORD = struct.Struct('<ddHH')
+# Comfortably bigger than the largest possible entry
+READ_SIZE = 1 << 20
+
+
+def encode_record(record: CallRecord) -> bytes:
+    agent_id = record.agent_id.encode('utf-8')
+    number = str(record.number).encode('utf-8')
+    payload = RECORD.pack(record.started.timestamp(), record.ended.timestamp(), len(agent_id), len(number))
+    payload += agent_id + number
+    return ENTRY.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def decode_record(payload: bytes) -> CallRecord:
+    started, ended, agent_length, number_length = RECORD.unpack_from(payload)
+    offset = RECORD.size
+    agent_id = payload[offset:offset + agent_length].decode('utf-8')
+    offset += agent_length
+    number = payload[offset:offset + number_length].decode('utf-8')
+    return CallRecord(agent_id, number,
+                      datetime.datetime.fromtimestamp(started), datetime.datetime.fromtimestamp(ended))
+
+
+class CallRecordLog:
+    """
+    Append-only write ahead log of finished calls.
+
+    Each entry is length prefixed and checksummed so a torn write at the tail is detected and cut off when the log is
+    reopened. Appends are plain sequential writes; the fsync is shared by a group of appends, either when
+    `sync_every` entries are pending or when the reader asks for more. Readers only ever see synced entries so
+    anything committed downstream is also safe in the log.
+
+    The generation changes every time the log is compacted, a checkpoint from a different generation means
+    replay the whole log.
+    """
+
+    def __init__(self, path: str, sync_every: int = 64):
+        self.path = path
+        self.sync_every = sync_every
+        self._condition = Condition()
+        self._pending = 0
+        self.closed = False
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._file = os.fdopen(fd, 'r+b')
+        header = self._file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            self._new_generation()
+        else:
+            magic, version, self.generation = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f'{path} is not a call record log')
+            self._recover()
+        self._reader = open(path, 'rb', buffering=0)
+
+    @property
+    def start(self) -> int:
+        """
+        Offset of the first entry
+        """
+        return HEADER.size
+
+    def append(self, record: CallRecord):
+        self.append_many((record,))
+
+    def append_many(self, records):
+        data = b''.join(encode_record(record) for record in records)
+        with self._condition:
+            self._file.write(data)
+            self._end += len(data)
+            self._pending += len(records)
+            if self._pending >= self.sync_every:
+                self._sync()
+
+    def sync(self):
+        """
+        Make everything appended so far durable and visible to readers
+        """
+        with self._condition:
+            self._sync()
+
+    def read(self, offset: int, limit: int = 500) -> Tuple[List[CallRecord], int]:
+        """
+        Read synced entries
+
+        :param offset: Where to start, the end offset of a previous read
+        :param limit: Most records to return
+        :return: The records and the offset after the last one
+        """
+        with self._condition:
+            end = self._durable_end
+        if offset >= end:
+            return [], offset
+        # The reader is unbuffered, compaction rewrites the file underneath it
+        self._reader.seek(offset)
+        data = self._reader.read(min(end - offset, READ_SIZE))
+        records = []
+        position = 0
+        while len(records) < limit and position + ENTRY.size <= len(data):
+            length, _crc = ENTRY.unpack_from(data, position)
+            entry_end = position + ENTRY.size + length
+            if entry_end > len(data):
+                break
+            records.append(decode_record(data[position + ENTRY.size:entry_end]))
+            position = entry_end
+        return records, offset + position
+
+    def wait(self, offset: int, timeout: float) -> bool:
+        """
+        Wait for entries past `offset`, syncing anything pending rather than waiting for a full group.
+
+        :return: True if there is something to read
+        """
+        with self._condition:
+            if self._pending:
+                self._sync()
+            elif self._durable_end <= offset and not self.closed:
+                self._condition.wait(timeout)
+                if self._pending:
+                    self._sync()
+            return self._durable_end > offset
+
+    def compact(self, offset: int) -> bool:
+        """
+        Throw the log away if everything in it has been consumed.
+
+        :param offset: The consumer's checkpoint
+        :return: True if the log was reset, the consumer must checkpoint the new generation at `start`
+        """
+        with self._condition:
+            if self.closed or offset != self._end or self._end == self.start:
+                return False
+            self._new_generation()
+            return True
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self._sync()
+            self.closed = True
+            self._file.close()
+            self._condition.notify_all()
+
+    def _sync(self):
+        if self._durable_end == self._end:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._durable_end = self._end
+        self._pending = 0
+        self._condition.notify_all()
+
+    def _new_generation(self):
+        self.generation = random.getrandbits(63)
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(HEADER.pack(MAGIC, VERSION, self.generation))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._end = self._durable_end = HEADER.size
+        self._pending = 0
+
+    def _recover(self):
+        """
+        Find the end of the last good entry and cut off anything after it
+        """
+        f = self._file
+        offset = HEADER.size
+        started = time.time()
+        count = 0
+        while True:
+            f.seek(offset)
+            entry = f.read(ENTRY.size)
+            if len(entry) < ENTRY.size:
+                break
+            length, crc = ENTRY.unpack(entry)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning('Torn entry at %d in %s, truncating', offset, self.path)
+                break
+            offset += ENTRY.size + length
+            count += 1
+        f.seek(offset)
+        f.truncate()
+        self._end = self._durable_end = offset
+        logger.info('Recovered %d entries from %s in %.3fs', count, self.path, time.time() - started)
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import logging
+import sqlite3
+from threading import Event, Thread
+
+from power_dialer.phone_number import number_value
+
+logger = logging.getLogger('power_dialer.call_metrics.migration')
+
+# Where an old CALL_RECORDS table is moved while its rows are migrated
+LEGACY_TABLE = 'CALL_RECORDS_LEGACY'
+# Rows moved per transaction, small enough that the storage thread's next commit doesn't wait long
+MIGRATION_CHUNK = 1000
+# Seconds between chunks
+MIGRATION_PAUSE = 0.01
+
+# The text schema this migrates from, numbers as dialed, agent ids on every row and times in float seconds
+LEGACY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS CALL_RECORDS(
+agent_id TEXT NOT NULL,
+called_number TEXT NOT NULL,
+call_start INTEGER NOT NULL,
+call_end INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS agent_idx ON CALL_RECORDS(agent_id);
+"""
+
+LEGACY_INSERT_QUERY = """INSERT INTO CALL_RECORDS
+                         VALUES(?, ?, ?, ?)
+                      """
+
+# CALL_RECORDS in its old shape, for anything still querying it
+VIEW_QUERY = """CREATE VIEW CALL_RECORDS AS
+                SELECT AGENTS.agent_id AS agent_id,
+                       CASE WHEN CALLS.number BETWEEN 1000000000 AND 9999999999
+                            THEN printf('(%03d) %03d-%04d', CALLS.number / 10000000, CALLS.number / 10000 % 1000,
+                                        CALLS.number % 10000)
+                            ELSE CAST(CALLS.number AS TEXT) END AS called_number,
+                       CALLS.call_start / 1000.0 AS call_start,
+                       CALLS.call_end / 1000.0 AS call_end
+                FROM CALLS JOIN AGENTS ON AGENTS.id = CALLS.agent
+             """
+
+LEGACY_VIEW_QUERY = VIEW_QUERY + f"""
+                UNION ALL
+                SELECT agent_id, called_number, call_start, call_end FROM {LEGACY_TABLE}
+             """
+
+CHUNK_END_QUERY = f'SELECT MAX(rowid) FROM (SELECT rowid FROM {LEGACY_TABLE} ORDER BY rowid LIMIT ?)'
+
+MIGRATE_AGENTS_QUERY = f"""INSERT OR IGNORE INTO AGENTS(agent_id)
+                           SELECT DISTINCT agent_id FROM {LEGACY_TABLE} WHERE rowid <= ?
+                        """
+
+MIGRATE_CALLS_QUERY = f"""INSERT INTO CALLS
+                          SELECT AGENTS.id, number_value(called_number), CAST(round(call_start * 1000) AS INTEGER),
+                                 CAST(round(call_end * 1000) AS INTEGER)
+                          FROM {LEGACY_TABLE} JOIN AGENTS ON AGENTS.agent_id = {LEGACY_TABLE}.agent_id
+                          WHERE {LEGACY_TABLE}.rowid <= ?
+                          ORDER BY {LEGACY_TABLE}.rowid
+                       """
+
+
+def _kind(connection: sqlite3.Connection, name: str):
+    row = connection.execute('SELECT type FROM sqlite_master WHERE name = ?', (name,)).fetchone()
+    return row[0] if row is not None else None
+
+
+def prepare_migration(connection: sqlite3.Connection) -> bool:
+    """
+    Move an old CALL_RECORDS table aside and put the view in its place, covering its rows until they're migrated.
+    The new tables must exist.
+
+    :param connection: Connection in autocommit mode (isolation_level=None)
+    :return: True if there are rows to migrate
+    """
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        if _kind(connection, 'CALL_RECORDS') == 'table':
+            logger.info('Moving CALL_RECORDS to %s to migrate it', LEGACY_TABLE)
+            connection.execute(f'ALTER TABLE CALL_RECORDS RENAME TO {LEGACY_TABLE}')
+        legacy = _kind(connection, LEGACY_TABLE) == 'table'
+        connection.execute('DROP VIEW IF EXISTS CALL_RECORDS')
+        connection.execute(LEGACY_VIEW_QUERY if legacy else VIEW_QUERY)
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return legacy
+
+
+class CallRecordsMigration:
+    """
+    Moves rows from the old CALL_RECORDS table into CALLS and AGENTS, `chunk_size` rows per transaction, while the
+    storage thread keeps writing. Each chunk is copied and deleted in one transaction, so a migration that's stopped
+    or crashes picks up where it left off. When the old table is empty it's dropped.
+
+    The old table's pages are reused by new rows, VACUUM to give them back to the file system.
+    """
+
+    def __init__(self, database: str, chunk_size: int = MIGRATION_CHUNK, pause: float = MIGRATION_PAUSE):
+        self.database = database
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.migrated = 0
+        self.chunks = 0
+        self.done = Event()
+        self._stopped = Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Migrate in a background thread
+        """
+        self._thread = Thread(target=self.run, name='call_records_migration', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        connection = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        connection.create_function('number_value', 1, number_value)
+        try:
+            while not self._stopped.is_set() and self.step(connection):
+                self._stopped.wait(self.pause)
+        finally:
+            connection.close()
+
+    def step(self, connection: sqlite3.Connection) -> int:
+        """
+        Migrate one chunk, or finish up if there's nothing left
+
+        :param connection: Connection in autocommit mode with `number_value` registered
+        :return: Rows migrated, 0 once the migration is done
+        """
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if _kind(connection, LEGACY_TABLE) != 'table':
+                connection.execute('COMMIT')
+                self.done.set()
+                return 0
+            last, = connection.execute(CHUNK_END_QUERY, (self.chunk_size,)).fetchone()
+            if last is None:
+                connection.execute(f'DROP TABLE {LEGACY_TABLE}')
+                connection.execute('DROP VIEW IF EXISTS CALL_RECORDS')
+                connection.execute(VIEW_QUERY)
+                moved = 0
+            else:
+                connection.execute(MIGRATE_AGENTS_QUERY, (last,))
+                moved = connection.execute(MIGRATE_CALLS_QUERY, (last,)).rowcount
+                connection.execute(f'DELETE FROM {LEGACY_TABLE} WHERE rowid <= ?', (last,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if not moved:
+            logger.info('Migrated %d call records in %d chunks', self.migrated, self.chunks)
+            self.done.set()
+            return 0
+        self.migrated += moved
+        self.chunks += 1
+        return moved
+
+    def stop(self):
+        """
+        Stop after the chunk in progress, a later migration carries on from there
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Where the dialer gets the time.
+
+Modules call `clock.now()` and `clock.utcnow()` rather than `time.time()` and `datetime.datetime.utcnow()`, which
+go to whichever clock is installed with `use_clock`. Look them up on the module each time, `from .clock import now`
+would keep the clock that was installed at import.
+"""
+import datetime
+import logging
+import os
+import time
+from threading import Event, Lock, Thread
+
+logger = logging.getLogger('power_dialer.clock')
+
+# wall, coarse, or coarse:<resolution in seconds>
+CLOCK = os.environ.get('POWER_DIALER_CLOCK', 'wall')
+# Seconds between coarse clock ticks
+COARSE_RESOLUTION = 0.01
+
+
+class Clock:
+    """
+    A source of the current time, as a timestamp and as a naive UTC datetime
+    """
+
+    def now(self) -> float:
+        raise NotImplementedError
+
+    def utcnow(self) -> datetime.datetime:
+        return datetime.datetime.utcfromtimestamp(self.now())
+
+    def shutdown(self):
+        pass
+
+
+class WallClock(Clock):
+    """
+    The precise system time, a syscall every read
+    """
+
+    def now(self) -> float:
+        return time.time()
+
+    def utcnow(self) -> datetime.datetime:
+        return datetime.datetime.utcnow()
+
+
+class CoarseClock(Clock):
+    """
+    The system time as of the last tick. A ticker thread reads it every `resolution` seconds, so reading the clock is
+    an attribute load and `utcnow` hands out the same datetime until the next tick.
+    """
+
+    def __init__(self, resolution: float = COARSE_RESOLUTION):
+        self.resolution = resolution
+        self._now = time.time()
+        self._utcnow = datetime.datetime.utcfromtimestamp(self._now)
+        self._stopped = Event()
+        self._ticker = Thread(target=self._tick, name='coarse_clock', daemon=True)
+        self._ticker.start()
+
+    def now(self) -> float:
+        return self._now
+
+    def utcnow(self) -> datetime.datetime:
+        return self._utcnow
+
+    def shutdown(self):
+        self._stopped.set()
+        self._ticker.join()
+
+    def _tick(self):
+        while not self._stopped.wait(self.resolution):
+            now = time.time()
+            self._utcnow = datetime.datetime.utcfromtimestamp(now)
+            self._now = now
+
+
+class ManualClock(Clock):
+    """
+    Time that only moves when it's told to, for tests and simulations
+    """
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float):
+        self._now += seconds
+
+    def set(self, timestamp: float):
+        self._now = timestamp
+
+
+def create_clock(spec: str) -> Clock:
+    """
+    Build a clock from its configuration
+
+    :param spec: 'wall', 'coarse' or 'coarse:<resolution>'
+    :return: The clock
+    """
+    mode, _, resolution = spec.partition(':')
+    if mode == 'wall':
+        return WallClock()
+    if mode == 'coarse':
+        return CoarseClock(float(resolution) if resolution else COARSE_RESOLUTION)
+    raise ValueError(f'Unknown clock {spec!r}')
+
+
+_clock: Clock = None
+_install_lock = Lock()
+
+
+def use_clock(clock: Clock = None) -> Clock:
+    """
+    Install a clock for every module
+
+    :param clock: The clock, None goes back to building the configured clock on first use
+    :return: The clock it replaced, None if the configured clock hadn't been built yet
+    """
+    global _clock, now, utcnow
+    previous, _clock = _clock, clock
+    if clock is None:
+        now, utcnow = _configured_now, _configured_utcnow
+    else:
+        now, utcnow = clock.now, clock.utcnow
+    return previous
+
+
+def get_clock() -> Clock:
+    if _clock is None:
+        _install()
+    return _clock
+
+
+def _install():
+    with _install_lock:
+        if _clock is None:
+            logger.info('Using %s clock', CLOCK)
+            use_clock(create_clock(CLOCK))
+
+
+# Until a clock is installed these build the configured one, which replaces them. Building it on first use means a
+# coarse clock's ticker isn't started on import.
+def _configured_now() -> float:
+    return get_clock().now()
+
+
+def _configured_utcnow() -> datetime.datetime:
+    return get_clock().utcnow()
+
+
+now = _configured_now
+utcnow = _configured_utcnow
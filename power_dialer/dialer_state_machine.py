@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
-from collections import defaultdict
+import re
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import List
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Union
 
 
 class AgentState(Enum):
@@ -12,7 +13,7 @@ class AgentState(Enum):
     busy = auto()
 
 
-@dataclass
+@dataclass(frozen=True)
 class Transition:
     from_state: AgentState
     to_state: AgentState
@@ -27,18 +28,81 @@ AGENT_TRANSITIONS = (
 )
 
 
+class TransitionTable:
+    """
+    A set of transitions compiled into a bitmask per state, indexed by state value; slot 0 is the unset state,
+    which can't transition anywhere.
+
+    Tables are immutable and shared by every machine using the same transitions, build them with
+    `compile_transitions`.
+    """
+    __slots__ = ('masks', '_invalid')
+
+    def __init__(self, transitions: Sequence[Transition]):
+        size = max((state.value for t in transitions for state in (t.from_state, t.to_state)), default=0) + 1
+        masks = [0] * size
+        for t in transitions:
+            masks[t.from_state.value] |= 1 << t.to_state.value
+        self.masks = tuple(masks)
+        # A forbidden pair of consecutive states, or a byte that isn't a state at all
+        states = {t.from_state.value for t in transitions} | {t.to_state.value for t in transitions}
+        forbidden = [re.escape(bytes((a, b))) for a in states for b in states if not masks[a] >> b & 1]
+        known = b''.join(re.escape(bytes((state,))) for state in sorted(states))
+        self._invalid = re.compile(b'|'.join(forbidden + [b'[^' + known + b']']) if known else b'[\\x00-\\xff]')
+
+    def allows(self, from_state: AgentState, to_state: AgentState) -> bool:
+        return bool(from_state is not None and self.masks[from_state.value] >> to_state.value & 1)
+
+    def validate(self, values: bytes) -> int:
+        """
+        Check a whole sequence of states at once
+
+        :param values: State values, one byte each, see `encode_states`
+        :return: The index of the first state that can't be reached from the one before it, or -1 if they all can
+        """
+        match = self._invalid.search(values)
+        if match is None:
+            return -1
+        # Pairs are bad in their second state
+        return match.start() + len(match.group()) - 1
+
+
+@lru_cache(maxsize=None)
+def _compile(transitions: tuple) -> TransitionTable:
+    return TransitionTable(transitions)
+
+
+def compile_transitions(transitions: Iterable[Transition]) -> TransitionTable:
+    """
+    Get the shared table for a set of transitions
+    """
+    return _compile(tuple(transitions))
+
+
+def encode_states(states: Iterable[AgentState]) -> bytes:
+    """
+    Pack states for `TransitionTable.validate`
+    """
+    return bytes(state.value for state in states)
+
+
 class DialerStateMachine:
     """
     A mini finite state machine to control the state of an agent.
+
+    The machine only holds its current state; the transitions live in a table shared with every other machine.
     """
-    def __init__(self, transitions: List[Transition], startState: AgentState = None):
-        self.__transitions = defaultdict(set)
-        self.__process_transitions(transitions)
-        self.__current_state: AgentState = startState
+    __slots__ = ('_table', '_state')
+
+    def __init__(self, transitions: Union[List[Transition], TransitionTable], startState: AgentState = None):
+        if not isinstance(transitions, TransitionTable):
+            transitions = compile_transitions(transitions)
+        self._table = transitions
+        self._state: AgentState = startState
 
     @property
     def state(self):
-        return self.__current_state
+        return self._state
 
     def set_state(self, state: AgentState) -> bool:
         """
@@ -48,8 +112,8 @@ class DialerStateMachine:
         :param state: State to set to.
         :return: True if the state can be set
         """
-        if self.__current_state is None:
-            self.__current_state = state
+        if self._state is None:
+            self._state = state
             return True
         return False
 
@@ -60,17 +124,8 @@ class DialerStateMachine:
         :param new_state: The state to change to
         :return: True if the new state can be obtained.
         """
-        if new_state in self.__transitions[self.__current_state]:
-            self.__current_state = new_state
+        state = self._state
+        if state is not None and self._table.masks[state.value] >> new_state.value & 1:
+            self._state = new_state
             return True
         return False
-
-    def __process_transitions(self, transitions: List[Transition]):
-        """
-        Build a reverse look-up table of states.
-
-        :param transitions: A list of transitions to keep
-        :return:
-        """
-        for t in transitions:
-            self.__transitions[t.to_state].add(t.from_state)
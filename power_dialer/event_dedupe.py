@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+from . import clock
+
+logger = logging.getLogger('power_dialer.event_dedupe')
+
+# Event ids remembered, across all stripes
+DEDUPE_CAPACITY = 100000
+# Seconds an event id is remembered, redeliveries come well inside this
+DEDUPE_TTL = 300
+DEDUPE_STRIPES = 16
+
+
+class _Stripe:
+    __slots__ = ('lock', 'seen', 'evicted')
+
+    def __init__(self):
+        self.lock = Lock()
+        self.evicted = 0
+        # event id -> expiry, oldest first; the ttl is fixed so insertion order is expiry order
+        self.seen = OrderedDict()
+
+
+class EventDedupe:
+    """
+    Recently seen event ids, to drop events the transport delivered more than once.
+
+    Ids are spread over `stripes` independently locked LRUs so concurrent events rarely wait on each other. Memory is
+    fixed, each stripe holds at most capacity / stripes ids and an id is forgotten after `ttl` seconds or when it is
+    the oldest in a full stripe, whichever comes first.
+    """
+
+    def __init__(self, capacity: int = DEDUPE_CAPACITY, ttl: float = DEDUPE_TTL, stripes: int = DEDUPE_STRIPES):
+        self.ttl = ttl
+        self.stripe_capacity = max(1, capacity // stripes)
+        self._stripes = tuple(_Stripe() for _ in range(stripes))
+        self._lock = Lock()
+        self.duplicates = 0
+        self.dials_saved = 0
+
+    def seen(self, event_id: str, now: float = None) -> bool:
+        """
+        Check an event id, remembering it if it's new
+
+        :param event_id: The transport's id for the event
+        :param now: Time of delivery
+        :return: True if the id was seen within the ttl, the event is a duplicate
+        """
+        now = clock.now() if now is None else now
+        stripe = self._stripes[hash(event_id) % len(self._stripes)]
+        with stripe.lock:
+            seen = stripe.seen
+            while seen:
+                oldest, expiry = next(iter(seen.items()))
+                if expiry > now:
+                    break
+                del seen[oldest]
+            if event_id in seen:
+                return True
+            seen[event_id] = now + self.ttl
+            if len(seen) > self.stripe_capacity:
+                seen.popitem(last=False)
+                stripe.evicted += 1
+            return False
+
+    def suppressed(self, dials: int):
+        """
+        Count a duplicate that was dropped, and the dials it would have made
+        """
+        with self._lock:
+            self.duplicates += 1
+            self.dials_saved += dials
+
+    @property
+    def evicted(self) -> int:
+        return sum(stripe.evicted for stripe in self._stripes)
+
+    def __len__(self) -> int:
+        return sum(len(stripe.seen) for stripe in self._stripes)
+
+    def report(self):
+        logger.info('Event dedupe: %d duplicates suppressed, %d dials saved, %d ids evicted before expiry',
+                    self.duplicates, self.dials_saved, self.evicted)
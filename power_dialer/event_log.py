@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import logging
+import struct
+from enum import IntEnum
+from threading import Lock
+from typing import Iterator, NamedTuple, Optional
+
+from . import clock
+from .phone_number import format_number, normalize_number
+
+logger = logging.getLogger('power_dialer.event_log')
+
+# Magic, version
+HEADER = struct.Struct('<4sH')
+MAGIC = b'PDEV'
+VERSION = 1
+# Kind, agent index, timestamp, number (-1 for none)
+EVENT = struct.Struct('<BIdq')
+# Kind 0, agent index, name length, followed by the name. Written the first time an agent is seen.
+AGENT = struct.Struct('<BIH')
+NO_NUMBER = -1
+BUFFER_SIZE = 1 << 16
+
+
+class EventType(IntEnum):
+    agent_login = 1
+    agent_logout = 2
+    call_started = 3
+    call_failed = 4
+    call_ended = 5
+
+
+AGENT_RECORD = 0
+# `PowerDialerInterface` callback for each event type
+CALLBACKS = {
+    EventType.agent_login: 'on_agent_login',
+    EventType.agent_logout: 'on_agent_logout',
+    EventType.call_started: 'on_call_started',
+    EventType.call_failed: 'on_call_failed',
+    EventType.call_ended: 'on_call_ended',
+}
+EVENT_TYPES = {callback: event_type for event_type, callback in CALLBACKS.items()}
+
+
+class Event(NamedTuple):
+    timestamp: float
+    event_type: EventType
+    agent_id: str
+    number: Optional[str]
+
+    @property
+    def args(self) -> tuple:
+        return () if self.number is None else (self.number,)
+
+
+class EventRecorder:
+    """
+    Appends dialer events to a compact binary log, 21 bytes an event. Agent ids are written once and referred to
+    by index after that, numbers are stored as integers and come back in NANP format.
+
+    A log is always started fresh, capture one run per file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb', buffering=BUFFER_SIZE)
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+        self._agents = {}
+        self._lock = Lock()
+        self.events = 0
+
+    def record(self, event_type: EventType, agent_id: str, number: str = None, timestamp: float = None):
+        """
+        :param event_type: The callback
+        :param agent_id: The agent
+        :param number: The lead's number, if the callback has one
+        :param timestamp: When, now by default
+        """
+        if timestamp is None:
+            timestamp = clock.now()
+        value = NO_NUMBER
+        if number is not None:
+            digits = normalize_number(number)
+            value = int(digits) if digits else NO_NUMBER
+        with self._lock:
+            index = self._agents.get(agent_id)
+            if index is None:
+                index = self._agents[agent_id] = len(self._agents)
+                name = agent_id.encode('utf-8')
+                self._file.write(AGENT.pack(AGENT_RECORD, index, len(name)) + name)
+            self._file.write(EVENT.pack(event_type, index, timestamp, value))
+            self.events += 1
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                logger.info('Recorded %d events for %d agents to %s', self.events, len(self._agents), self.path)
+
+
+def read_events(path: str) -> Iterator[Event]:
+    """
+    Read back a recorded log, a torn record at the end (from a crash mid write) is ignored
+
+    :param path: Log file
+    :return: The events, in the order they were recorded
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path} is not an event log')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} event log')
+    agents = []
+    offset, end = HEADER.size, len(data)
+    event_size, agent_size = EVENT.size, AGENT.size
+    while offset < end:
+        if data[offset] == AGENT_RECORD:
+            if offset + agent_size > end:
+                break
+            _kind, _index, length = AGENT.unpack_from(data, offset)
+            if offset + agent_size + length > end:
+                break
+            offset += agent_size
+            agents.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+            continue
+        if offset + event_size > end:
+            break
+        kind, index, timestamp, value = EVENT.unpack_from(data, offset)
+        offset += event_size
+        yield Event(timestamp, EventType(kind), agents[index],
+                    None if value == NO_NUMBER else format_number(str(value)))
+    if offset < end:
+        logger.warning('Ignoring %d bytes of torn record at the end of %s', end - offset, path)
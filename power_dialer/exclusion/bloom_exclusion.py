@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import logging
+import math
+from threading import Lock
+from typing import Dict, List, Optional, Sequence
+
+from power_dialer.bloom_filter import BloomFilter
+from .exclusion_store import ExclusionStore
+
+logger = logging.getLogger('power_dialer.exclusion.bloom')
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class BloomExclusionStore(ExclusionStore):
+    """
+    Recently dialed numbers as a ring of Bloom filters, one per time bucket (an hour, a day), so days of dials fit
+    in a few bytes a number. Expiry is free: a bucket that falls out of the window is dropped whole and the newest
+    bucket takes its place.
+
+    Exclusion is to the bucket, a number dialed in a bucket stays excluded until the whole bucket has passed out of
+    the window, up to one bucket longer than asked for.
+
+    A false positive skips a lead that was never dialed. With `confirm`, an exact store (on disk, or shared with
+    other hosts) holding every reservation, positives are checked against it before they're turned away; the filters
+    answer the common case, a number we haven't dialed, without touching it.
+    """
+
+    def __init__(self, window: float = 7 * DAY, bucket_seconds: float = DAY, capacity: int = 1000000,
+                 error_rate: float = 0.001, confirm: ExclusionStore = None):
+        """
+        :param window: The longest exclusion time that will be asked for
+        :param bucket_seconds: Time covered by each filter
+        :param capacity: Numbers expected to be dialed per bucket, the error rate goes up past this
+        :param error_rate: Chance a number never dialed is taken as dialed, across the whole window
+        :param confirm: Exact store to check positives with
+        """
+        self.window = window
+        self.bucket_seconds = bucket_seconds
+        self.buckets = math.ceil(window / bucket_seconds) + 1
+        self.capacity = capacity
+        # Each lookup checks every bucket, split the error between them
+        self.error_rate = error_rate
+        self._filter_error_rate = error_rate / self.buckets
+        self.confirm = confirm
+        # Bucket index (time // bucket_seconds) to filter, oldest first
+        self._filters: Dict[int, BloomFilter] = {}
+        self._spare: BloomFilter = None
+        self._lock = Lock()
+        self.positives = 0
+        self.confirmed = 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(f.nbytes for f in self._filters.values())
+
+    def reserve(self, numbers: Sequence[str], now: float, exclude_time: float) -> List[bool]:
+        first = self._index(now - exclude_time)
+        reserved = [False] * len(numbers)
+        positives = []
+        added = {}
+        with self._lock:
+            # Only None if the clock went back past the whole ring
+            current = self._filter(self._index(now)) or self._filters[max(self._filters)]
+            live = [f for index, f in self._filters.items() if index >= first]
+            for i, number in enumerate(numbers):
+                positions = current.positions(self._key(number))
+                if any(f.contains_at(positions) for f in live):
+                    positives.append(i)
+                    continue
+                current.add_at(positions)
+                reserved[i] = True
+                added[number] = now
+        self.positives += len(positives)
+        if self.confirm is None:
+            return reserved
+        if added:
+            self.confirm.warm(added)
+        if positives:
+            # Mostly repeats, the rest are false positives the exact store lets through
+            confirmed = self.confirm.reserve([numbers[i] for i in positives], now, exclude_time)
+            for i, ok in zip(positives, confirmed):
+                reserved[i] = ok
+            self.confirmed += sum(confirmed)
+            if any(confirmed):
+                # Dialed now, the bucket that made it a positive will rotate out before this dial does
+                with self._lock:
+                    f = self._filter(self._index(now))
+                    if f is not None:
+                        for i, ok in zip(positives, confirmed):
+                            if ok:
+                                f.add_at(f.positions(self._key(numbers[i])))
+        return reserved
+
+    def record(self, number: str, timestamp: float):
+        with self._lock:
+            f = self._filter(self._index(timestamp))
+            if f is not None:
+                f.add_at(f.positions(self._key(number)))
+        if self.confirm is not None:
+            self.confirm.record(number, timestamp)
+
+    def expire(self, cutoff: float):
+        first = self._index(cutoff)
+        with self._lock:
+            for index in [index for index in self._filters if index < first]:
+                self._retire(index)
+        if self.confirm is not None:
+            self.confirm.expire(cutoff)
+
+    def close(self):
+        if self.confirm is not None:
+            self.confirm.close()
+
+    def _index(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    @staticmethod
+    def _key(number: str) -> int:
+        return int(number) if number else 0
+
+    def _filter(self, index: int) -> Optional[BloomFilter]:
+        """
+        The filter for a bucket, rotating the oldest out to make room
+
+        :return: None if the bucket is too old to keep
+        """
+        f = self._filters.get(index)
+        if f is not None:
+            return f
+        if self._filters and index <= max(self._filters) - self.buckets:
+            return None
+        while len(self._filters) >= self.buckets:
+            oldest = min(self._filters)
+            if index < oldest:
+                return None
+            self._retire(oldest)
+        if self._spare is not None:
+            f, self._spare = self._spare, None
+        else:
+            f = BloomFilter(self.capacity, self._filter_error_rate)
+        self._filters[index] = f
+        if len(self._filters) > 1 and index < max(self._filters):
+            # Out of order, keep oldest first
+            self._filters = dict(sorted(self._filters.items()))
+        return f
+
+    def _retire(self, index: int):
+        f = self._filters.pop(index)
+        if f.count > self.capacity:
+            logger.warning('Bucket %d held %d numbers, over capacity %d, its error rate was higher than %g',
+                           index, f.count, self.capacity, self._filter_error_rate)
+        f.clear()
+        self._spare = f
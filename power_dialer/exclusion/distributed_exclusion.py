@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+import logging
+from threading import Lock
+from typing import Dict, Iterable, List, Sequence
+
+from .exclusion_protocol import (LENGTH, OP_RESERVE, OP_MERGE, OP_EXPIRE, OP_REBALANCE, OP_SIZE, NodeConnection,
+                                 pack_numbers, pack_stamped, pack_members)
+from .exclusion_store import ExclusionStore
+from .hash_ring import HashRing
+
+logger = logging.getLogger('power_dialer.exclusion.distributed')
+
+
+class DistributedExclusionStore(ExclusionStore):
+    """
+    Recently dialed numbers partitioned across exclusion nodes by consistent hashing, so every dialer host sees
+    every other host's dials.
+
+    A batch is split by owner and sent to all the owners before any reply is read, so it costs one round trip
+    however many nodes it touches. Numbers held by a node that dies are lost with it.
+    """
+
+    def __init__(self, members: Iterable[str], replicas: int = 64, timeout: float = 1.0):
+        self.replicas = replicas
+        self.timeout = timeout
+        self.ring = HashRing(members, replicas)
+        self._connections = {}
+        self._lock = Lock()
+        self.round_trips = 0
+
+    def reserve(self, numbers: Sequence[str], now: float, exclude_time: float) -> List[bool]:
+        owners = self.ring.partition(numbers)
+        replies = self._scatter({
+            node: (OP_RESERVE, len(indexes), now, exclude_time, pack_numbers([numbers[i] for i in indexes]))
+            for node, indexes in owners.items()
+        })
+        reserved = [False] * len(numbers)
+        for node, indexes in owners.items():
+            for i, flag in zip(indexes, replies[node]):
+                reserved[i] = bool(flag)
+        return reserved
+
+    def record(self, number: str, timestamp: float):
+        self.warm({number: timestamp})
+
+    def warm(self, numbers: Dict[str, float]):
+        keys = list(numbers)
+        self._scatter({
+            node: (OP_MERGE, len(indexes), 0.0, 0.0, pack_stamped({keys[i]: numbers[keys[i]] for i in indexes}))
+            for node, indexes in self.ring.partition(keys).items()
+        })
+
+    def expire(self, cutoff: float):
+        self._scatter({node: (OP_EXPIRE, 0, cutoff, 0.0, b'') for node in self.ring.nodes})
+
+    def size(self) -> Dict[str, int]:
+        """
+        :return: Numbers held by each node
+        """
+        replies = self._scatter({node: (OP_SIZE, 0, 0.0, 0.0, b'') for node in self.ring.nodes})
+        return {node: LENGTH.unpack(reply)[0] for node, reply in replies.items()}
+
+    def set_members(self, members: Iterable[str]):
+        """
+        Change the membership and have every node, old and new, hand off what it no longer owns.
+        Every dialer host has to be told about the change too.
+        """
+        old = set(self.ring.nodes)
+        self.ring = HashRing(members, self.replicas)
+        payload = pack_members(self.ring.nodes)
+        replies = self._scatter({node: (OP_REBALANCE, len(payload), 0.0, 0.0, payload)
+                                 for node in old | set(self.ring.nodes)})
+        moved = sum(LENGTH.unpack(reply)[0] for reply in replies.values())
+        logger.info('Rebalanced onto %d nodes, %d numbers moved', len(self.ring), moved)
+        for node in old - set(self.ring.nodes):
+            self._drop_connection(node)
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections = {}
+
+    def _connection(self, node: str) -> NodeConnection:
+        with self._lock:
+            connection = self._connections.get(node)
+            if connection is None:
+                connection = self._connections[node] = NodeConnection(node, self.timeout)
+            return connection
+
+    def _drop_connection(self, node: str):
+        with self._lock:
+            connection = self._connections.pop(node, None)
+        if connection is not None:
+            connection.close()
+
+    def _scatter(self, requests: Dict[str, tuple]) -> Dict[str, bytes]:
+        """
+        Send every request then collect every reply. Connections are locked in a fixed order so concurrent
+        batches can't deadlock.
+        """
+        nodes = sorted(requests)
+        connections = [self._connection(node) for node in nodes]
+        for connection in connections:
+            connection.lock.acquire()
+        try:
+            for node, connection in zip(nodes, connections):
+                connection.send(*requests[node])
+            replies = {node: connection.receive() for node, connection in zip(nodes, connections)}
+        except (OSError, ConnectionError):
+            for node in nodes:
+                self._drop_connection(node)
+            raise
+        finally:
+            for connection in connections:
+                connection.lock.release()
+        self.round_trips += 1
+        return replies
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import logging
+import multiprocessing
+import socketserver
+from threading import Lock
+
+from .exclusion_protocol import (REQUEST, LENGTH, OP_RESERVE, OP_MERGE, OP_EXPIRE, OP_REBALANCE, OP_SIZE,
+                                 NodeConnection, payload_size, unpack_numbers, unpack_stamped, pack_stamped,
+                                 unpack_members)
+from .hash_ring import HashRing
+
+logger = logging.getLogger('power_dialer.exclusion.node')
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(REQUEST.size)
+            if len(header) < REQUEST.size:
+                return
+            op, count, a, b = REQUEST.unpack(header)
+            payload = self.rfile.read(payload_size(op, count))
+            reply = self.server.dispatch(op, count, a, b, payload)
+            self.wfile.write(LENGTH.pack(len(reply)) + reply)
+
+
+class ExclusionNode(socketserver.ThreadingTCPServer):
+    """
+    Holds the recently dialed numbers for its share of the hash ring.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, replicas: int = 64):
+        super().__init__((host, port), _Handler)
+        self.replicas = replicas
+        # int number -> dial time
+        self.calls = {}
+        self.lock = Lock()
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address
+        return f'{host}:{port}'
+
+    def dispatch(self, op: int, count: int, a: float, b: float, payload: bytes) -> bytes:
+        if op == OP_RESERVE:
+            return self.reserve(unpack_numbers(payload, count), a, b)
+        if op == OP_MERGE:
+            self.merge(unpack_stamped(payload))
+            return b''
+        if op == OP_EXPIRE:
+            return LENGTH.pack(self.expire(a))
+        if op == OP_REBALANCE:
+            return LENGTH.pack(self.rebalance(unpack_members(payload)))
+        if op == OP_SIZE:
+            return LENGTH.pack(len(self.calls))
+        raise ValueError(f'Unknown operation {op}')
+
+    def reserve(self, numbers, now: float, exclude_time: float) -> bytes:
+        cutoff = now - exclude_time
+        reserved = bytearray(len(numbers))
+        with self.lock:
+            calls = self.calls
+            for i, number in enumerate(numbers):
+                timestamp = calls.get(number)
+                if timestamp is None or timestamp <= cutoff:
+                    calls[number] = now
+                    reserved[i] = 1
+        return bytes(reserved)
+
+    def merge(self, stamped):
+        with self.lock:
+            calls = self.calls
+            for number, timestamp in stamped:
+                if calls.get(number, timestamp) <= timestamp:
+                    calls[number] = timestamp
+
+    def expire(self, cutoff: float) -> int:
+        with self.lock:
+            before = len(self.calls)
+            self.calls = {number: timestamp for number, timestamp in self.calls.items() if timestamp > cutoff}
+            return before - len(self.calls)
+
+    def rebalance(self, members) -> int:
+        """
+        Hand off every number this node no longer owns to its new owner
+
+        :param members: The new membership
+        :return: How many numbers were handed off
+        """
+        ring = HashRing(members, self.replicas)
+        moved = {}
+        with self.lock:
+            for number, timestamp in self.calls.items():
+                owner = ring.node_for(str(number)) if members else self.address
+                if owner != self.address:
+                    moved.setdefault(owner, {})[number] = timestamp
+            for numbers in moved.values():
+                for number in numbers:
+                    del self.calls[number]
+        for owner, numbers in moved.items():
+            connection = NodeConnection(owner)
+            try:
+                connection.call(OP_MERGE, len(numbers), payload=pack_stamped(numbers))
+            finally:
+                connection.close()
+        count = sum(len(numbers) for numbers in moved.values())
+        logger.info('Node %s handed off %d numbers', self.address, count)
+        return count
+
+
+def _run_node(host: str, port: int, ready):
+    node = ExclusionNode(host, port)
+    ready.put(node.address)
+    node.serve_forever()
+
+
+def start_node_process(host: str = '127.0.0.1', port: int = 0):
+    """
+    Run an exclusion node in its own process
+
+    :return: The process and the node's address
+    """
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=_run_node, args=(host, port, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=30)
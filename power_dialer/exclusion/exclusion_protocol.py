@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+The wire protocol between dialers and exclusion nodes.
+
+A request is a fixed header followed by a payload whose size depends on the operation, the reply is a length
+prefixed blob. Numbers travel as little endian int64, they are normalized NANP numbers so they never start with 0.
+"""
+import socket
+import struct
+from threading import Lock
+from typing import Dict, Iterable, Sequence
+
+# operation, count, two float arguments
+REQUEST = struct.Struct('<BIdd')
+LENGTH = struct.Struct('<I')
+STAMPED = struct.Struct('<qd')
+
+# now, exclude time, count numbers -> count bytes 1 if reserved
+OP_RESERVE = 1
+# count (number, timestamp) pairs, later timestamps win
+OP_MERGE = 2
+# cutoff -> number of entries removed
+OP_EXPIRE = 3
+# count bytes of comma separated members -> number of entries handed off
+OP_REBALANCE = 4
+# -> number of entries held
+OP_SIZE = 5
+
+
+def payload_size(op: int, count: int) -> int:
+    if op == OP_RESERVE:
+        return count * 8
+    if op == OP_MERGE:
+        return count * STAMPED.size
+    if op == OP_REBALANCE:
+        return count
+    return 0
+
+
+def pack_numbers(numbers: Sequence[str]) -> bytes:
+    return struct.pack(f'<{len(numbers)}q', *map(int, numbers))
+
+
+def unpack_numbers(payload: bytes, count: int):
+    return struct.unpack(f'<{count}q', payload)
+
+
+def pack_stamped(numbers: Dict) -> bytes:
+    return b''.join(STAMPED.pack(int(number), timestamp) for number, timestamp in numbers.items())
+
+
+def unpack_stamped(payload: bytes):
+    return STAMPED.iter_unpack(payload)
+
+
+def pack_members(members: Iterable[str]) -> bytes:
+    return ','.join(members).encode('utf-8')
+
+
+def unpack_members(payload: bytes):
+    return [member for member in payload.decode('utf-8').split(',') if member]
+
+
+def read_exact(reader, size: int) -> bytes:
+    data = reader.read(size)
+    if len(data) < size:
+        raise ConnectionError('Connection closed mid message')
+    return data
+
+
+class NodeConnection:
+    """
+    One connection to an exclusion node. Requests can be sent to several nodes before any reply is read, hold
+    `lock` from send to receive.
+    """
+
+    def __init__(self, address: str, timeout: float = 1.0):
+        host, port = address.rsplit(':', 1)
+        self.address = address
+        self.lock = Lock()
+        self._socket = socket.create_connection((host, int(port)), timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile('rb')
+
+    def send(self, op: int, count: int = 0, a: float = 0.0, b: float = 0.0, payload: bytes = b''):
+        self._socket.sendall(REQUEST.pack(op, count, a, b) + payload)
+
+    def receive(self) -> bytes:
+        length, = LENGTH.unpack(read_exact(self._reader, LENGTH.size))
+        return read_exact(self._reader, length)
+
+    def call(self, op: int, count: int = 0, a: float = 0.0, b: float = 0.0, payload: bytes = b'') -> bytes:
+        with self.lock:
+            self.send(op, count, a, b, payload)
+            return self.receive()
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from abc import ABC, abstractmethod
+from typing import Dict, List, Sequence
+
+
+class ExclusionStore(ABC):
+    """
+    Somewhere other than `NumberManager.calls` to keep recently dialed numbers.
+
+    Numbers are always normalized. `reserve` is the only call on the dial path and takes a batch so stores that
+    live across a network or on disk can answer for many numbers at once.
+    """
+
+    @abstractmethod
+    def reserve(self, numbers: Sequence[str], now: float, exclude_time: float) -> List[bool]:
+        """
+        Check and reserve in one step. A number is reserved, and its dial time set to `now`, if it hasn't been
+        dialed in the last `exclude_time` seconds.
+
+        :param numbers: Normalized numbers
+        :param now: Dial time
+        :param exclude_time: Exclusion window in seconds
+        :return: True for each number that was reserved
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def record(self, number: str, timestamp: float):
+        """
+        Note a number was dialed at `timestamp`, later dial times win
+        """
+        raise NotImplementedError
+
+    def warm(self, numbers: Dict[str, float]):
+        """
+        Load numbers and dial times in bulk
+        """
+        for number, timestamp in numbers.items():
+            self.record(number, timestamp)
+
+    @abstractmethod
+    def expire(self, cutoff: float):
+        """
+        Forget numbers dialed before `cutoff`
+        """
+        raise NotImplementedError
+
+    def report(self):
+        """
+        Log how the store has been doing, called on shutdown
+        """
+
+    def close(self):
+        pass
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from bisect import bisect
+from typing import Dict, Iterable, List, Sequence
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HashRing:
+    """
+    Consistent hashing of numbers onto nodes.
+
+    Each node owns `replicas` points on the ring so load evens out and adding or removing a node only moves about
+    1/n of the numbers.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 64):
+        self.replicas = replicas
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f'{node}#{i}'), node) for node in self.nodes for i in range(replicas))
+        self._points = [point for point, _node in points]
+        self._owners = [node for _point, node in points]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node_for(self, key: str) -> str:
+        if not self._points:
+            raise LookupError('Hash ring has no nodes')
+        index = bisect(self._points, _hash(key))
+        return self._owners[index % len(self._owners)]
+
+    def partition(self, keys: Sequence[str]) -> Dict[str, List[int]]:
+        """
+        Group keys by owner
+
+        :param keys: Keys
+        :return: Node to the indexes of the keys it owns
+        """
+        owners = {}
+        for i, key in enumerate(keys):
+            owners.setdefault(self.node_for(key), []).append(i)
+        return owners
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from threading import Lock
+from typing import Dict, List, Sequence
+
+from .exclusion_store import ExclusionStore
+
+
+class MemoryExclusionStore(ExclusionStore):
+    """
+    The exact in-process store, a dict of number to dial time like `NumberManager.calls`
+    """
+
+    def __init__(self):
+        self.calls: Dict[str, float] = {}
+        self._lock = Lock()
+
+    def reserve(self, numbers: Sequence[str], now: float, exclude_time: float) -> List[bool]:
+        cutoff = now - exclude_time
+        reserved = [False] * len(numbers)
+        with self._lock:
+            calls = self.calls
+            for i, number in enumerate(numbers):
+                timestamp = calls.get(number)
+                if timestamp is None or timestamp <= cutoff:
+                    calls[number] = now
+                    reserved[i] = True
+        return reserved
+
+    def record(self, number: str, timestamp: float):
+        with self._lock:
+            if self.calls.get(number, timestamp) <= timestamp:
+                self.calls[number] = timestamp
+
+    def warm(self, numbers: Dict[str, float]):
+        with self._lock:
+            calls = self.calls
+            for number, timestamp in numbers.items():
+                if calls.get(number, timestamp) <= timestamp:
+                    calls[number] = timestamp
+
+    def expire(self, cutoff: float):
+        with self._lock:
+            self.calls = {number: timestamp for number, timestamp in self.calls.items() if timestamp > cutoff}
+
+    def __len__(self) -> int:
+        return len(self.calls)
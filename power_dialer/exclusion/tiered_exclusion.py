@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sqlite3
+import tempfile
+from threading import Lock
+from typing import Dict, List, Sequence
+
+from .exclusion_store import ExclusionStore
+
+logger = logging.getLogger('power_dialer.exclusion.tiered')
+
+EXCLUSION_DB = os.path.join(tempfile.gettempdir(), 'powerdialer_exclusion.db')
+# Reservations younger than this stay in memory
+HOT_SECONDS = 3600
+# Demote once the hot tier has this many entries, even if they're young
+HOT_CAPACITY = 1000000
+# SQLite's limit on parameters in one statement
+IN_CHUNK = 900
+
+UPSERT_QUERY = """INSERT INTO EXCLUSION VALUES(?, ?)
+                  ON CONFLICT(number) DO UPDATE SET last_call = MAX(last_call, excluded.last_call)
+               """
+
+
+class TieredExclusionStore(ExclusionStore):
+    """
+    Recently dialed numbers in two tiers, for windows too long to keep in memory. Reservations go into a dict (the
+    hot tier); anything older than `hot_seconds` is demoted in batches to an SQLite table keyed by the number as an
+    integer, with an index on the call time for expiry (the cold tier).
+
+    A batch of numbers that miss the hot tier is checked against the cold tier in one query, so disk is touched once
+    per `reserve` rather than once per lead.
+    """
+
+    def __init__(self, path: str = EXCLUSION_DB, hot_seconds: float = HOT_SECONDS, hot_capacity: int = HOT_CAPACITY):
+        self.path = path
+        self.hot_seconds = hot_seconds
+        self.hot_capacity = hot_capacity
+        # normalized number -> dial time
+        self.hot: Dict[str, float] = {}
+        self._oldest_hot = None
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._create_schema()
+        self.lookups = 0
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.cold_queries = 0
+        self.demoted = 0
+
+    def _create_schema(self):
+        with self._connection as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.executescript("""
+            CREATE TABLE IF NOT EXISTS EXCLUSION(
+            number INTEGER PRIMARY KEY,
+            last_call REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS last_call_idx ON EXCLUSION(last_call);
+            """)
+
+    def reserve(self, numbers: Sequence[str], now: float, exclude_time: float) -> List[bool]:
+        cutoff = now - exclude_time
+        reserved = [False] * len(numbers)
+        with self._lock:
+            hot = self.hot
+            misses = []
+            for i, number in enumerate(numbers):
+                timestamp = hot.get(number)
+                if timestamp is not None and timestamp > cutoff:
+                    self.hot_hits += 1
+                else:
+                    misses.append(i)
+            self.lookups += len(numbers)
+            cold = self._cold_times([numbers[i] for i in misses]) if misses else {}
+            for i in misses:
+                number = numbers[i]
+                if number in hot and hot[number] > cutoff:
+                    # A repeat in this batch
+                    self.hot_hits += 1
+                    continue
+                if cold.get(number, cutoff) > cutoff:
+                    self.cold_hits += 1
+                    continue
+                hot[number] = now
+                reserved[i] = True
+            if self._oldest_hot is None:
+                self._oldest_hot = now
+            self._demote(now)
+        return reserved
+
+    def record(self, number: str, timestamp: float):
+        self.warm({number: timestamp})
+
+    def warm(self, numbers: Dict[str, float]):
+        with self._lock:
+            hot = self.hot
+            for number, timestamp in numbers.items():
+                if hot.get(number, timestamp) <= timestamp:
+                    hot[number] = timestamp
+                if self._oldest_hot is None or timestamp < self._oldest_hot:
+                    self._oldest_hot = timestamp
+
+    def expire(self, cutoff: float):
+        with self._lock:
+            self.hot = {number: timestamp for number, timestamp in self.hot.items() if timestamp > cutoff}
+            self._oldest_hot = min(self.hot.values(), default=None)
+            with self._connection as connection:
+                connection.execute('DELETE FROM EXCLUSION WHERE last_call <= ?', (cutoff,))
+
+    def demote(self, before: float):
+        """
+        Move everything dialed before `before` to the cold tier now
+        """
+        with self._lock:
+            self._demote_before(before)
+
+    def hit_rates(self) -> Dict[str, float]:
+        """
+        :return: Share of lookups answered by each tier, and the share that weren't dialed at all
+        """
+        lookups = self.lookups or 1
+        return {
+            'hot': self.hot_hits / lookups,
+            'cold': self.cold_hits / lookups,
+            'miss': (self.lookups - self.hot_hits - self.cold_hits) / lookups,
+        }
+
+    def cold_size(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM EXCLUSION').fetchone()[0]
+
+    def report(self):
+        rates = self.hit_rates()
+        logger.info('Exclusion: %d lookups, hot %.1f%%, cold %.1f%%, miss %.1f%%, %d cold queries, %d demoted',
+                    self.lookups, rates['hot'] * 100, rates['cold'] * 100, rates['miss'] * 100, self.cold_queries,
+                    self.demoted)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _cold_times(self, numbers: List[str]) -> Dict[str, float]:
+        found = {}
+        keys = {int(number): number for number in numbers if number}
+        chunks = list(keys)
+        for i in range(0, len(chunks), IN_CHUNK):
+            chunk = chunks[i:i + IN_CHUNK]
+            query = f'SELECT number, last_call FROM EXCLUSION WHERE number IN ({",".join("?" * len(chunk))})'
+            for number, last_call in self._connection.execute(query, chunk):
+                found[keys[number]] = last_call
+            self.cold_queries += 1
+        return found
+
+    def _demote(self, now: float):
+        """
+        Demote once the oldest hot entry is due, or the hot tier is full
+        """
+        if len(self.hot) > self.hot_capacity:
+            # Make room by demoting the older half
+            times = sorted(self.hot.values())
+            self._demote_before(times[len(times) // 2])
+        elif self._oldest_hot is not None and self._oldest_hot <= now - self.hot_seconds:
+            self._demote_before(now - self.hot_seconds)
+
+    def _demote_before(self, before: float):
+        hot = self.hot
+        demoting = [(int(number), timestamp) for number, timestamp in hot.items() if timestamp <= before and number]
+        if demoting:
+            with self._connection as connection:
+                connection.executemany(UPSERT_QUERY, demoting)
+            self.hot = {number: timestamp for number, timestamp in hot.items() if timestamp > before}
+            self.demoted += len(demoting)
+        self._oldest_hot = min(self.hot.values(), default=None)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import heapq
+import logging
+from collections import OrderedDict
+from threading import Lock
+
+logger = logging.getLogger('power_dialer.failure_tracker')
+
+
+class _Failure:
+    __slots__ = ('number', 'attempts', 'retry_at')
+
+    def __init__(self, number: str):
+        self.number = number
+        self.attempts = 0
+        self.retry_at = 0.0
+
+
+class FailureTracker:
+    """
+    Remember numbers that failed to connect so we stop burning trunk capacity on them.
+
+    A failed number is blocked and scheduled for a retry with exponential backoff, after `max_attempts` failures it
+    is dead and is never retried. Only the `capacity` most recently failed numbers are remembered.
+    """
+
+    def __init__(self, capacity: int = 100000, base_delay: float = 60.0, max_delay: float = 3600.0,
+                 max_attempts: int = 5):
+        self.capacity = capacity
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        # normalized number -> _Failure, least recently failed first
+        self._failures = OrderedDict()
+        # (retry at, normalized number, attempts), entries that no longer match _failures are skipped
+        self._retries = []
+        self._lock = Lock()
+        self.dials_saved = 0
+        self.retries = 0
+        self.dead = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._failures)
+
+    def record_failure(self, number: str, normalized: str, now: float):
+        """
+        :param number: The number as dialed
+        :param normalized: The normalized number
+        :param now: Time of the failure
+        """
+        with self._lock:
+            failure = self._failures.get(normalized)
+            if failure is None:
+                failure = self._failures[normalized] = _Failure(number)
+                while len(self._failures) > self.capacity:
+                    self._failures.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._failures.move_to_end(normalized)
+            failure.attempts += 1
+            if failure.attempts >= self.max_attempts:
+                logger.info('Giving up on %s after %d attempts', number, failure.attempts)
+                failure.retry_at = float('inf')
+                self.dead += 1
+                return
+            failure.retry_at = now + min(self.max_delay, self.base_delay * 2 ** (failure.attempts - 1))
+            heapq.heappush(self._retries, (failure.retry_at, normalized, failure.attempts))
+            if len(self._retries) > 2 * self.capacity:
+                self._rebuild_retries()
+
+    def record_success(self, normalized: str):
+        """
+        The number connected, forget it ever failed
+        """
+        with self._lock:
+            self._failures.pop(normalized, None)
+
+    def is_blocked(self, normalized: str, now: float) -> bool:
+        """
+        Whether a number is waiting on a retry or dead. A blocked number counts as a saved dial.
+        """
+        failure = self._failures.get(normalized)
+        if failure is None or now >= failure.retry_at:
+            return False
+        with self._lock:
+            self.dials_saved += 1
+        return True
+
+    def due_retry(self, now: float):
+        """
+        :return: The number of a failure whose backoff has passed, or None
+        """
+        with self._lock:
+            retries = self._retries
+            while retries and retries[0][0] <= now:
+                retry_at, normalized, attempts = heapq.heappop(retries)
+                failure = self._failures.get(normalized)
+                if failure is not None and failure.attempts == attempts:
+                    self.retries += 1
+                    return failure.number
+        return None
+
+    def report(self):
+        logger.info('Failure tracker: %d numbers, %d dials saved, %d retries, %d dead, %d evicted',
+                    len(self._failures), self.dials_saved, self.retries, self.dead, self.evicted)
+
+    def _rebuild_retries(self):
+        """
+        Drop heap entries for numbers that have since connected, failed again or been evicted
+        """
+        self._retries = [(failure.retry_at, normalized, failure.attempts)
+                         for normalized, failure in self._failures.items() if failure.attempts < self.max_attempts]
+        heapq.heapify(self._retries)
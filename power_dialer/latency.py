@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import math
+from typing import Dict, Iterable, Sequence
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def percentiles(samples: Iterable[float], points: Sequence[float] = PERCENTILES) -> Dict[float, float]:
+    """
+    Nearest rank percentiles
+
+    :param samples: Latencies, in any order
+    :param points: Percentiles wanted, 0-100
+    :return: Percentile to latency, 0.0 for every point when there are no samples
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {point: 0.0 for point in points}
+    last = len(ordered) - 1
+    return {point: ordered[min(last, max(0, math.ceil(len(ordered) * point / 100) - 1))] for point in points}
+
+
+def format_percentiles(values: Dict[float, float], scale: float = 1e6, unit: str = 'us') -> str:
+    """
+    :return: e.g. 'p50 12.0us p99 40.1us'
+    """
+    return ' '.join(f'p{point:g} {value * scale:.1f}{unit}' for point, value in values.items())
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import logging
+from threading import Lock
+from typing import Callable, List
+
+logger = logging.getLogger('power_dialer.lazy_service')
+
+# Every lazy service, in the order they were declared
+SERVICES: List['LazyService'] = []
+
+
+class LazyService:
+    """
+    Stands in for one of our pretend cloud services and only builds it when it is first used, so importing the
+    dialer, or handling an event that never touches the service, doesn't pay for threads and database connections.
+
+    Attribute and item access go straight through to the service. `start` and `shutdown` are the lifecycle hooks,
+    shutting down a service that was never started does nothing.
+    """
+
+    def __init__(self, name: str, factory: Callable):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = Lock()
+        SERVICES.append(self)
+
+    @property
+    def started(self) -> bool:
+        return self._instance is not None
+
+    def start(self):
+        """
+        Build the service if it hasn't been already
+
+        :return: The service
+        """
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                if self._instance is None:
+                    logger.info('Starting %s', self._name)
+                    self._instance = self._factory()
+                instance = self._instance
+        return instance
+
+    def shutdown(self):
+        instance = self._instance
+        if instance is not None and hasattr(instance, 'shutdown'):
+            instance.shutdown()
+
+    def __getattr__(self, name):
+        # Only called for names not found on the proxy itself
+        return getattr(self.start(), name)
+
+    def __getitem__(self, key):
+        return self.start()[key]
+
+    def __setitem__(self, key, value):
+        self.start()[key] = value
+
+    def __repr__(self):
+        return f'<LazyService {self._name} {"started" if self.started else "not started"}>'
+
+
+def start_all():
+    """
+    Build every service now, e.g. in an init phase that isn't billed to the first event
+    """
+    for service in SERVICES:
+        service.start()
+
+
+def shutdown_all():
+    for service in SERVICES:
+        service.shutdown()
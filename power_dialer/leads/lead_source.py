@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from dataclasses import dataclass
+from threading import Lock
+
+from power_dialer import clock
+from power_dialer.bloom_filter import BloomFilter
+from power_dialer.phone_number import NON_DIGIT_BYTES, PhoneNumber
+from .npa_time_zones import NPA_ZONES, UNKNOWN, ZONES, callable_zones
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger('power_dialer.leads.lead_source')
+
+# Leads are moved to and from disk this many at a time
+CHUNK_SIZE = 65536
+# Zone index used for area codes we have no zone for
+_UNKNOWN_ZONE = len(ZONES)
+
+
+class LeadsExhausted(LookupError):
+    """
+    Nothing left we're allowed to dial
+    """
+
+
+@dataclass
+class IngestStats:
+    path: str
+    rows: int
+    accepted: int
+    duplicates: int
+    invalid: int
+    elapsed: float
+    filter_bytes: int
+    peak_rss: int = None
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self):
+        rss = f'{self.peak_rss / 2 ** 20:.1f}MB' if self.peak_rss is not None else 'n/a'
+        return (f'{self.path}: {self.rows} rows, {self.accepted} accepted, {self.duplicates} duplicates, '
+                f'{self.invalid} invalid in {self.elapsed:.2f}s ({self.rate:,.0f} rows/s), '
+                f'dedupe filter {self.filter_bytes / 2 ** 20:.1f}MB, peak RSS {rss}')
+
+
+def _peak_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class _Spool:
+    """
+    A FIFO of normalized numbers kept on disk, only a chunk at each end is in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'w+b')
+        self._tail = array('q')
+        self._head = array('q')
+        self._head_index = 0
+        self._written = 0
+        self._read = 0
+
+    def __len__(self):
+        return self._written - self._read + len(self._tail) + len(self._head) - self._head_index
+
+    def append(self, value: int):
+        self._tail.append(value)
+        if len(self._tail) >= CHUNK_SIZE:
+            self._flush()
+
+    def pop(self) -> int:
+        if self._head_index >= len(self._head):
+            self._flush()
+            if self._read >= self._written:
+                raise IndexError('pop from empty spool')
+            head = array('q')
+            self._file.seek(self._read * head.itemsize)
+            head.fromfile(self._file, min(CHUNK_SIZE, self._written - self._read))
+            self._read += len(head)
+            self._head = head
+            self._head_index = 0
+        value = self._head[self._head_index]
+        self._head_index += 1
+        return value
+
+    def close(self):
+        self._file.close()
+
+    def _flush(self):
+        if self._tail:
+            self._file.seek(self._written * self._tail.itemsize)
+            self._tail.tofile(self._file)
+            self._written += len(self._tail)
+            self._tail = array('q')
+
+
+class LeadSource:
+    """
+    Leads loaded from delimited files, served in priority order.
+
+    Files are read through mmap and never held in memory; numbers are normalized with the same rules as
+    `NumberManager.normalize_number`, deduplicated with a Bloom filter sized for `capacity` leads and spooled to disk
+    per priority as 8 byte integers. Memory is the filter plus a couple of chunks per spool however big the lists are.
+
+    Lower priority values are dialed first, leads of equal priority in the order they were loaded. Leads whose area
+    code is outside calling hours are set aside per time zone and dialed first once their zone opens.
+    """
+
+    def __init__(self, capacity: int = 10000000, error_rate: float = 0.001, start_hour: int = 8,
+                 end_hour: int = 21, unknown_callable: bool = True, spool_directory: str = None):
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.unknown_callable = unknown_callable
+        self._seen = BloomFilter(capacity, error_rate)
+        self._directory = tempfile.mkdtemp(prefix='powerdialer-leads-', dir=spool_directory)
+        # priority -> spool
+        self._spools = {}
+        # zone -> spool of leads that were out of hours when we got to them
+        self._deferred = {}
+        self._callable = None
+        self._callable_minute = None
+        self._lock = Lock()
+        self.served = 0
+        self.deferred = 0
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(spool) for spool in self._spools.values()) + \
+                sum(len(spool) for spool in self._deferred.values())
+
+    def ingest(self, path: str, number_column: int = 0, priority_column: int = None, delimiter: str = ',',
+               header: bool = True) -> IngestStats:
+        """
+        Load a lead file. Fields are split on the delimiter, quoting isn't supported. Numbers are 10 digit NANP
+        numbers, with or without a leading 1 country code.
+
+        :param path: File of leads, one per line
+        :param number_column: Field holding the phone number
+        :param priority_column: Field holding an integer priority, everything is priority 0 without one
+        :param delimiter: Field separator
+        :param header: Skip the first line
+        :return: Counts, rate and memory
+        """
+        started = time.perf_counter()
+        rows = accepted = duplicates = invalid = 0
+        separator = delimiter.encode('utf-8')
+        add_if_absent = self._seen.add_if_absent
+        if os.path.getsize(path):
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, self._lock:
+                if header:
+                    mapped.readline()
+                spools = self._spools
+                for line in iter(mapped.readline, b''):
+                    fields = line.split(separator)
+                    rows += 1
+                    try:
+                        digits = fields[number_column].translate(None, NON_DIGIT_BYTES)
+                        priority = int(fields[priority_column]) if priority_column is not None else 0
+                    except (IndexError, ValueError):
+                        invalid += 1
+                        continue
+                    if len(digits) == 11 and digits[0] == 0x31:
+                        # +1 country code, the NANP number is the rest
+                        digits = digits[1:]
+                    elif len(digits) != 10:
+                        invalid += 1
+                        continue
+                    value = int(digits)
+                    if not add_if_absent(value):
+                        duplicates += 1
+                        continue
+                    try:
+                        spool = spools[priority]
+                    except KeyError:
+                        spool = spools[priority] = self._new_spool(f'priority-{priority}')
+                    spool.append(value)
+                    accepted += 1
+        stats = IngestStats(path, rows, accepted, duplicates, invalid, time.perf_counter() - started,
+                            self._seen.nbytes, _peak_rss())
+        logger.info('Ingested %r', stats)
+        return stats
+
+    def next_lead(self) -> PhoneNumber:
+        """
+        Get the next lead we're allowed to dial
+
+        :return: Phone number
+        :raises LeadsExhausted: When there is nothing left that is inside calling hours
+        """
+        with self._lock:
+            table = self._callable_table()
+            for zone, spool in self._deferred.items():
+                if table[zone] and len(spool):
+                    return self._serve(spool.pop())
+            for priority in sorted(self._spools):
+                spool = self._spools[priority]
+                while len(spool):
+                    value = spool.pop()
+                    zone = self._zone(value)
+                    if table[zone]:
+                        return self._serve(value)
+                    try:
+                        deferred = self._deferred[zone]
+                    except KeyError:
+                        deferred = self._deferred[zone] = self._new_spool(f'deferred-{zone}')
+                    deferred.append(value)
+                    self.deferred += 1
+                # Exhausted, free the disk
+                spool.close()
+                os.unlink(spool.path)
+                del self._spools[priority]
+        raise LeadsExhausted('No leads left inside calling hours')
+
+    def close(self):
+        with self._lock:
+            for spool in list(self._spools.values()) + list(self._deferred.values()):
+                spool.close()
+            self._spools = {}
+            self._deferred = {}
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+    def _serve(self, value: int) -> PhoneNumber:
+        self.served += 1
+        return PhoneNumber.from_value(value)
+
+    @staticmethod
+    def _zone(value: int) -> int:
+        zone = NPA_ZONES[value // 10000000]
+        return _UNKNOWN_ZONE if zone == UNKNOWN else zone
+
+    def _callable_table(self) -> bytearray:
+        """
+        The zone table only changes on the minute, rebuild it then
+        """
+        now = clock.now()
+        minute = int(now // 60)
+        if minute != self._callable_minute:
+            table = callable_zones(datetime.datetime.utcfromtimestamp(now), self.start_hour, self.end_hour)
+            table.append(self.unknown_callable)
+            self._callable = table
+            self._callable_minute = minute
+        return self._callable
+
+    def _new_spool(self, name: str) -> _Spool:
+        return _Spool(os.path.join(self._directory, f'{name}.leads'))
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Area code (NPA) to time zone.
+
+Area codes that straddle a zone boundary are given the zone most of their numbers are in. Offsets are standard time
+in minutes from UTC, zones that observe daylight saving time are adjusted by `utc_offset`.
+"""
+import datetime
+from array import array
+
+# Offset, observes DST, area codes
+_ZONES = (
+    # Newfoundland
+    (-210, True, '709'),
+    # Atlantic
+    (-240, True, '506 782 902'),
+    # Puerto Rico, Virgin Islands
+    (-240, False, '340 787 939'),
+    # Eastern
+    (-300, True,
+     '201 202 203 207 212 215 216 220 223 226 229 231 234 239 240 248 249 252 260 267 269 272 276 283 289 301 302 '
+     '304 305 313 315 317 321 330 332 336 339 343 347 351 352 365 367 380 386 401 404 407 410 412 413 416 418 419 '
+     '423 434 437 438 440 443 445 450 463 470 475 478 484 502 508 513 514 516 517 518 519 540 548 551 561 567 570 '
+     '571 574 579 581 585 586 603 606 607 609 610 613 614 616 617 631 646 647 667 678 680 681 703 704 705 706 716 '
+     '717 718 724 727 732 734 740 743 754 757 762 765 770 772 774 781 786 802 803 804 810 812 813 814 819 828 838 '
+     '843 845 848 850 854 856 857 859 860 862 863 864 865 873 878 904 905 908 910 912 914 917 919 929 934 937 941 '
+     '947 954 959 973 978 980 984 989'),
+    # Central
+    (-360, True,
+     '204 205 210 214 217 218 219 224 225 228 251 254 256 262 270 281 309 312 314 316 318 319 320 325 331 334 337 '
+     '346 361 364 402 405 409 414 417 430 431 432 469 479 501 504 507 512 515 531 534 539 563 573 580 601 608 612 '
+     '615 618 620 629 630 636 641 651 660 662 682 701 708 712 713 715 731 737 763 769 773 779 785 806 807 815 816 '
+     '817 830 832 847 870 872 901 903 913 918 920 931 936 938 940 952 956 972 979 985'),
+    # Saskatchewan
+    (-360, False, '306 639'),
+    # Mountain
+    (-420, True, '208 303 307 385 403 406 435 505 575 587 719 720 780 801 825 915 970 986'),
+    # Arizona
+    (-420, False, '480 520 602 623 928'),
+    # Pacific
+    (-480, True,
+     '206 209 213 236 250 253 279 310 323 341 360 408 415 424 425 442 458 503 509 510 530 541 559 562 564 604 619 '
+     '626 628 650 657 661 669 702 707 714 725 747 760 775 778 805 818 820 831 858 909 916 925 949 951 971'),
+    # Alaska
+    (-540, True, '907'),
+    # Hawaii
+    (-600, False, '808'),
+)
+
+# Standard offset in minutes and whether the zone observes DST, indexed by zone
+ZONES = tuple((offset, dst) for offset, dst, _npas in _ZONES)
+UNKNOWN = -1
+# NPA -> index into ZONES, UNKNOWN for unassigned codes
+NPA_ZONES = array('b', [UNKNOWN]) * 1000
+
+for _zone, (_offset, _dst, _npas) in enumerate(_ZONES):
+    for _npa in _npas.split():
+        NPA_ZONES[int(_npa)] = _zone
+
+
+def in_us_dst(now: datetime.datetime) -> bool:
+    """
+    Whether daylight saving time is in effect, second Sunday in March to the first Sunday in November (2am local,
+    close enough for call windows)
+
+    :param now: UTC time
+    """
+    march = datetime.datetime(now.year, 3, 8)
+    start = march + datetime.timedelta(days=(6 - march.weekday()) % 7, hours=7)
+    november = datetime.datetime(now.year, 11, 1)
+    end = november + datetime.timedelta(days=(6 - november.weekday()) % 7, hours=6)
+    return start <= now < end
+
+
+def utc_offset(npa: int, now: datetime.datetime):
+    """
+    :return: The current offset in minutes for an area code, or None if we don't know it
+    """
+    zone = NPA_ZONES[npa]
+    if zone == UNKNOWN:
+        return None
+    offset, dst = ZONES[zone]
+    if dst and in_us_dst(now):
+        offset += 60
+    return offset
+
+
+def callable_zones(now: datetime.datetime, start_hour: int = 8, end_hour: int = 21) -> bytearray:
+    """
+    Work out which zones are inside calling hours.
+
+    :param now: UTC time
+    :param start_hour: First local hour we may call
+    :param end_hour: Local hour calls must stop
+    :return: Zone indexed table, 1 where calls are allowed
+    """
+    dst = in_us_dst(now)
+    minutes = now.hour * 60 + now.minute
+    table = bytearray(len(ZONES))
+    for zone, (offset, observes_dst) in enumerate(ZONES):
+        if dst and observes_dst:
+            offset += 60
+        local = (minutes + offset) % 1440
+        table[zone] = start_hour * 60 <= local < end_hour * 60
+    return table
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from threading import Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .bounded_queue import BoundedQueue, OverflowPolicy
+from .dialer_state_machine import AgentState
+from .event_log import CALLBACKS, Event, EventType
+from .latency import percentiles, format_percentiles
+from .power_dialer_interface import PowerDialerInterface
+from .services import get_lead_phone_number_to_dial
+
+logger = logging.getLogger('power_dialer.load_generator')
+
+LOAD_PERCENTILES = (50, 99, 99.9)
+# Events waiting for a worker before new arrivals are dropped, so an overloaded step can't exhaust memory
+MAX_BACKLOG = 100000
+# A step is saturated once the dialer completes less than this share of the arrivals
+SATURATION = 0.95
+# Chance an idle agent logs out rather than taking a call
+LOGOUT_CHANCE = 0.01
+# Generator sleeps shorter than this are skipped, arrivals already due are sent together
+MIN_SLEEP = 0.001
+
+
+def rate_steps(start: float, step: float, count: int) -> List[float]:
+    """
+    :return: `count` arrival rates, `start` then going up by `step`
+    """
+    return [start + step * i for i in range(count)]
+
+
+@dataclass
+class StepStats:
+    # Arrivals per second offered
+    rate: float
+    offered: int = 0
+    completed: int = 0
+    # Arrivals thrown away with the backlog full
+    dropped: int = 0
+    errors: int = 0
+    # From the first arrival to the last completion
+    elapsed: float = 0.0
+    # Events waiting for a worker, at most
+    backlog: int = 0
+    # Each dialer queue's high water mark during the step
+    queue_depths: Dict[str, int] = field(default_factory=dict)
+    # From when an event was due, not when a worker got to it, so queueing counts
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def saturated(self) -> bool:
+        return self.throughput < self.rate * SATURATION
+
+    def percentiles(self) -> Dict[float, float]:
+        return percentiles(self.latencies, LOAD_PERCENTILES)
+
+    def report(self) -> str:
+        depths = ' '.join(f'{name} {depth}' for name, depth in self.queue_depths.items())
+        return (f'{self.rate:8,.0f}/s offered {self.throughput:8,.0f}/s done  '
+                f'{format_percentiles(self.percentiles(), 1e3, "ms")}  backlog {self.backlog} {depths}'
+                f'{"  dropped " + str(self.dropped) if self.dropped else ""}{"  SATURATED" if self.saturated else ""}')
+
+    def summary(self) -> dict:
+        """
+        :return: Plain numbers, for comparing runs
+        """
+        return {
+            'rate': self.rate,
+            'throughput': self.throughput,
+            'offered': self.offered,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'backlog': self.backlog,
+            'queue_depths': self.queue_depths,
+            'percentiles': {str(point): value for point, value in self.percentiles().items()},
+        }
+
+
+class AgentPopulation:
+    """
+    Plausible events for a population of agents: each logs in, then calls fail or start and end, with the odd
+    logout. Arrivals don't wait for the dialer, so an agent's next event can be handled while its last one still is,
+    just as it can when events come off a queue.
+    """
+
+    def __init__(self, agents: int, call_fail: float = 0.5, seed: int = None):
+        self.agent_ids = [f'agent_{i:04d}' for i in range(agents)]
+        self.call_fail = call_fail
+        self._states = [AgentState.offline] * agents
+        self._numbers: List[Optional[str]] = [None] * agents
+        self._random = random.Random(seed)
+
+    def next_event(self) -> Tuple[str, EventType, Optional[str]]:
+        """
+        :return: Agent id, event type and number
+        """
+        rand = self._random.random
+        agent = self._random.randrange(len(self.agent_ids))
+        state = self._states[agent]
+        if state is AgentState.offline:
+            self._states[agent] = AgentState.idle
+            return self.agent_ids[agent], EventType.agent_login, None
+        if state is AgentState.busy:
+            self._states[agent] = AgentState.idle
+            return self.agent_ids[agent], EventType.call_ended, self._numbers[agent]
+        if rand() < LOGOUT_CHANCE:
+            self._states[agent] = AgentState.offline
+            return self.agent_ids[agent], EventType.agent_logout, None
+        number = get_lead_phone_number_to_dial()
+        if rand() < self.call_fail:
+            return self.agent_ids[agent], EventType.call_failed, number
+        self._states[agent] = AgentState.busy
+        self._numbers[agent] = number
+        return self.agent_ids[agent], EventType.call_started, number
+
+
+class LoadGenerator:
+    """
+    Open loop load: events arrive on a schedule whatever the dialer's doing, and a fixed pool of workers handles them,
+    building a dialer per event the way the event handlers do. Latency is measured from when an event was due, so time
+    spent waiting for a worker shows up rather than slowing the arrivals down.
+
+    Run steps of increasing rate to find where throughput stops keeping up and latency climbs.
+    """
+
+    def __init__(self, dialer_factory: Callable[[str], PowerDialerInterface], population: AgentPopulation,
+                 workers: int = 8, queues: Iterable[BoundedQueue] = (), poisson: bool = True,
+                 max_backlog: int = MAX_BACKLOG, seed: int = None):
+        """
+        :param dialer_factory: Builds the dialer for an agent id, e.g. `PowerDialer`
+        :param population: Where events come from
+        :param workers: Threads handling events
+        :param queues: Dialer queues whose depths are reported, e.g. `NumberManager.CALL_QUEUE`
+        :param poisson: Random gaps between arrivals with the target mean, otherwise evenly spaced
+        :param max_backlog: Events waiting for a worker before arrivals are dropped
+        """
+        self.dialer_factory = dialer_factory
+        self.population = population
+        self.queues = list(queues)
+        self.poisson = poisson
+        self._random = random.Random(seed)
+        self._backlog = BoundedQueue(max_backlog, OverflowPolicy.drop, name='load_backlog')
+        self._step: Optional[StepStats] = None
+        self._errors_lock = Lock()
+        self._workers = [Thread(target=self._work, name=f'load_worker_{i}', daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def run(self, rates: Sequence[float], duration: float, stop_after: int = 0,
+            on_step: Callable[[StepStats], None] = None) -> List[StepStats]:
+        """
+        :param rates: Arrival rate for each step, events per second
+        :param duration: Seconds of arrivals per step
+        :param stop_after: Stop once this many steps in a row are saturated, 0 runs every step
+        :param on_step: Called with each step's results as it finishes
+        :return: Each step's results, the saturation curve
+        """
+        steps = []
+        saturated = 0
+        for rate in rates:
+            step = self.run_step(rate, duration)
+            logger.info('Load step %s', step.report())
+            steps.append(step)
+            if on_step is not None:
+                on_step(step)
+            saturated = saturated + 1 if step.saturated else 0
+            if stop_after and saturated >= stop_after:
+                break
+        return steps
+
+    def run_step(self, rate: float, duration: float) -> StepStats:
+        """
+        Offer events at `rate` for `duration` seconds, then wait for the backlog to drain
+        """
+        step = self._step = StepStats(rate)
+        for queue in self.queues:
+            queue.reset_high_water()
+        self._backlog.reset_high_water()
+        dropped = self._backlog.dropped
+        perf_counter = time.perf_counter
+        started = due = perf_counter()
+        end = started + duration
+        while due < end:
+            wait = due - perf_counter()
+            if wait > MIN_SLEEP:
+                time.sleep(wait)
+            agent_id, event_type, number = self.population.next_event()
+            self._backlog.put(Event(due, event_type, agent_id, number))
+            step.offered += 1
+            # Even arrivals are worked out from the start so the gaps don't accumulate rounding
+            due = due + self._random.expovariate(rate) if self.poisson else started + step.offered / rate
+        self._backlog.join()
+        step.elapsed = max(perf_counter() - started, duration)
+        step.completed = len(step.latencies)
+        step.dropped = self._backlog.dropped - dropped
+        step.backlog = self._backlog.stats().high_water
+        step.queue_depths = {queue.name: queue.stats().high_water for queue in self.queues}
+        self._step = None
+        return step
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._backlog.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _work(self):
+        perf_counter = time.perf_counter
+        while True:
+            event = self._backlog.get()
+            try:
+                if event is None:
+                    return
+                step = self._step
+                try:
+                    getattr(self.dialer_factory(event.agent_id), CALLBACKS[event.event_type])(*event.args)
+                except Exception:
+                    logger.exception('Load event %s for %s failed', event.event_type.name, event.agent_id)
+                    with self._errors_lock:
+                        step.errors += 1
+                # The timestamp is when the event was due
+                step.latencies.append(perf_counter() - event.timestamp)
+            finally:
+                self._backlog.task_done()
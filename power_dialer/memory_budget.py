@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import sys
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from threading import Event, Lock, Thread
+from typing import Callable, Iterable, List, Optional
+
+from . import clock
+from .lazy_service import LazyService
+
+logger = logging.getLogger('power_dialer.memory_budget')
+
+# Bytes the accounted caches may use between them, e.g. 512M; 0 is no limit
+MEMORY_BUDGET = os.environ.get('POWER_DIALER_MEMORY_BUDGET', '0')
+# Seconds between budget checks
+CHECK_INTERVAL = 1.0
+# Once over budget, shed down to this share of it so the next few inserts don't trip it again
+SHED_TARGET = 0.9
+# Entries looked at to estimate the size of one
+SAMPLE_SIZE = 16
+# Shed events kept for `MemoryAccountant.events`
+EVENTS_KEPT = 100
+_UNITS = {'': 1, 'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30}
+
+
+def parse_size(size: str) -> int:
+    """
+    :param size: Bytes, optionally with a K, M or G suffix
+    :return: Bytes
+    """
+    size = size.strip().upper().rstrip('B')
+    unit = size[-1:] if size[-1:] in _UNITS else ''
+    return int(float(size[:len(size) - len(unit)]) * _UNITS[unit])
+
+
+def object_size(item) -> int:
+    """
+    Rough size of an item and what it holds directly, one level down
+    """
+    size = sys.getsizeof(item)
+    attributes = getattr(item, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes) + sum(sys.getsizeof(value) for value in attributes.values())
+    elif isinstance(item, tuple):
+        size += sum(sys.getsizeof(value) for value in item)
+    return size
+
+
+def _head(items: Iterable) -> list:
+    # Owners without a lock may change a dict while we look at it, just try again
+    for _ in range(3):
+        try:
+            return list(islice(items, SAMPLE_SIZE))
+        except RuntimeError:
+            continue
+    return []
+
+
+def sampled_size(items: Iterable, count: int) -> int:
+    """
+    Estimate the size of `count` items from the first few
+    """
+    sample = _head(items)
+    if not sample:
+        return 0
+    return sum(object_size(item) for item in sample) * count // len(sample)
+
+
+@dataclass
+class CacheUsage:
+    name: str
+    entries: int
+    nbytes: int
+
+    def __repr__(self):
+        return f'{self.name:20s} {self.entries:10,d} entries {self.nbytes / 2 ** 20:10.2f} MB'
+
+
+@dataclass
+class ShedEvent:
+    timestamp: float
+    cache: str
+    entries: int
+    nbytes: int
+    total: int
+    budget: int
+
+
+class AccountedCache:
+    """
+    A cache the accountant can measure and, when the budget is exceeded, ask to give memory back. Lower priorities
+    are shed first, so give the caches that are cheapest to lose the lowest.
+    """
+    name = 'cache'
+    priority = 0
+
+    def usage(self) -> CacheUsage:
+        raise NotImplementedError
+
+    def shed(self, nbytes: int) -> int:
+        """
+        Free about `nbytes` by whatever means suit the cache
+
+        :return: Entries let go
+        """
+        return 0
+
+
+class DictCache(AccountedCache):
+    """
+    A dict owned by something else, looked up as an attribute each time as owners swap in new dicts. Sheds its oldest
+    entries, only those `sheddable(key, value)` allows if it's given.
+    """
+
+    def __init__(self, name: str, owner, attribute: str, lock: Lock = None,
+                 sheddable: Callable[[object, object], bool] = None, priority: int = 0):
+        self.name = name
+        self.priority = priority
+        self._owner = owner
+        self._attribute = attribute
+        self._lock = lock
+        self._sheddable = sheddable
+
+    @property
+    def _dict(self) -> dict:
+        return getattr(self._owner, self._attribute)
+
+    def usage(self) -> CacheUsage:
+        entries = self._dict
+        count = len(entries)
+        return CacheUsage(self.name, count, sys.getsizeof(entries) + sampled_size(entries.items(), count))
+
+    def shed(self, nbytes: int) -> int:
+        entries = self._dict
+        per_entry = sampled_size(entries.items(), 1)
+        if not per_entry:
+            return 0
+        wanted = -(-nbytes // per_entry)
+        if self._lock is not None:
+            with self._lock:
+                return self._shed(self._dict, wanted)
+        return self._shed(entries, wanted)
+
+    def _shed(self, entries: dict, wanted: int) -> int:
+        # Copying the keys is atomic, iterating over the dict isn't
+        if self._sheddable is None:
+            victims = list(entries)[:wanted]
+        else:
+            victims = [key for key, value in list(entries.items()) if self._sheddable(key, value)][:wanted]
+        for key in victims:
+            entries.pop(key, None)
+        return len(victims)
+
+
+class QueueCache(AccountedCache):
+    """
+    A `BoundedQueue`, sheds by paging waiting items out to its disk buffer
+    """
+
+    def __init__(self, queue, priority: int = 1):
+        self.name = queue.name
+        self.priority = priority
+        self._queue = queue
+
+    def usage(self) -> CacheUsage:
+        queue = self._queue
+        with queue.mutex:
+            count = len(queue.queue)
+            size = sys.getsizeof(queue.queue) + sampled_size(queue.queue, count)
+        return CacheUsage(self.name, count, size)
+
+    def shed(self, nbytes: int) -> int:
+        queue = self._queue
+        with queue.mutex:
+            per_entry = sampled_size(queue.queue, 1)
+        if not per_entry:
+            return 0
+        return queue.page_out(-(-nbytes // per_entry))
+
+
+class MemoryAccountant:
+    """
+    Measures the caches registered with it against a budget.
+
+    Every `interval` seconds, or when `enforce` is called, the caches' estimated sizes are added up. Over the budget,
+    caches are asked to shed, lowest priority first, until the total is back under `SHED_TARGET` of the budget. Each
+    shed is logged, kept in `events` and passed to every listener. Without a budget, usage is only reported.
+    """
+
+    def __init__(self, budget: int = None, interval: float = CHECK_INTERVAL):
+        self.budget = parse_size(MEMORY_BUDGET) if budget is None else budget
+        self.interval = interval
+        self.events = deque(maxlen=EVENTS_KEPT)
+        self._caches: List[AccountedCache] = []
+        self._listeners: List[Callable[[ShedEvent], None]] = []
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Optional[Thread] = None
+
+    def register(self, cache: AccountedCache):
+        """
+        Account for a cache
+        """
+        with self._lock:
+            self._caches.append(cache)
+            self._caches.sort(key=lambda registered: registered.priority)
+            if self.budget and self._thread is None:
+                self._thread = Thread(target=self._check, name='memory_accountant', daemon=True)
+                self._thread.start()
+
+    def unregister(self, cache: AccountedCache):
+        with self._lock:
+            if cache in self._caches:
+                self._caches.remove(cache)
+
+    def subscribe(self, listener: Callable[[ShedEvent], None]):
+        self._listeners.append(listener)
+
+    def usage(self) -> List[CacheUsage]:
+        return [cache.usage() for cache in list(self._caches)]
+
+    def total(self) -> int:
+        return sum(usage.nbytes for usage in self.usage())
+
+    def enforce(self) -> List[ShedEvent]:
+        """
+        Shed if the caches are over budget
+
+        :return: The sheds this made
+        """
+        if not self.budget:
+            return []
+        usage = {cache: cache.usage() for cache in list(self._caches)}
+        total = sum(used.nbytes for used in usage.values())
+        if total <= self.budget:
+            return []
+        target = int(self.budget * SHED_TARGET)
+        events = []
+        for cache, used in usage.items():
+            if total <= target:
+                break
+            entries = cache.shed(min(used.nbytes, total - target))
+            if not entries:
+                continue
+            freed = used.nbytes - cache.usage().nbytes
+            total -= max(freed, 0)
+            event = ShedEvent(clock.now(), cache.name, entries, freed, total, self.budget)
+            events.append(event)
+            self._emit(event)
+        if total > self.budget:
+            logger.error('Still over the memory budget after shedding: %d of %d bytes', total, self.budget)
+        return events
+
+    def report(self):
+        for usage in self.usage():
+            logger.info('Memory %r', usage)
+        logger.info('Memory total %d bytes of a %s budget, %d sheds', self.total(), self.budget or 'unlimited',
+                    len(self.events))
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _emit(self, event: ShedEvent):
+        self.events.append(event)
+        logger.warning('Over memory budget: shed %d entries (%d bytes) from %s, %d of %d bytes used', event.entries,
+                       event.nbytes, event.cache, event.total, event.budget)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception('Memory budget listener failed')
+
+    def _check(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.enforce()
+            except Exception:
+                logger.exception('Memory budget check failed')
+
+
+# Caches accounted for before the accountant started
+_pending: List[AccountedCache] = []
+_pending_lock = Lock()
+_adopted = False
+
+
+def _create_accountant() -> MemoryAccountant:
+    global _adopted
+    accountant = MemoryAccountant()
+    with _pending_lock:
+        for cache in _pending:
+            accountant.register(cache)
+        _pending.clear()
+        _adopted = True
+    return accountant
+
+
+Memory = LazyService('memory_accountant', _create_accountant)
+
+
+def account(cache: AccountedCache):
+    """
+    Account for a cache with `Memory`. With a budget configured the accountant starts now to enforce it, otherwise
+    the cache waits for something to ask about usage.
+    """
+    if not _adopted and not parse_size(MEMORY_BUDGET):
+        with _pending_lock:
+            if not _adopted:
+                _pending.append(cache)
+                return
+    Memory.register(cache)
@@ -1,14 +1,50 @@
 # -*- coding: utf-8 -*-
 import logging
-from queue import Queue, Empty
+from collections import deque
+from queue import Empty
 from threading import Thread, Lock
 import time
+from typing import Dict, List, Optional
 
+from . import clock
+from .bounded_queue import BoundedQueue, OverflowPolicy
+from .failure_tracker import FailureTracker
+from .latency import percentiles, format_percentiles
+from .exclusion.exclusion_store import ExclusionStore
+from .leads.lead_source import LeadSource, LeadsExhausted
+from .memory_budget import DictCache, QueueCache, account
+from .phone_number import NUMBER_DIGITS, PhoneNumber, normalize_number
 from .services import get_lead_phone_number_to_dial
 from .singleton import Singleton
 
 logger = logging.getLogger('power_dialer.number_manager')
 
+# Dialed numbers are what stop us calling someone twice, so by default we'd rather spill them than lose them
+CALL_QUEUE_SIZE = 10000
+CALL_QUEUE_POLICY = OverflowPolicy.spill
+# Numbers checked against an exclusion store per request
+RESERVE_BATCH = 8
+# Most recent `get_number` latencies kept for `latency_percentiles`
+LATENCY_SAMPLES = 10000
+
+
+class Campaign:
+    """
+    A campaign's exclusion rule: don't call a number the campaign has dialed within `exclude_time` seconds
+    """
+    __slots__ = ('name', 'bit', 'exclude_time', 'reserved')
+
+    def __init__(self, name: str, bit: int, exclude_time: float):
+        self.name = name
+        # The campaign's bit in `NumberManager.campaign_members`
+        self.bit = bit
+        self.exclude_time = exclude_time
+        # Numbers reserved in an exclusion store for this campaign but not handed out yet
+        self.reserved = deque()
+
+    def __repr__(self):
+        return f'Campaign({self.name!r}, {self.exclude_time})'
+
 
 class NumberManager(metaclass=Singleton):
     """
@@ -16,26 +52,66 @@ class NumberManager(metaclass=Singleton):
     In this case, we're going to use seconds and not days...
 
     We also want to avoid hammering failed numbers so we're going to keep a volatile cache
+
+    Campaigns can have their own exclusion windows. Every campaign shares `calls`, one last dial time per number, and
+    `campaign_members` notes which campaigns have dialed each number as a bit mask, so a number is only stored once
+    however many campaigns track it. A number whose last dial had no campaign has no mask and counts against every
+    campaign's window. Dials without a campaign use `call_exclude_time` and are excluded whoever dialed them.
     """
     # Emulates an SQS FIFO or SNS Topic
-    CALL_QUEUE = Queue()
+    CALL_QUEUE = BoundedQueue(CALL_QUEUE_SIZE, CALL_QUEUE_POLICY, name='call_queue')
 
-    def __init__(self, call_exclude_time: int = 60, synchronous: bool = False):
+    def __init__(self, call_exclude_time: int = 60, synchronous: bool = False, queue_size: int = None,
+                 overflow_policy: OverflowPolicy = None, overflow_timeout: float = None,
+                 lead_source: LeadSource = None, failures: FailureTracker = None, exclusion: ExclusionStore = None,
+                 reserve_batch: int = RESERVE_BATCH):
         self.call_exclude_time = call_exclude_time
+        # Keep recent calls somewhere other than `calls`, e.g. shared with other dialer hosts
+        self.exclusion = exclusion
+        self.reserve_batch = reserve_batch
+        # Numbers reserved in the store but not handed out yet
+        self._reserved = deque()
+        # Without a lead source we make numbers up
+        self.lead_source = lead_source
+        # Numbers that failed to connect, these are backed off rather than redialed straight away
+        self.failures = failures if failures is not None else FailureTracker()
+        self.CALL_QUEUE.configure(queue_size, overflow_policy, overflow_timeout)
         self.calls = {}
+        # Number to a mask of the campaigns that dialed it, only numbers dialed for a campaign are here
+        self.campaign_members: Dict[str, int] = {}
+        self.campaigns: Dict[str, Campaign] = {}
+        # One int object for each mask in use rather than one per number
+        self._masks: Dict[int, int] = {}
         # Used to swap the call cache
         self.call_lock = Lock()
         # Testing a set is faster than a range check or checking string.digits
-        self.number_digits = set(str(c) for c in range(10))
+        self.number_digits = NUMBER_DIGITS
         # If we haven't cleaned up for a minute, clean up
-        self.last_expiry_time = time.time()
+        self.last_expiry_time = clock.now()
         self.running = True
+        self.synchronous = synchronous
         self.number_thread = None
-        if not synchronous:
-            t = Thread(target=self.number_listener)
-            t.daemon = False
-            t.start()
-            self.number_thread = t
+        self._thread_lock = Lock()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        # Losing a recent call means calling someone again too soon, so only calls already past every window, that
+        # expiry hasn't got to yet, can be shed
+        account(DictCache('recent_calls', self, 'calls', self.call_lock, sheddable=self._expired, priority=3))
+        account(DictCache('campaign_members', self, 'campaign_members', self.call_lock,
+                          sheddable=lambda number, mask: self._expired(number, self.calls.get(number)), priority=3))
+        account(QueueCache(self.CALL_QUEUE))
+
+    def start(self):
+        """
+        Start the listener, this is put off until the first number is handed out
+        """
+        if self.synchronous or self.number_thread is not None:
+            return
+        with self._thread_lock:
+            if self.number_thread is None:
+                t = Thread(target=self.number_listener)
+                t.daemon = False
+                t.start()
+                self.number_thread = t
 
     def normalize_number(self, number: str) -> str:
         """
@@ -43,12 +119,85 @@ class NumberManager(metaclass=Singleton):
         :param number: A phone number
         :return: A normalized number containing only digits
         """
-        return ''.join(c for c in number if c in self.number_digits)
+        return normalize_number(number)
+
+    def add_campaign(self, name: str, exclude_time: float) -> Campaign:
+        """
+        Add a campaign, or change an existing campaign's window
+
+        :param name: Campaign name, passed to `get_number`, `get_numbers` and `warm_cache`
+        :param exclude_time: Seconds before the campaign can dial a number again
+        :return: The campaign
+        """
+        with self.call_lock:
+            campaign = self.campaigns.get(name)
+            if campaign is not None:
+                campaign.exclude_time = exclude_time
+                return campaign
+            campaign = self.campaigns[name] = Campaign(name, 1 << len(self.campaigns), exclude_time)
+            return campaign
+
+    def _campaign(self, name: Optional[str]) -> Optional[Campaign]:
+        if name is None:
+            return None
+        try:
+            return self.campaigns[name]
+        except KeyError:
+            raise ValueError(f'Unknown campaign {name!r}') from None
+
+    def _excluded(self, normalized: str, now: float, campaign: Optional[Campaign]) -> bool:
+        """
+        Has the number been dialed too recently? A campaign counts its own dials and dials without a campaign. Call
+        with the call lock held.
+        """
+        if campaign is None:
+            exclude_time = self.call_exclude_time
+        else:
+            mask = self.campaign_members.get(normalized, 0)
+            if mask and not mask & campaign.bit:
+                # Only other campaigns have dialed it
+                return False
+            exclude_time = campaign.exclude_time
+        timestamp = self.calls.get(normalized)
+        return timestamp is not None and now - timestamp < exclude_time
+
+    def _join(self, normalized: str, campaign: Optional[Campaign]):
+        """
+        Note the campaign dialed the number, or without a campaign that every campaign should count it. Call with the
+        call lock held.
+        """
+        if campaign is None:
+            if self.campaign_members:
+                self.campaign_members.pop(normalized, None)
+            return
+        mask = self.campaign_members.get(normalized, 0) | campaign.bit
+        self.campaign_members[normalized] = self._masks.setdefault(mask, mask)
+
+    def _expired(self, normalized: str, timestamp: Optional[float]) -> bool:
+        """
+        Is a call past every exclusion window, so forgetting it changes nothing? Call with the call lock held.
+        """
+        return timestamp is None or clock.now() - timestamp >= self._longest_window()
+
+    def _longest_window(self) -> float:
+        return max([self.call_exclude_time] + [campaign.exclude_time for campaign in list(self.campaigns.values())])
 
     def shutdown(self):
         logger.info('Shutting down Number Manager')
         self.running = False
         self.CALL_QUEUE.put(None)
+        self.CALL_QUEUE.report()
+        self.failures.report()
+        if self.exclusion is not None:
+            self.exclusion.report()
+        if self.latencies:
+            logger.info('get_number latency %s', format_percentiles(self.latency_percentiles()))
+
+    def latency_percentiles(self) -> dict:
+        """
+        :return: Percentiles of recent `get_number` latencies, in seconds
+        """
+        return percentiles(self.latencies)
 
     def number_listener(self):
         """
@@ -64,45 +213,183 @@ class NumberManager(metaclass=Singleton):
                 # This would normally be a parallel task, but this is fine for our pretend case
                 self.expire_entries()
                 continue
-            number = self.normalize_number(number)
-            with self.call_lock:
-                self.calls[number] = time.time()
+            if self.exclusion is None:
+                # An exclusion store already has the number, it was reserved in `get_number`
+                number = self.normalize_number(number)
+                with self.call_lock:
+                    self.calls[number] = clock.now()
 
             # Clean up if we haven't for a while
-            if time.time() - self.last_expiry_time > 60:
+            if clock.now() - self.last_expiry_time > 60:
                 self.expire_entries()
 
     def expire_entries(self):
         """
         Clear out old entries
         """
-        expiry = time.time() - self.call_exclude_time
+        expiry = clock.now() - self._longest_window()
+        if self.exclusion is not None:
+            self.exclusion.expire(expiry)
+            self.last_expiry_time = clock.now()
+            return
         new_numbers = {number: timestamp for number, timestamp in self.calls.items() if timestamp > expiry}
         with self.call_lock:
             self.calls = new_numbers
-            self.last_expiry_time = time.time()
+            if self.campaign_members:
+                self.campaign_members = {number: mask for number, mask in self.campaign_members.items()
+                                         if number in new_numbers}
+            self.last_expiry_time = clock.now()
 
-    def warm_cache(self, numbers: dict):
+    def warm_cache(self, numbers: dict, campaign: str = None):
         """
         Update the call list
 
         :param numbers: Dictionary with numbers as keys and call times as timestamps
+        :param campaign: The campaign that dialed them, otherwise they count against every campaign's window
         """
+        if self.exclusion is not None:
+            self.exclusion.warm({self.normalize_number(k): v for k, v in numbers.items()})
+            self.expire_entries()
+            return
+        member = self._campaign(campaign)
         with self.call_lock:
             for k, v in numbers.items():
-                self.calls[self.normalize_number(k)] = v
+                normalized = self.normalize_number(k)
+                self.calls[normalized] = v
+                self._join(normalized, member)
 
         self.expire_entries()
 
-    def get_number(self) -> str:
+    def record_failure(self, number: str):
+        """
+        A call to the number failed, back it off
+        """
+        self.failures.record_failure(number, self.normalize_number(number), clock.now())
+
+    def record_success(self, number: str):
+        """
+        A call to the number connected
+        """
+        self.failures.record_success(self.normalize_number(number))
+
+    def get_number(self, campaign: str = None) -> PhoneNumber:
         """
-        Get a new number that isn't in the recent calls cache
+        Get a new number that isn't in the recent calls cache or backed off after failing.
+        Failed numbers whose backoff has passed come first, they never reached anyone so they skip the recent calls
+        check.
+        :param campaign: Check the campaign's exclusion window, see `add_campaign`
         :return: Phone number
+        :raises LeadsExhausted: If the lead source has nothing left to dial
         """
-        success = False
+        started = time.perf_counter()
+        self.start()
+        member = self._campaign(campaign)
+        now = clock.now()
+        number = self.failures.due_retry(now)
+        success = number is not None
+        if success:
+            number = PhoneNumber.parse(number)
         with self.call_lock:
+            if self.exclusion is not None:
+                if success:
+                    # The listener leaves dial times to the store, so a retry has to be recorded here
+                    self.exclusion.record(self.normalize_number(number), now)
+                else:
+                    number = self._reserve_numbers(now, 1, member)[0]
+                    success = True
+            normalized = None
             while not success:
-                number = get_lead_phone_number_to_dial()
-                success = self.normalize_number(number) not in self.calls
+                number = self._next_lead()
+                normalized = self.normalize_number(number)
+                success = not self._excluded(normalized, now, member) and not self.failures.is_blocked(normalized, now)
+            if self.exclusion is None and (member is not None or self.campaign_members):
+                self._join(normalized or self.normalize_number(number), member)
         self.CALL_QUEUE.put(number)
+        self.latencies.append(time.perf_counter() - started)
         return number
+
+    def _next_lead(self) -> PhoneNumber:
+        if self.lead_source is not None:
+            return PhoneNumber.parse(self.lead_source.next_lead())
+        return PhoneNumber.parse(get_lead_phone_number_to_dial())
+
+    def get_numbers(self, count: int, campaign: str = None) -> List[PhoneNumber]:
+        """
+        Get several numbers at once for a batch of events, with the same checks as `get_number` and a single
+        reservation with the exclusion store for the lot.
+
+        :param count: Numbers wanted
+        :param campaign: Check the campaign's exclusion window, see `add_campaign`
+        :return: The numbers, fewer than `count` only if the lead source ran out
+        :raises LeadsExhausted: If the lead source has nothing left to dial
+        """
+        self.start()
+        member = self._campaign(campaign)
+        now = clock.now()
+        numbers = []
+        while len(numbers) < count:
+            number = self.failures.due_retry(now)
+            if number is None:
+                break
+            numbers.append(PhoneNumber.parse(number))
+        with self.call_lock:
+            if self.exclusion is not None:
+                if numbers:
+                    self.exclusion.warm({self.normalize_number(number): now for number in numbers})
+                try:
+                    numbers.extend(self._reserve_numbers(now, count - len(numbers), member))
+                except LeadsExhausted:
+                    if not numbers:
+                        raise
+            else:
+                # The listener hasn't seen any of these yet, so check the batch against itself too
+                batch = set()
+                if member is not None or self.campaign_members:
+                    for number in numbers:
+                        self._join(self.normalize_number(number), member)
+                while len(numbers) < count:
+                    try:
+                        number = self._next_lead()
+                    except LeadsExhausted:
+                        if not numbers:
+                            raise
+                        break
+                    normalized = self.normalize_number(number)
+                    if not self._excluded(normalized, now, member) and normalized not in batch and \
+                            not self.failures.is_blocked(normalized, now):
+                        batch.add(normalized)
+                        numbers.append(number)
+                        self._join(normalized, member)
+        for number in numbers:
+            self.CALL_QUEUE.put(number)
+        return numbers
+
+    def _reserve_numbers(self, now: float, count: int, campaign: Campaign = None) -> List[PhoneNumber]:
+        """
+        Reserve candidates with the exclusion store at least a batch at a time, spares are handed out by later calls.
+        The store keeps one dial time per number, so a campaign's window counts dials by every campaign; each campaign
+        keeps its own spares as they were checked against its window.
+        """
+        reserved = self._reserved if campaign is None else campaign.reserved
+        exclude_time = self.call_exclude_time if campaign is None else campaign.exclude_time
+        while len(reserved) < count:
+            candidates = []
+            normalized = []
+            wanted = max(self.reserve_batch, count - len(reserved))
+            while len(candidates) < wanted:
+                try:
+                    number = self._next_lead()
+                except LeadsExhausted:
+                    if not candidates:
+                        if not reserved:
+                            raise
+                        count = len(reserved)
+                    break
+                digits = self.normalize_number(number)
+                if not self.failures.is_blocked(digits, now):
+                    candidates.append(number)
+                    normalized.append(digits)
+            if candidates:
+                ok = self.exclusion.reserve(normalized, now, exclude_time)
+                reserved.extend(number for number, reserve in zip(candidates, ok) if reserve)
+        return [reserved.popleft() for _ in range(count)]
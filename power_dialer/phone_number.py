@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, Iterable, List
+
+from .memory_budget import DictCache, account
+
+NUMBER_DIGITS = frozenset('0123456789')
+# bytes.translate deletes these, leaving the same digits `normalize_number` keeps
+NON_DIGIT_BYTES = bytes(c for c in range(256) if not 0x30 <= c <= 0x39)
+# Numbers kept by `PhoneNumber.parse` before it starts over
+INTERN_SIZE = 100000
+
+
+class PhoneNumber:
+    """
+    A phone number parsed once: the text as dialed, its digits and the digits as an integer.
+
+    It compares and hashes as its text, so it can stand in for the string anywhere, and `normalize_number` and
+    `number_value` just read the parsed fields. Get one with `parse`, which hands out the same object for the same
+    text.
+    """
+    __slots__ = ('text', 'digits', 'value')
+    # Text to number, shared by every `parse`
+    _interned: Dict[str, 'PhoneNumber'] = {}
+
+    def __init__(self, text: str):
+        self.text = text
+        self.digits = normalize_number(text)
+        self.value = int(self.digits) if self.digits else 0
+
+    @classmethod
+    def parse(cls, number) -> 'PhoneNumber':
+        """
+        :param number: A phone number, as text or already parsed
+        :return: The parsed number
+        """
+        if number.__class__ is cls:
+            return number
+        interned = cls._interned
+        parsed = interned.get(number)
+        if parsed is None:
+            if len(interned) >= INTERN_SIZE:
+                # Numbers still in use keep working, they're just not shared with new ones
+                interned.clear()
+            parsed = interned[number] = cls(number)
+        return parsed
+
+    @classmethod
+    def from_value(cls, value: int) -> 'PhoneNumber':
+        """
+        A NANP number from its integer form, readable the way `format_number` writes it
+        """
+        return cls.parse(format_number('%010d' % value))
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other.__class__ is PhoneNumber:
+            return self.text == other.text
+        if isinstance(other, str):
+            return self.text == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.text)
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f'PhoneNumber({self.text!r})'
+
+    def __reduce__(self):
+        # Spilled and unpickled numbers are interned again
+        return _unpickle, (self.text,)
+
+
+def _unpickle(text: str) -> PhoneNumber:
+    return PhoneNumber.parse(text)
+
+
+# Forgetting a number only costs parsing it again
+account(DictCache('phone_numbers', PhoneNumber, '_interned'))
+
+
+def parse_numbers(numbers: Iterable[str]) -> List[PhoneNumber]:
+    """
+    Parse many numbers at once, e.g. a page of leads
+    """
+    parse = PhoneNumber.parse
+    interned = PhoneNumber._interned
+    parsed = []
+    append = parsed.append
+    for number in numbers:
+        found = interned.get(number)
+        append(found if found is not None else parse(number))
+    return parsed
+
+
+def normalize_number(number: str) -> str:
+    """
+    Strip out the punctuation from the numbers
+    :param number: A phone number
+    :return: A normalized number containing only digits
+    """
+    if number.__class__ is PhoneNumber:
+        return number.digits
+    # Only ASCII digits are kept, the same as `NUMBER_DIGITS`, and bytes.translate does it in one pass
+    return number.encode('ascii', 'ignore').translate(None, NON_DIGIT_BYTES).decode('ascii')
+
+
+def number_value(number: str) -> int:
+    """
+    :param number: A phone number
+    :return: Its digits as an integer, how it's stored; 0 if it has none
+    """
+    if number.__class__ is PhoneNumber:
+        return number.value
+    digits = normalize_number(number)
+    return int(digits) if digits else 0
+
+
+def format_number(digits: str) -> str:
+    """
+    Make a normalized NANP number human readable again
+
+    :param digits: Normalized number
+    :return: (NPA) NXX-XXXX for 10 digit numbers, anything else is returned as is
+    """
+    if len(digits) != 10:
+        return digits
+    return f'({digits[:3]}) {digits[3:6]}-{digits[6:]}'
@@ -1,25 +1,63 @@
 # -*- coding: utf-8 -*-
 from functools import wraps
 import logging
+import sys
+from weakref import WeakSet
 
 from power_dialer.agent_storage.agent_storage import AgentStorage
+from power_dialer.agent_timeline import Timeline
 from power_dialer.call_metrics.call_metrics import CallMetrics
 from .power_dialer_interface import PowerDialerInterface
-from .dialer_state_machine import DialerStateMachine, AGENT_TRANSITIONS, AgentState
+from .dialer_state_machine import DialerStateMachine, AGENT_TRANSITIONS, AgentState, compile_transitions
+from .memory_budget import AccountedCache, CacheUsage, account
 from .number_manager import NumberManager
+from .phone_number import PhoneNumber
 from .services import dial
 
 DIAL_RATIO = 2
 logger = logging.getLogger('power_dialer.power_dialer')
+AGENT_TABLE = compile_transitions(AGENT_TRANSITIONS)
 
 
 class PowerDialerStateMachine(DialerStateMachine):
     """
     Simple helper class
     """
+    __slots__ = ()
+
+    def __init__(self, startState: AgentState = None):
+        super().__init__(AGENT_TABLE, startState)
+
+
+class DialerNumbers(AccountedCache):
+    """
+    The numbers live dialers have kept for their callers. Shedding trims each dialer's to its last dial ratio, what
+    its latest event dialed.
+    """
+    name = 'dialer_numbers'
 
     def __init__(self):
-        super().__init__(AGENT_TRANSITIONS)
+        self.dialers = WeakSet()
+
+    def usage(self) -> CacheUsage:
+        lists = [dialer.numbers for dialer in list(self.dialers)]
+        entries = sum(len(numbers) for numbers in lists)
+        sample = next((numbers[0] for numbers in lists if numbers), '')
+        return CacheUsage(self.name, entries, sum(sys.getsizeof(numbers) for numbers in lists) +
+                          entries * sys.getsizeof(sample))
+
+    def shed(self, nbytes: int) -> int:
+        shed = 0
+        for dialer in list(self.dialers):
+            excess = len(dialer.numbers) - dialer._dial_ratio
+            if excess > 0:
+                del dialer.numbers[:excess]
+                shed += excess
+        return shed
+
+
+DIALER_NUMBERS = DialerNumbers()
+account(DIALER_NUMBERS)
 
 
 class PowerDialer(PowerDialerInterface):
@@ -30,15 +68,27 @@ class PowerDialer(PowerDialerInterface):
     calls will fail with a small chance of a call connecting with no agent available to take the call.
     """
 
-    def __init__(self, agent_id: str, dial_ratio: int = DIAL_RATIO):
+    def __init__(self, agent_id: str, dial_ratio: int = DIAL_RATIO, state: AgentState = None, campaign: str = None):
+        """
+        :param agent_id: The agent
+        :param dial_ratio: Calls placed for the agent at a time
+        :param state: The agent's state if the caller already has it, otherwise it is loaded
+        :param campaign: The campaign the agent is dialing for, see `NumberManager.add_campaign`
+        """
         super().__init__(agent_id)
         self._agent = None
         self._agent_state = PowerDialerStateMachine()
         self._dial_ratio = dial_ratio
+        self._campaign = campaign
         self._call_metrics = CallMetrics
         self._agent_client = AgentStorage
+        self._timeline = Timeline
         self.numbers = []
-        self._get_agent_status()
+        DIALER_NUMBERS.dialers.add(self)
+        if state is None:
+            self._get_agent_status()
+        else:
+            self._agent_state.set_state(state)
         self._number_client = NumberManager()
 
     def auto_state_save(method):
@@ -61,7 +111,7 @@ class PowerDialer(PowerDialerInterface):
 
     @auto_state_save
     def on_agent_login(self):
-        if not self._agent_state.transition(AgentState.idle):
+        if not self._transition(AgentState.idle):
             # Log this attempt, monitor (cloudwatch) for these types of issues
             logger.warning('Attempt to login when agent %s already logged in.', self.agent_id)
 
@@ -70,13 +120,13 @@ class PowerDialer(PowerDialerInterface):
 
     @auto_state_save
     def on_agent_logout(self):
-        if not self._agent_state.transition(AgentState.offline):
+        if not self._transition(AgentState.offline):
             # This should never happen
             logger.warning('Agent attempted to logout while call active.')
             # We're in a bad spot now, but since we're offlining the agent,
             # we reset the status so the agent status is saved when we leave.
-            self._agent_state = PowerDialerStateMachine()
-            self._agent_state.set_state(AgentState.offline)
+            self._agent_state = PowerDialerStateMachine(AgentState.offline)
+            self._timeline.record(self.agent_id, AgentState.offline)
 
     @auto_state_save
     def on_call_started(self, lead_phone_number: str):
@@ -86,13 +136,15 @@ class PowerDialer(PowerDialerInterface):
             logger.warning('Agent %s started call to %s when not idle.', self.agent_id, lead_phone_number)
             # You can always transition to idle
             self._agent_state.set_state(AgentState.idle)
+        self._number_client.record_success(lead_phone_number)
         self._record_call_start(lead_phone_number)
-        self._agent_state.transition(AgentState.busy)
+        self._transition(AgentState.busy)
 
     @auto_state_save
     def on_call_failed(self, lead_phone_number: str):
-        # Monitor for repeated failures to a number
         logger.info('Call failed for %s to %s', self.agent_id, lead_phone_number)
+        # Back the number off so we don't keep redialing a dead lead
+        self._number_client.record_failure(lead_phone_number)
         if self._agent_state.state is AgentState.idle:
             # If the agent is not on a call, initiate another call
             self._initiate_call()
@@ -104,7 +156,7 @@ class PowerDialer(PowerDialerInterface):
             logger.warning('Call ended for agent, but agent was not on a call.')
             # The agent state is now invalid, but can only be 'idle' or 'offline', we can transition to 'idle'
 
-        self._agent_state.transition(AgentState.idle)
+        self._transition(AgentState.idle)
         self._record_call_end(lead_phone_number)
         # There is a small window here if a call is initiated and completed successfully before DIAL_RATIO - 1 calls
         # have failed, but we are optimising utilisation. It's unlikely that other calls are inflight, but if so
@@ -112,17 +164,33 @@ class PowerDialer(PowerDialerInterface):
         for _ in range(self._dial_ratio):
             self._initiate_call()
 
-    def _record_call_start(self, phone_number: str):
+    def dials_for(self, callback: str) -> int:
+        if callback in ('on_agent_login', 'on_call_ended'):
+            return self._dial_ratio
+        if callback == 'on_call_failed' and self._agent_state.state is AgentState.idle:
+            return 1
+        return 0
+
+    def _transition(self, state: AgentState) -> bool:
+        """
+        Transition the agent, noting it on the timeline if it happened
+        """
+        if self._agent_state.transition(state):
+            self._timeline.record(self.agent_id, state)
+            return True
+        return False
+
+    def _record_call_start(self, phone_number: PhoneNumber):
         self._call_metrics.call_started(self.agent_id, phone_number)
 
-    def _record_call_end(self, phone_number: str):
+    def _record_call_end(self, phone_number: PhoneNumber):
         self._call_metrics.call_ended(self.agent_id, phone_number)
 
     def _initiate_call(self):
         """
         Get a lead an initiate a call
         """
-        number = self._number_client.get_number()
+        number = self._number_client.get_number(self._campaign)
         # Store the numbers so the wrapper can find out what numbers were generated.
         self.numbers.append(number)
         dial(self.agent_id, number)
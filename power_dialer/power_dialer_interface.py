@@ -1,11 +1,71 @@
 # -*- coding: utf-8 -*-
 from abc import ABC, abstractmethod
+from functools import wraps
+
+from .event_dedupe import EventDedupe
+from .event_log import EVENT_TYPES, EventRecorder, EventType
+from .phone_number import PhoneNumber
+
+
+def _handled(name: str, method, event_type: EventType):
+    """
+    Drop the callback if its event id has been seen, otherwise record it to `PowerDialerInterface.recorder`, if
+    there is one, and run it. The lead's number is parsed here, once, and handed on as a `PhoneNumber`.
+    """
+    @wraps(method)
+    def wrapper(self, *args, event_id: str = None, **kwargs):
+        if 'lead_phone_number' in kwargs:
+            # By keyword it's recorded and handed on the same as positionally
+            args += (kwargs.pop('lead_phone_number'),)
+        number = None
+        if args:
+            try:
+                number = PhoneNumber.parse(args[0])
+                args = (number,)
+            except (AttributeError, TypeError):
+                # Not a number at all. The handler gets it as it came and fails inside its own error handling, so
+                # it's logged and the agent state still saved
+                pass
+        # Only the most derived override checks and records, calling up to a base class doesn't do either twice
+        if getattr(type(self), name) is wrapper:
+            if event_id is not None and self.dedupe.seen(event_id):
+                self.dedupe.suppressed(self.dials_for(name))
+                return None
+            recorder = PowerDialerInterface.recorder
+            if recorder is not None:
+                recorder.record(event_type, self.agent_id, number)
+        return method(self, *args, **kwargs)
+    return wrapper
 
 
 class PowerDialerInterface(ABC):
+    """
+    Every callback also takes an optional keyword `event_id`, the transport's id for the event. An event whose id
+    was seen recently is a redelivery and is dropped before the handler runs. Implementations don't see the id.
+    """
+    # Set to an `EventRecorder` to capture every callback for replay
+    recorder: EventRecorder = None
+    # Event ids recently handled, shared by every dialer in the process
+    dedupe: EventDedupe = EventDedupe()
+
     def __init__(self, agent_id: str):
         self.agent_id = agent_id
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, event_type in EVENT_TYPES.items():
+            method = cls.__dict__.get(name)
+            if method is not None and not getattr(method, '__isabstractmethod__', False):
+                setattr(cls, name, _handled(name, method, event_type))
+
+    def dials_for(self, callback: str) -> int:
+        """
+        Calls a callback would place, counted as saved when a duplicate is dropped
+
+        :param callback: Callback name, e.g. 'on_agent_login'
+        """
+        return 0
+
     @abstractmethod
     def on_agent_login(self):
         raise NotImplementedError
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List
+
+from .event_log import CALLBACKS, Event
+from .latency import percentiles, format_percentiles
+from .power_dialer_interface import PowerDialerInterface
+
+logger = logging.getLogger('power_dialer.replay')
+
+
+@dataclass
+class ReplayStats:
+    events: int = 0
+    elapsed: float = 0.0
+    # Worst time an event started after it was due, paced replays only
+    max_lag: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+    by_event: Dict[str, List[float]] = field(default_factory=dict, repr=False)
+
+    @property
+    def rate(self) -> float:
+        return self.events / self.elapsed if self.elapsed else 0.0
+
+    def percentiles(self) -> Dict[float, float]:
+        return percentiles(self.latencies)
+
+    def report(self) -> str:
+        lines = [f'{self.events} events in {self.elapsed:.2f}s, {self.rate:,.0f} events/s, '
+                 f'max lag {self.max_lag * 1e3:.1f}ms',
+                 f'{"all":16s} {format_percentiles(self.percentiles())}']
+        for name, samples in sorted(self.by_event.items()):
+            lines.append(f'{name:16s} {format_percentiles(percentiles(samples))}')
+        return '\n'.join(lines)
+
+    def summary(self) -> dict:
+        """
+        :return: Plain numbers, for comparing runs
+        """
+        return {
+            'events': self.events,
+            'elapsed': self.elapsed,
+            'rate': self.rate,
+            'max_lag': self.max_lag,
+            'percentiles': {str(point): value for point, value in self.percentiles().items()},
+        }
+
+
+def replay(events: Iterable[Event], dialer_factory: Callable[[str], PowerDialerInterface],
+           paced: bool = False, speed: float = 1.0) -> ReplayStats:
+    """
+    Feed recorded events back through a dialer, building a new dialer for every event the way the event handlers do
+
+    :param events: Recorded events, see `read_events`
+    :param dialer_factory: Builds the dialer for an agent id, e.g. `PowerDialer`
+    :param paced: Keep the recorded gaps between events, otherwise run as fast as possible
+    :param speed: With pacing, how much faster than recorded to run
+    :return: Throughput and latency per event
+    """
+    stats = ReplayStats()
+    recorder, PowerDialerInterface.recorder = PowerDialerInterface.recorder, None
+    perf_counter = time.perf_counter
+    first = None
+    started = perf_counter()
+    try:
+        for event in events:
+            if paced:
+                if first is None:
+                    first = event.timestamp
+                due = started + (event.timestamp - first) / speed
+                wait = due - perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+                else:
+                    stats.max_lag = max(stats.max_lag, -wait)
+            name = CALLBACKS[event.event_type]
+            begin = perf_counter()
+            getattr(dialer_factory(event.agent_id), name)(*event.args)
+            latency = perf_counter() - begin
+            stats.latencies.append(latency)
+            stats.by_event.setdefault(name, []).append(latency)
+            stats.events += 1
+    finally:
+        stats.elapsed = perf_counter() - started
+        PowerDialerInterface.recorder = recorder
+    logger.info('Replayed %d events at %.0f events/s', stats.events, stats.rate)
+    return stats
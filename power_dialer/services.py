@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import logging
 import random
+
+from .phone_number import PhoneNumber
+
 logger = logging.getLogger('power_dialer.services')
 
 
-def dial(agent_id: str, lead_phone_number: str):
+def dial(agent_id: str, lead_phone_number: PhoneNumber):
     logger.info('Dialing %s for %s', agent_id, lead_phone_number)
 
 
@@ -30,15 +33,15 @@ def _generate_line_number() -> str:
     return f'{number:04}'
 
 
-def get_lead_phone_number_to_dial() -> str:
+def get_lead_phone_number_to_dial() -> PhoneNumber:
     """
     Return a phone number (mostly) conforming to a 10 digit North American Numbering Plan (NANP)
     The NANP number format may be summarized in the notation NPA-NXX-xxxx:
 
-    :return: A string representing a phone number
+    :return: The phone number, parsed
     """
     npa = _generateNPA()
     coc = _generate_central_office_code()
     line = _generate_line_number()
     # Make it human readable for testability
-    return f'({npa}) {coc}-{line}'
+    return PhoneNumber.parse(f'({npa}) {coc}-{line}')
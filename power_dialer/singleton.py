@@ -1,3 +1,6 @@
+from abc import ABCMeta
+
+
 class Singleton(type):
     """
     Just to make it simpler to deal with testing, wouldn't need this in lambda as there can be only one
@@ -9,4 +12,10 @@ class Singleton(type):
     def __call__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super().__call__(*args, **kwargs)
-        return cls._instance
\ No newline at end of file
+        return cls._instance
+
+
+class AbstractSingleton(Singleton, ABCMeta):
+    """
+    A `Singleton` implementing an `ABC`
+    """
@@ -3,7 +3,8 @@ from setuptools import setup
 setup(
     name='PowerDialer',
     version='0.0.0',
-    packages=['test', 'power_dialer', 'power_dialer.call_metrics', 'power_dialer.agent_storage'],
+    packages=['test', 'power_dialer', 'power_dialer.call_metrics', 'power_dialer.agent_storage',
+              'power_dialer.exclusion', 'power_dialer.leads'],
     url='',
     license='',
     author='akm',
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+An in-process stand in for redis-server, just the hash commands the agent storage uses.
+"""
+import socketserver
+from threading import Lock, Thread
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            self.wfile.write(self.server.dispatch(command))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b'*', line
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.hashes = {}
+        self.lock = Lock()
+        self.commands = 0
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def dispatch(self, command) -> bytes:
+        name = command[0].upper().decode()
+        with self.lock:
+            self.commands += 1
+            try:
+                return getattr(self, '_' + name.lower())(*command[1:])
+            except (AttributeError, TypeError):
+                return b'-ERR unknown command ' + name.encode() + b'\r\n'
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        if value is None:
+            return b'$-1\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def _ping(self):
+        return b'+PONG\r\n'
+
+    def _select(self, db):
+        return b'+OK\r\n'
+
+    def _hget(self, key, field):
+        return self._bulk(self.hashes.get(key, {}).get(field))
+
+    def _hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return b'*%d\r\n' % len(fields) + b''.join(self._bulk(values.get(field)) for field in fields)
+
+    def _hset(self, key, *pairs):
+        values = self.hashes.setdefault(key, {})
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        return b':%d\r\n' % added
+
+    def _del(self, *keys):
+        return b':%d\r\n' % sum(self.hashes.pop(key, None) is not None for key in keys)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from unittest import TestCase
 
-from power_dialer.dialer_state_machine import AgentState, DialerStateMachine, AGENT_TRANSITIONS
+from power_dialer.dialer_state_machine import (AgentState, DialerStateMachine, AGENT_TRANSITIONS, compile_transitions,
+                                                encode_states)
 
 
 class TestStateMachine(TestCase):
@@ -60,3 +61,27 @@ class TestStateMachine(TestCase):
         state_machine = DialerStateMachine(AGENT_TRANSITIONS, AgentState.offline)
         result = state_machine.transition(AgentState.busy)
         assert result is False, (False, result)
+
+    def test_shared_table(self):
+        """
+        Test machines with the same transitions share one compiled table and carry no per instance dict
+        """
+        first = DialerStateMachine(AGENT_TRANSITIONS)
+        second = DialerStateMachine(list(AGENT_TRANSITIONS))
+        assert first._table is second._table
+        assert first._table is compile_transitions(AGENT_TRANSITIONS)
+        assert not hasattr(first, '__dict__')
+
+    def test_validate_sequence(self):
+        """
+        Test the bulk validator finds the first state that can't follow the one before it
+        """
+        table = compile_transitions(AGENT_TRANSITIONS)
+        offline, idle, busy = AgentState.offline, AgentState.idle, AgentState.busy
+        good = encode_states([offline] + [idle, busy, idle, offline, idle] * 1000)
+        assert table.validate(good) == -1
+        assert table.validate(good + encode_states([offline, busy])) == len(good) + 1
+        bad = encode_states([offline, idle, busy, offline, idle])
+        assert table.validate(bad) == 3, (3, table.validate(bad))
+        assert table.validate(b'\x02\x00\x02') == 1
+        assert table.validate(b'') == -1
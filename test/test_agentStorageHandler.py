@@ -2,7 +2,9 @@ from unittest import TestCase
 
 from power_dialer.agent_storage.agent_storage_handler import AgentStorageHandler
 from power_dialer.agent_storage.agent_storage import AgentStorage
+from power_dialer.agent_storage.agent_storage_backend import AgentStorageBackend
 from power_dialer.dialer_state_machine import AgentState
+from power_dialer.exclusion.exclusion_store import ExclusionStore
 
 
 class TestAgentStorageHandler(TestCase):
@@ -53,3 +55,22 @@ class TestAgentStorageHandler(TestCase):
         result = handler['test_id2']
         assert result is AgentState.offline, (AgentState.offline, result)
 
+
+    def test_incomplete_backend(self):
+        """
+        Test a backend or exclusion store missing part of its interface can't be built, and the handler is still
+        a singleton
+        """
+        class Partial(AgentStorageBackend):
+            def __getitem__(self, agent_id):
+                return AgentState.offline
+
+        class PartialStore(ExclusionStore):
+            def reserve(self, numbers, now, exclude_time):
+                return [True] * len(numbers)
+
+        with self.assertRaises(TypeError):
+            Partial()
+        with self.assertRaises(TypeError):
+            PartialStore()
+        assert AgentStorageHandler() is AgentStorageHandler()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.agent_timeline import AgentTimeline
+from power_dialer.dialer_state_machine import AgentState
+from power_dialer.power_dialer import PowerDialer
+
+offline, idle, busy = AgentState.offline, AgentState.idle, AgentState.busy
+
+
+class TestAgentTimeline(TestCase):
+
+    def setUp(self):
+        self.timeline = AgentTimeline(size=8)
+        for timestamp, state in ((0, idle), (10, busy), (70, idle), (75, idle), (100, busy), (130, idle),
+                                 (150, offline)):
+            self.timeline.record('agent_0001', state, timestamp)
+
+    def test_utilization(self):
+        """
+        Test time per state, to now or within a range
+        """
+        used = self.timeline.utilization('agent_0001', end=200)
+        assert (used.idle, used.busy, used.offline) == (60, 90, 50), used
+        assert used.utilization == 0.6, used.utilization
+        used = self.timeline.utilization('agent_0001', start=40, end=110)
+        assert (used.idle, used.busy, used.offline) == (30, 40, 0), used
+
+    def test_gaps(self):
+        """
+        Test idle stretches merge repeated idles, and only the ones ending in a call count as time to next call
+        """
+        assert self.timeline.idle_gaps('agent_0001') == [10, 30, 20]
+        assert self.timeline.time_to_next_call('agent_0001') == [10, 30]
+
+    def test_ring_wraps(self):
+        """
+        Test only the most recent transitions are kept, oldest first
+        """
+        self.timeline.record('agent_0001', idle, 160)
+        self.timeline.record('agent_0001', busy, 170)
+        events = self.timeline.events('agent_0001')
+        assert len(events) == 8 and events[0] == (10, busy) and events[-1] == (170, busy), events
+
+    @patch('power_dialer.power_dialer.AgentStorage')
+    @patch('power_dialer.power_dialer.CallMetrics')
+    @patch('power_dialer.power_dialer.NumberManager')
+    @patch('power_dialer.power_dialer.Timeline')
+    def test_power_dialer_records(self, timeline, number_manager, call_metrics, agent_storage):
+        """
+        Test the dialer records the transitions it makes, and not the ones it refuses
+        """
+        agent_storage.__getitem__.return_value = AgentState.idle
+        PowerDialer('test_id').on_call_started('(212) 555-0100')
+        timeline.record.assert_called_once_with('test_id', busy)
+        agent_storage.__getitem__.return_value = AgentState.offline
+        PowerDialer('test_id').on_call_started('(212) 555-0100')
+        assert timeline.record.call_count == 1
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import datetime
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer import clock
+from power_dialer.batch_dialer import BatchDialer, BatchEvent
+from power_dialer.clock import ManualClock
+from power_dialer.dialer_state_machine import AgentState
+from power_dialer.event_dedupe import EventDedupe
+from power_dialer.event_log import EventType
+from power_dialer.exclusion.memory_exclusion import MemoryExclusionStore
+from power_dialer.leads.lead_source import LeadsExhausted
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer_interface import PowerDialerInterface
+
+
+class TestBatchDialer(TestCase):
+
+    @patch('power_dialer.power_dialer.NumberManager')
+    @patch('power_dialer.batch_dialer.NumberManager')
+    @patch('power_dialer.batch_dialer.CallMetrics')
+    @patch('power_dialer.batch_dialer.AgentStorage')
+    def test_process(self, agent_storage, call_metrics, number_manager, agent_number_manager):
+        """
+        Test a mixed batch is handled per agent in order, with one state read, state write, reservation and metrics
+        enqueue for the lot
+        """
+        dedupe, PowerDialerInterface.dedupe = PowerDialerInterface.dedupe, EventDedupe()
+        try:
+            previous = clock.use_clock(ManualClock(1591012800))
+            agent_storage.get_many.return_value = [AgentState.offline, AgentState.idle]
+            number_manager.return_value.get_numbers.side_effect = lambda count, _: [f'n{i}' for i in range(count)]
+            events = [BatchEvent('agent_a', EventType.agent_login),
+                      BatchEvent('agent_b', EventType.call_started, '(212) 555-0310'),
+                      BatchEvent('agent_a', EventType.call_failed, '(212) 555-0311'),
+                      BatchEvent('agent_b', EventType.call_ended, '(212) 555-0310', 'event-1'),
+                      BatchEvent('agent_b', EventType.call_ended, '(212) 555-0310', 'event-1')]
+            dialed = BatchDialer().process(events)
+            assert dialed == {'agent_a': ['n0', 'n1', 'n2'], 'agent_b': ['n3', 'n4']}, dialed
+            agent_storage.get_many.assert_called_once_with(['agent_a', 'agent_b'])
+            agent_storage.set_many.assert_called_once_with({'agent_a': AgentState.idle, 'agent_b': AgentState.idle})
+            number_manager.return_value.get_numbers.assert_called_once_with(5, None)
+            now = datetime.datetime(2020, 6, 1, 12, 0)
+            call_metrics.calls_batch.assert_called_once_with([(True, 'agent_b', '(212) 555-0310', now),
+                                                              (False, 'agent_b', '(212) 555-0310', now)])
+            agent_number_manager.return_value.record_failure.assert_called_once_with('(212) 555-0311')
+            assert PowerDialerInterface.dedupe.duplicates == 1
+        finally:
+            PowerDialerInterface.dedupe = dedupe
+            clock.use_clock(previous)
+
+    @patch('power_dialer.power_dialer.NumberManager')
+    @patch('power_dialer.batch_dialer.NumberManager')
+    @patch('power_dialer.batch_dialer.CallMetrics')
+    @patch('power_dialer.batch_dialer.AgentStorage')
+    def test_event_timestamps(self, agent_storage, call_metrics, number_manager, agent_number_manager):
+        """
+        Test calls started and ended in one batch are timed by their events, so they keep their length and order
+        """
+        agent_storage.get_many.return_value = [AgentState.idle]
+        number_manager.return_value.get_numbers.side_effect = lambda count, _: [f'n{i}' for i in range(count)]
+        BatchDialer().process([BatchEvent('agent_c', EventType.call_started, '(212) 555-0312', timestamp=1591012800),
+                               BatchEvent('agent_c', EventType.call_ended, '(212) 555-0312', timestamp=1591012890)])
+        calls = call_metrics.calls_batch.call_args[0][0]
+        assert [when for _, _, _, when in calls] == [datetime.datetime(2020, 6, 1, 12, 0),
+                                                     datetime.datetime(2020, 6, 1, 12, 1, 30)], calls
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    @patch('power_dialer.batch_dialer.CallMetrics')
+    @patch('power_dialer.batch_dialer.AgentStorage')
+    def test_campaign(self, agent_storage, call_metrics, mock_number_maker):
+        """
+        Test a campaign's batch gets numbers checked against the campaign's window, and they count as its dials
+        """
+        instance, NumberManager._instance = NumberManager._instance, None
+        try:
+            client = NumberManager(5, synchronous=True)
+            client.add_campaign('renewals', 3600)
+            client.warm_cache({'(212) 555-0340': clock.now() - 60}, campaign='renewals')
+            agent_storage.get_many.return_value = [AgentState.offline]
+            mock_number_maker.side_effect = ['(212) 555-0340', '(212) 555-0341', '(212) 555-0342']
+            dialed = BatchDialer(campaign='renewals').process([BatchEvent('agent_d', EventType.agent_login)])
+            assert dialed == {'agent_d': ['(212) 555-0341', '(212) 555-0342']}, dialed
+            mask = client.campaigns['renewals'].bit
+            assert all(client.campaign_members[number] == mask for number in ('2125550341', '2125550342'))
+            while not client.CALL_QUEUE.empty():
+                client.CALL_QUEUE.get_nowait()
+        finally:
+            NumberManager._instance = instance
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_get_numbers(self, mock_number_maker):
+        """
+        Test a batch of numbers skips ones already excluded and is queued in order
+        """
+        mock_number_maker.side_effect = ['(212) 555-0320', '(212) 555-0321', '(212) 555-0322',
+                                         '(212) 555-0323', '(212) 555-0324']
+        client = NumberManager(5, synchronous=True)
+        exclusion = MemoryExclusionStore()
+        exclusion.warm({'2125550320': 1e12})
+        client.exclusion, client.reserve_batch = exclusion, 2
+        try:
+            numbers = client.get_numbers(3)
+            assert numbers == ['(212) 555-0321', '(212) 555-0322', '(212) 555-0323'], numbers
+            assert list(client._reserved) == ['(212) 555-0324'], client._reserved
+            queued = []
+            while not client.CALL_QUEUE.empty():
+                queued.append(client.CALL_QUEUE.get_nowait())
+            assert queued[-3:] == numbers, queued
+        finally:
+            client.exclusion, client.reserve_batch = None, 8
+            client._reserved.clear()
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_get_numbers_exhausted(self, mock_number_maker):
+        """
+        Test a batch without an exclusion store skips repeats within the batch and comes back short when leads run out
+        """
+        mock_number_maker.side_effect = ['(212) 555-0330', '(212) 555-0330', '(212) 555-0331', LeadsExhausted()]
+        client = NumberManager(5, synchronous=True)
+        numbers = client.get_numbers(3)
+        assert numbers == ['(212) 555-0330', '(212) 555-0331'], numbers
+        while not client.CALL_QUEUE.empty():
+            client.CALL_QUEUE.get_nowait()
+        mock_number_maker.side_effect = LeadsExhausted()
+        with self.assertRaises(LeadsExhausted):
+            client.get_numbers(1)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from power_dialer.exclusion.bloom_exclusion import BloomExclusionStore, HOUR
+from power_dialer.exclusion.memory_exclusion import MemoryExclusionStore
+
+NUMBERS = [f'212555{i:04d}' for i in range(1000)]
+
+
+class TestBloomExclusion(TestCase):
+
+    def test_reserve(self):
+        """
+        Test a number is excluded inside the window, a repeat in a batch too, and can be dialed after
+        """
+        store = BloomExclusionStore(window=4 * HOUR, bucket_seconds=HOUR, capacity=2000)
+        assert store.reserve(NUMBERS[:500], 0, 2 * HOUR) == [True] * 500
+        assert store.reserve(NUMBERS[:1] * 2, HOUR, 2 * HOUR) == [False, False]
+        assert store.reserve(NUMBERS[500:502] + NUMBERS[500:501], HOUR, 2 * HOUR) == [True, True, False]
+        # The first bucket has left the window, the second hasn't
+        assert store.reserve(NUMBERS[:1] + NUMBERS[500:501], 3 * HOUR, 2 * HOUR) == [True, False]
+
+    def test_rotation(self):
+        """
+        Test the ring never holds more buckets than the window needs and expiry drops whole buckets
+        """
+        store = BloomExclusionStore(window=2 * HOUR, bucket_seconds=HOUR, capacity=100)
+        for hour in range(10):
+            store.reserve(NUMBERS[hour:hour + 1], hour * HOUR, 2 * HOUR)
+        assert len(store._filters) == 3, store._filters
+        assert store.nbytes == 3 * store._filters[9].nbytes
+        store.expire(9 * HOUR)
+        assert list(store._filters) == [9], store._filters
+        store.record(NUMBERS[0], 0)
+        assert list(store._filters) == [9], store._filters
+
+    def test_error_rate(self):
+        """
+        Test numbers never dialed are rarely taken as dialed
+        """
+        store = BloomExclusionStore(window=HOUR, bucket_seconds=HOUR, capacity=10000, error_rate=0.01)
+        store.reserve([str(2120000000 + i) for i in range(5000)], 0, HOUR)
+        reserved = store.reserve([str(3120000000 + i) for i in range(5000)], 1, HOUR)
+        assert reserved.count(False) < 100, reserved.count(False)
+
+    def test_confirm(self):
+        """
+        Test positives are checked with the exact store, which lets false positives through
+        """
+        confirm = MemoryExclusionStore()
+        store = BloomExclusionStore(window=HOUR, bucket_seconds=HOUR, capacity=10, error_rate=0.5,
+                                    confirm=confirm)
+        assert store.reserve(NUMBERS[:10], 0, HOUR) == [True] * 10
+        assert len(confirm) == 10
+        # Tiny filters, most new numbers look dialed but the exact store knows better
+        assert store.reserve(NUMBERS[10:200], 1, HOUR) == [True] * 190
+        assert store.reserve(NUMBERS[:10], 2, HOUR) == [False] * 10
+        assert store.positives > 10 and store.confirmed == store.positives - 10, (store.positives, store.confirmed)
+
+    def test_confirmed_positive_rotation(self):
+        """
+        Test a dial the exact store let through is kept when the bucket that made it a positive rotates out
+        """
+        store = BloomExclusionStore(window=100, bucket_seconds=10, capacity=100, confirm=MemoryExclusionStore())
+        assert store.reserve(NUMBERS[:1], 0, 40) == [True]
+        assert store.reserve(NUMBERS[:1], 45, 40) == [True]
+        store.expire(10)
+        assert store.reserve(NUMBERS[:1], 120, 80) == [False]
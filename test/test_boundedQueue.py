@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from queue import Full
+from unittest import TestCase
+
+from power_dialer.bounded_queue import BoundedQueue, OverflowPolicy
+
+
+class TestBoundedQueue(TestCase):
+
+    def test_block(self):
+        """
+        Test a full blocking queue gives up after the timeout
+        """
+        queue = BoundedQueue(2, OverflowPolicy.block, timeout=0.01)
+        queue.put(1)
+        queue.put(2)
+        with self.assertRaises(Full):
+            queue.put(3)
+        assert queue.qsize() == 2, (2, queue.qsize())
+
+    def test_drop(self):
+        """
+        Test a full dropping queue counts what it throws away
+        """
+        queue = BoundedQueue(2, OverflowPolicy.drop)
+        for i in range(5):
+            queue.put(i)
+        assert queue.dropped == 3, (3, queue.dropped)
+        assert [queue.get(), queue.get()] == [0, 1]
+
+    def test_spill_keeps_order(self):
+        """
+        Test items spilled to disk come back in order, including items added while draining
+        """
+        queue = BoundedQueue(3, OverflowPolicy.spill)
+        for i in range(10):
+            queue.put(i)
+        assert queue.qsize() == 10, (10, queue.qsize())
+        assert queue.stats().spilled_depth == 7, (7, queue.stats().spilled_depth)
+        result = [queue.get() for _ in range(5)]
+        queue.put(10)
+        result.extend(queue.get() for _ in range(6))
+        assert result == list(range(11)), result
+        assert queue.stats().spilled_depth == 0
+        queue.close()
+
+    def test_high_water(self):
+        """
+        Test the high water mark survives the queue draining
+        """
+        queue = BoundedQueue(10, OverflowPolicy.drop)
+        for i in range(4):
+            queue.put(i)
+        while not queue.empty():
+            queue.get()
+        stats = queue.stats()
+        assert stats.high_water == 4, (4, stats.high_water)
+        assert stats.depth == 0, (0, stats.depth)
+
+    def test_sentinel_not_dropped(self):
+        """
+        Test the shutdown sentinel gets through a full queue
+        """
+        queue = BoundedQueue(1, OverflowPolicy.drop)
+        queue.put(1)
+        queue.put(None)
+        assert queue.get() == 1
+        assert queue.get() is None
+        assert queue.dropped == 0, (0, queue.dropped)
+
+    def test_page_out_keeps_order(self):
+        """
+        Test paged out items come back in order behind what stayed in memory, and a blocking queue won't page out
+        """
+        queue = BoundedQueue(0, OverflowPolicy.spill)
+        for i in range(6):
+            queue.put(i)
+        assert queue.page_out(4) == 4
+        assert queue.stats().spilled_depth == 4, queue.stats()
+        assert queue.page_out(1) == 0
+        queue.put(6)
+        assert [queue.get() for _ in range(7)] == list(range(7))
+        queue.close()
+        blocking = BoundedQueue(5, OverflowPolicy.block)
+        blocking.put(1)
+        assert blocking.page_out(1) == 0
+
+    def test_page_out_everything(self):
+        """
+        Test paging out more than is queued keeps the head in memory, so the queue still drains, new items included
+        """
+        queue = BoundedQueue(0, OverflowPolicy.spill)
+        for i in range(3):
+            queue.put(i)
+        assert queue.page_out(10) == 2
+        queue.put(3)
+        assert [queue.get(timeout=0.5) for _ in range(4)] == list(range(4))
+        assert queue.qsize() == 0 and queue.stats().spilled_depth == 0
+        queue.put(4)
+        assert queue.page_out(10) == 0
+        queue.close()
+
+    def test_configure_keeps_order(self):
+        """
+        Test items put after switching away from spilling don't overtake the items on disk
+        """
+        for policy in (OverflowPolicy.block, OverflowPolicy.drop):
+            queue = BoundedQueue(3, OverflowPolicy.spill, timeout=0.01)
+            for i in range(6):
+                queue.put(i)
+            queue.configure(policy=policy)
+            queue.get()
+            queue.put(6)
+            result = [queue.get() for _ in range(6)]
+            assert result == list(range(1, 7)), (policy, result)
+            queue.put(7)
+            assert queue.stats().spilled_depth == 0 and queue.get() == 7, policy
+            queue.close()
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import datetime
 import os
 import tempfile
 from unittest import TestCase
@@ -33,3 +34,21 @@ class TestCallMetricsHandler(TestCase):
         record = handler._storage_queue.get()
         assert record.agent_id == 'test_id'
         assert record.number == '(212) 555-0100'
+
+    @patch('power_dialer.call_metrics.call_metrics_handler.CallMetricsRelationalStorage')
+    def test_calls_batch(self, storage):
+        """
+        Test a batch's finished calls go to storage in one enqueue, in order, each timed when it happened
+        """
+        handler = CallMetricsHandler(DB_NAME, synchronous=True)
+        at = [datetime.datetime(2020, 6, 1, 12, 0, second) for second in range(5)]
+        handler.calls_batch([(True, 'agent_a', '(212) 555-0100', at[0]), (True, 'agent_b', '(212) 555-0101', at[1]),
+                             (False, 'agent_a', '(212) 555-0100', at[2]), (False, 'agent_b', '(212) 555-0101', at[4]),
+                             (True, 'agent_a', '(212) 555-0102', at[4])])
+        assert handler._storage_queue.qsize() == 1
+        records = handler._storage_queue.get()
+        assert [r.number for r in records] == ['(212) 555-0100', '(212) 555-0101'], records
+        assert [(r.started, r.ended) for r in records] == [(at[0], at[2]), (at[1], at[4])], records
+        assert handler._volatile['agent_a'].number == '(212) 555-0102'
+        assert handler._volatile['agent_a'].started == at[4]
+        handler.shutdown()
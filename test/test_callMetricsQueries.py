@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from power_dialer.call_metrics.call_metrics_queries import CallMetricsQueries, AGENT_CALLS_BETWEEN_QUERY, \
+    AGENT_STATS_QUERY, AGENT_WHERE, CALLS_BETWEEN_QUERY, LAST_CALL_QUERY
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage
+from power_dialer.call_metrics.call_record import CallRecord
+
+NOW = datetime.datetime(2020, 6, 1, 12, 0, 0)
+
+
+def call(agent_id, number, minute, length):
+    started = NOW + datetime.timedelta(minutes=minute)
+    return CallRecord(agent_id, number, started, started + datetime.timedelta(seconds=length))
+
+
+class TestCallMetricsQueries(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'metrics.db')
+        instance, CallMetricsRelationalStorage._instance = CallMetricsRelationalStorage._instance, None
+        try:
+            CallMetricsRelationalStorage(MagicMock(), self.database)
+        finally:
+            CallMetricsRelationalStorage._instance = instance
+        self.writer = sqlite3.connect(self.database)
+        self.calls = [call('agent_0001', '(212) 555-0100', 0, 30), call('agent_0002', '(212) 555-0101', 1, 60),
+                      call('agent_0001', '(212) 555-0101', 2, 90), call('agent_0001', '(212) 555-0102', 3, 10)]
+        self._write(self.calls)
+        self.queries = CallMetricsQueries(self.database, pool_size=2)
+
+    def tearDown(self):
+        self.queries.close()
+        self.writer.close()
+        self.directory.cleanup()
+
+    def _write(self, calls):
+        with self.writer:
+            CallMetricsRelationalStorage.insert_records(self.writer, calls)
+
+    def test_agent_stats(self):
+        """
+        Test calls and call time per agent, for everyone and for one agent
+        """
+        stats = self.queries.agent_stats()
+        assert [(s.agent_id, s.number_of_calls, s.total_call_time) for s in stats] == [
+            ('agent_0001', 3, 130.0), ('agent_0002', 1, 60.0)], stats
+        one, = self.queries.agent_stats('agent_0002')
+        assert one.average_call_time == 60.0, one
+
+    def test_calls_between(self):
+        """
+        Test a time range comes back in start order as call records, optionally for one agent
+        """
+        start, end = NOW + datetime.timedelta(minutes=1), NOW + datetime.timedelta(minutes=3)
+        assert self.queries.calls_between(start, end) == self.calls[1:3]
+        assert self.queries.calls_between(start, end, 'agent_0001') == self.calls[2:3]
+
+    def test_last_call_to(self):
+        """
+        Test the most recent call to a number is found, and nothing for a number never called
+        """
+        assert self.queries.last_call_to('(212) 555-0101') == self.calls[2]
+        assert self.queries.last_call_to('212.555.0101') == self.calls[2]
+        assert self.queries.last_call_to('(212) 555-0199') is None
+
+    def test_reads_beside_writer(self):
+        """
+        Test readers see a snapshot while a write is in progress and new rows once it commits, and are read only
+        """
+        self.writer.execute('BEGIN IMMEDIATE')
+        CallMetricsRelationalStorage.insert_records(self.writer, [call('agent_0003', '1', 5, 5)])
+        assert len(self.queries.agent_stats()) == 2
+        self.writer.commit()
+        assert len(self.queries.agent_stats()) == 3
+        with self.queries._connection() as connection:
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.execute('DELETE FROM CALLS')
+
+    def test_covering_indexes(self):
+        """
+        Test every query is answered from an index without reading the table
+        """
+        with self.queries._connection() as connection:
+            for query, parameters in (
+                    (AGENT_STATS_QUERY.format(where=''), ()),
+                    (AGENT_STATS_QUERY.format(where=AGENT_WHERE), ('agent_0001',)),
+                    (CALLS_BETWEEN_QUERY, (0, 1)),
+                    (AGENT_CALLS_BETWEEN_QUERY, ('agent_0001', 0, 1)),
+                    (LAST_CALL_QUERY, (1,)),
+            ):
+                plan = [row[-1] for row in connection.execute('EXPLAIN QUERY PLAN ' + query, parameters)]
+                calls = [step for step in plan if 'CALLS' in step]
+                assert calls and all('COVERING INDEX' in step for step in calls), plan
+
+    def test_close(self):
+        """
+        Test closing wakes a thread waiting for a connection, and closes a connection in use when it comes back
+        """
+        queries = CallMetricsQueries(self.database, pool_size=1)
+        errors = []
+
+        def wait():
+            try:
+                queries.agent_stats()
+            except sqlite3.ProgrammingError as e:
+                errors.append(e)
+
+        with queries._connection() as connection:
+            waiter = threading.Thread(target=wait)
+            waiter.start()
+            while not queries._waiting:
+                time.sleep(0.001)
+            queries.close()
+            waiter.join(5)
+            assert not waiter.is_alive() and len(errors) == 1, errors
+            connection.execute('SELECT 1')
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute('SELECT 1')
+        with self.assertRaises(sqlite3.ProgrammingError):
+            queries.agent_stats()
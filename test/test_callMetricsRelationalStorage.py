@@ -1,9 +1,10 @@
 import datetime
 from unittest import TestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch, MagicMock
 
 from power_dialer.call_metrics.call_record import CallRecord
-from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage, INSERT_QUERY
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage, INSERT_QUERY, \
+    AGENT_INSERT_QUERY
 
 
 class TestCallMetricsRelationalStorage(TestCase):
@@ -21,7 +22,7 @@ class TestCallMetricsRelationalStorage(TestCase):
         connection.cursor = MagicMock()
         storage.save_call_record(connection, record)
 
-        connection.cursor().execute.assert_called_once_with(
-            INSERT_QUERY,
-            ('test_id', '(212) 555-0100', now.timestamp(), then.timestamp())
-        )
+        assert connection.cursor().execute.call_args_list == [
+            call(AGENT_INSERT_QUERY, ('test_id',)),
+            call(INSERT_QUERY, ('test_id', 2125550100, round(now.timestamp() * 1000), round(then.timestamp() * 1000)))
+        ], connection.cursor().execute.call_args_list
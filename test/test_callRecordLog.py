@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import shutil
+import sqlite3
+import tempfile
+from threading import Thread
+from unittest import TestCase
+
+from power_dialer.call_metrics.call_record import CallRecord
+from power_dialer.call_metrics.call_record_log import CallRecordLog
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage
+
+
+def make_records(count):
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    then = now + datetime.timedelta(seconds=60)
+    return [CallRecord(f'agent_{i:04d}', f'(212) 555-{i:04d}', now, then) for i in range(count)]
+
+
+class TestCallRecordLog(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'calls.log')
+        self.database = os.path.join(self.directory, 'calls.db')
+        # The relational storage is a singleton, give each test its own
+        self.storage_instance = CallMetricsRelationalStorage._instance
+        CallMetricsRelationalStorage._instance = None
+
+    def tearDown(self):
+        CallMetricsRelationalStorage._instance = self.storage_instance
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        """
+        Test synced records can be read back in order
+        """
+        log = CallRecordLog(self.path)
+        records = make_records(10)
+        log.append_many(records)
+        # Nothing is visible until it's synced
+        assert log.read(log.start) == ([], log.start)
+        log.sync()
+        result, offset = log.read(log.start, limit=4)
+        result2, _offset = log.read(offset)
+        assert result + result2 == records, (records, result + result2)
+        log.close()
+
+    def test_torn_tail(self):
+        """
+        Test a partial entry at the end is cut off on reopen
+        """
+        log = CallRecordLog(self.path)
+        log.append_many(make_records(3))
+        log.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00garbage')
+        log = CallRecordLog(self.path)
+        assert os.path.getsize(self.path) == size, (size, os.path.getsize(self.path))
+        records, _offset = log.read(log.start)
+        assert len(records) == 3, (3, len(records))
+        log.close()
+
+    def test_replay(self):
+        """
+        Test records logged but never committed are stored on the next start, and only once
+        """
+        log = CallRecordLog(self.path)
+        log.append_many(make_records(5))
+        # Crash before the storage thread ever ran
+        log.sync()
+        log._file.close()
+
+        log = CallRecordLog(self.path)
+        storage = CallMetricsRelationalStorage(None, self.database, log)
+        thread = Thread(target=storage.save_call_records)
+        thread.start()
+        log.append_many(make_records(2))
+        log.close()
+        thread.join(5)
+        assert not thread.is_alive()
+
+        # Nothing left to replay on the next start
+        log = CallRecordLog(self.path)
+        thread = Thread(target=storage.save_call_records)
+        storage.log = log
+        thread.start()
+        log.close()
+        thread.join(5)
+
+        connection = sqlite3.connect(self.database)
+        count, = connection.execute('SELECT COUNT(*) FROM CALL_RECORDS').fetchone()
+        connection.close()
+        assert count == 7, (7, count)
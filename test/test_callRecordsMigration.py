@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import datetime
+import os
+import sqlite3
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from power_dialer.call_metrics.call_metrics_queries import CallMetricsQueries
+from power_dialer.call_metrics.call_metrics_relational_storage import CallMetricsRelationalStorage, SCHEMA
+from power_dialer.call_metrics.call_record import CallRecord
+from power_dialer.call_metrics.call_records_migration import CallRecordsMigration, LEGACY_INSERT_QUERY, \
+    LEGACY_SCHEMA, LEGACY_TABLE, prepare_migration
+from power_dialer.phone_number import number_value
+
+START = datetime.datetime(2020, 6, 1, 12, 0, 0).timestamp()
+
+
+def legacy_rows(count: int):
+    return [(f'agent_{i % 7:04d}', f'(212) 555-{i:04d}', START + i + 0.25, START + i + 30.5) for i in range(count)]
+
+
+class TestCallRecordsMigration(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'metrics.db')
+        connection = sqlite3.connect(self.database)
+        connection.executescript(LEGACY_SCHEMA)
+        with connection:
+            connection.executemany(LEGACY_INSERT_QUERY, legacy_rows(100))
+        connection.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _storage(self) -> CallMetricsRelationalStorage:
+        instance, CallMetricsRelationalStorage._instance = CallMetricsRelationalStorage._instance, None
+        try:
+            return CallMetricsRelationalStorage(MagicMock(), self.database)
+        finally:
+            CallMetricsRelationalStorage._instance = instance
+
+    def test_chunks(self):
+        """
+        Test rows move a chunk per step, the view covers both tables throughout, and a new migration carries on
+        """
+        connection = sqlite3.connect(self.database, isolation_level=None)
+        connection.create_function('number_value', 1, number_value)
+        connection.executescript(SCHEMA)
+        assert prepare_migration(connection)
+        migration = CallRecordsMigration(self.database, chunk_size=40)
+        assert migration.step(connection) == 40
+        view = connection.execute('SELECT * FROM CALL_RECORDS ORDER BY call_start').fetchall()
+        assert view == legacy_rows(100), view[:2]
+        migration = CallRecordsMigration(self.database, chunk_size=40)
+        assert [migration.step(connection) for _ in range(3)] == [40, 20, 0]
+        assert migration.done.is_set() and migration.migrated == 60, migration.migrated
+        kinds = dict(connection.execute("SELECT name, type FROM sqlite_master WHERE name LIKE 'CALL%'"))
+        assert kinds['CALL_RECORDS'] == 'view' and LEGACY_TABLE not in kinds, kinds
+        assert connection.execute('SELECT * FROM CALL_RECORDS ORDER BY call_start').fetchall() == legacy_rows(100)
+        agents, = connection.execute('SELECT COUNT(*) FROM AGENTS').fetchone()
+        assert agents == 7, agents
+        connection.close()
+
+    def test_online(self):
+        """
+        Test the storage migrates an old database in the background while new calls are written and read
+        """
+        storage = self._storage()
+        assert storage.migration is not None
+        writer = sqlite3.connect(self.database, timeout=30)
+        started = datetime.datetime.fromtimestamp(START + 1000)
+        with writer:
+            storage.insert_records(writer, [CallRecord('agent_new', '(212) 555-9999', started, started)])
+        assert storage.migration.done.wait(10)
+        assert storage.migration.migrated == 100, storage.migration.migrated
+        count, = writer.execute('SELECT COUNT(*) FROM CALLS').fetchone()
+        assert count == 101, count
+        writer.close()
+        queries = CallMetricsQueries(self.database)
+        try:
+            last = queries.last_call_to('2125550042')
+            assert last.agent_id == 'agent_0000' and last.number == '(212) 555-0042', last
+            assert last.started.timestamp() == START + 42.25, last.started
+            assert len(queries.agent_stats()) == 8
+        finally:
+            queries.close()
+        assert self._storage().migration is None
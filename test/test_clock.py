@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import datetime
+import time
+from unittest import TestCase
+
+from power_dialer import clock
+from power_dialer.clock import CoarseClock, ManualClock, WallClock, create_clock
+from power_dialer.event_dedupe import EventDedupe
+
+
+class TestClock(TestCase):
+
+    def test_manual(self):
+        """
+        Test a manual clock only moves when told
+        """
+        manual = ManualClock(100)
+        manual.advance(2.5)
+        assert manual.now() == 102.5, manual.now()
+        manual.set(86400)
+        assert manual.utcnow() == datetime.datetime(1970, 1, 2), manual.utcnow()
+
+    def test_coarse(self):
+        """
+        Test a coarse clock stays still between ticks and keeps up with wall time
+        """
+        coarse = CoarseClock(0.01)
+        try:
+            assert coarse.now() == coarse.now()
+            assert coarse.utcnow() is coarse.utcnow()
+            time.sleep(0.05)
+            assert abs(coarse.now() - time.time()) < 0.05, (coarse.now(), time.time())
+        finally:
+            coarse.shutdown()
+
+    def test_create_clock(self):
+        """
+        Test clocks are built from their configuration
+        """
+        assert isinstance(create_clock('wall'), WallClock)
+        coarse = create_clock('coarse:0.5')
+        coarse.shutdown()
+        assert isinstance(coarse, CoarseClock) and coarse.resolution == 0.5, coarse
+        with self.assertRaises(ValueError):
+            create_clock('sundial')
+
+    def test_use_clock(self):
+        """
+        Test an installed clock is what every module sees
+        """
+        previous = clock.use_clock(ManualClock(1000))
+        try:
+            dedupe = EventDedupe(ttl=10)
+            assert not dedupe.seen('event-1')
+            clock.get_clock().advance(11)
+            assert not dedupe.seen('event-1')
+            assert clock.utcnow() == datetime.datetime(1970, 1, 1, 0, 16, 51), clock.utcnow()
+        finally:
+            clock.use_clock(previous)
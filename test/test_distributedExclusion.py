@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.exclusion.distributed_exclusion import DistributedExclusionStore
+from power_dialer.exclusion.exclusion_node import start_node_process
+from power_dialer.exclusion.hash_ring import HashRing
+from power_dialer.number_manager import NumberManager
+
+NUMBERS = [f'212555{i:04d}' for i in range(1000)]
+
+
+class TestHashRing(TestCase):
+
+    def test_adding_a_node_moves_a_share(self):
+        """
+        Test a new node only takes numbers from the others, and about its fair share
+        """
+        before = HashRing(['a:1', 'b:1', 'c:1'])
+        after = HashRing(['a:1', 'b:1', 'c:1', 'd:1'])
+        moved = [n for n in NUMBERS if before.node_for(n) != after.node_for(n)]
+        assert all(after.node_for(n) == 'd:1' for n in moved)
+        assert 100 < len(moved) < 400, len(moved)
+
+
+class TestDistributedExclusion(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.nodes = [start_node_process() for _ in range(4)]
+        cls.addresses = [address for _process, address in cls.nodes]
+
+    @classmethod
+    def tearDownClass(cls):
+        for process, _address in cls.nodes:
+            process.terminate()
+            process.join()
+
+    def setUp(self):
+        self.stores = [DistributedExclusionStore(self.addresses[:3]) for _ in range(2)]
+
+    def tearDown(self):
+        self.stores[0].expire(float('inf'))
+        for store in self.stores:
+            store.close()
+
+    def test_reserve_across_hosts(self):
+        """
+        Test a number reserved by one dialer host is excluded on another, in one round trip per batch
+        """
+        first, second = self.stores
+        assert first.reserve(NUMBERS[:600], 100, 60) == [True] * 600
+        reserved = second.reserve(NUMBERS[400:], 110, 60)
+        assert reserved == [False] * 200 + [True] * 400, reserved
+        assert first.round_trips == 1, (1, first.round_trips)
+        assert sum(first.size().values()) == 1000
+        # Outside the window it can be dialed again
+        assert second.reserve(NUMBERS[:1], 161, 60) == [True]
+
+    def test_duplicates_in_a_batch(self):
+        """
+        Test a batch with the same number twice only reserves it once
+        """
+        first, _second = self.stores
+        assert first.reserve(NUMBERS[:1] * 2, 100, 60) == [True, False]
+
+    def test_rebalance(self):
+        """
+        Test numbers stay excluded after a node joins and after one leaves
+        """
+        first, second = self.stores
+        first.reserve(NUMBERS, 100, 60)
+        first.set_members(self.addresses)
+        second.set_members(self.addresses)
+        sizes = first.size()
+        assert sum(sizes.values()) == 1000, sizes
+        assert sizes[self.addresses[3]] > 0, sizes
+        assert second.reserve(NUMBERS, 110, 60) == [False] * 1000
+
+        first.set_members(self.addresses[1:])
+        second.set_members(self.addresses[1:])
+        assert sum(first.size().values()) == 1000
+        assert second.reserve(NUMBERS, 120, 60) == [False] * 1000
+        first.set_members(self.addresses[:3])
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_number_manager(self, mock_number_maker):
+        """
+        Test the number manager reserves numbers in batches and skips ones another host dialed
+        """
+        first, second = self.stores
+        second.reserve(['2125550100'], 1e12, 60)
+        mock_number_maker.side_effect = ['(212) 555-0100', '(212) 555-0101', '(212) 555-0102']
+        client = NumberManager(5, synchronous=True)
+        client.exclusion, client.reserve_batch = first, 3
+        try:
+            numbers = [client.get_number(), client.get_number()]
+            assert numbers == ['(212) 555-0101', '(212) 555-0102'], numbers
+            assert first.round_trips == 1, (1, first.round_trips)
+            assert [client.CALL_QUEUE.get_nowait() for _ in numbers] == numbers
+        finally:
+            client.exclusion, client.reserve_batch = None, 8
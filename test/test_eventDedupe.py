@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.dialer_state_machine import AgentState
+from power_dialer.event_dedupe import EventDedupe
+from power_dialer.power_dialer import PowerDialer
+from power_dialer.power_dialer_interface import PowerDialerInterface
+
+
+class TestEventDedupe(TestCase):
+
+    def test_seen(self):
+        """
+        Test an id is a duplicate until its ttl passes
+        """
+        dedupe = EventDedupe(ttl=10)
+        assert not dedupe.seen('a', 100)
+        assert dedupe.seen('a', 105)
+        assert not dedupe.seen('b', 105)
+        assert not dedupe.seen('a', 110)
+        assert len(dedupe) == 2, (2, len(dedupe))
+
+    def test_fixed_memory(self):
+        """
+        Test each stripe is capped and forgets its oldest ids first
+        """
+        dedupe = EventDedupe(capacity=8, ttl=1000, stripes=2)
+        for i in range(100):
+            dedupe.seen(f'event-{i}', 0)
+        assert len(dedupe) == 8, (8, len(dedupe))
+        assert dedupe.evicted == 92, (92, dedupe.evicted)
+        assert dedupe.seen('event-99', 1)
+        assert not dedupe.seen('event-0', 1)
+
+    @patch('power_dialer.power_dialer.AgentStorage')
+    @patch('power_dialer.power_dialer.CallMetrics')
+    @patch('power_dialer.power_dialer.NumberManager')
+    def test_power_dialer_duplicates(self, number_manager, call_metrics, agent_storage):
+        """
+        Test a redelivered event doesn't run its handler, and the dials it would have made are counted
+        """
+        dedupe, PowerDialerInterface.dedupe = PowerDialerInterface.dedupe, EventDedupe()
+        try:
+            agent_storage.__getitem__.return_value = AgentState.busy
+            first = PowerDialer('test_id')
+            first.on_call_ended('(212) 555-0100', event_id='event-1')
+            assert len(first.numbers) == 2, first.numbers
+            agent_storage.__getitem__.return_value = AgentState.idle
+            second = PowerDialer('test_id')
+            second.on_call_ended('(212) 555-0100', event_id='event-1')
+            second.on_call_failed('(212) 555-0101', event_id='event-2')
+            second.on_call_failed('(212) 555-0101', event_id='event-2')
+            assert len(second.numbers) == 1, second.numbers
+            assert call_metrics.call_ended.call_count == 1
+            assert agent_storage.__setitem__.call_count == 2
+            assert PowerDialerInterface.dedupe.duplicates == 2
+            assert PowerDialerInterface.dedupe.dials_saved == 3
+        finally:
+            PowerDialerInterface.dedupe = dedupe
+
+    @patch('power_dialer.power_dialer.AgentStorage')
+    @patch('power_dialer.power_dialer.CallMetrics')
+    @patch('power_dialer.power_dialer.NumberManager')
+    def test_keyword_number(self, number_manager, call_metrics, agent_storage):
+        """
+        Test the number can be passed by keyword, and is deduplicated and handled the same
+        """
+        dedupe, PowerDialerInterface.dedupe = PowerDialerInterface.dedupe, EventDedupe()
+        try:
+            agent_storage.__getitem__.return_value = AgentState.idle
+            dialer = PowerDialer('test_id')
+            dialer.on_call_started(lead_phone_number='(212) 555-0100', event_id='event-1')
+            dialer.on_call_started(lead_phone_number='(212) 555-0100', event_id='event-1')
+            call_metrics.call_started.assert_called_once_with('test_id', '(212) 555-0100')
+            assert PowerDialerInterface.dedupe.duplicates == 1
+        finally:
+            PowerDialerInterface.dedupe = dedupe
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
+
+from power_dialer.dialer_state_machine import AgentState
+from power_dialer.event_log import EventRecorder, EventType, read_events
+from power_dialer.power_dialer import PowerDialer
+from power_dialer.power_dialer_interface import PowerDialerInterface
+from power_dialer.replay import replay
+
+
+class TestEventLog(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'events.log')
+
+    def tearDown(self):
+        PowerDialerInterface.recorder = None
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """
+        Test events come back as recorded, and a torn last record is dropped
+        """
+        recorder = EventRecorder(self.path)
+        recorder.record(EventType.agent_login, 'agent_0001', timestamp=100.0)
+        recorder.record(EventType.call_started, 'agent_0002', '(212) 555-0100', timestamp=101.5)
+        recorder.record(EventType.call_ended, 'agent_0001', '2125550101', timestamp=102.0)
+        recorder.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x03\x00\x00')
+        events = list(read_events(self.path))
+        assert [(e.timestamp, e.event_type, e.agent_id, e.number) for e in events] == [
+            (100.0, EventType.agent_login, 'agent_0001', None),
+            (101.5, EventType.call_started, 'agent_0002', '(212) 555-0100'),
+            (102.0, EventType.call_ended, 'agent_0001', '(212) 555-0101'),
+        ], events
+
+    @patch('power_dialer.power_dialer.NumberManager')
+    @patch('power_dialer.power_dialer.AgentStorage')
+    @patch('power_dialer.power_dialer.CallMetrics')
+    def test_record_and_replay(self, call_metrics, agent_storage, number_manager):
+        """
+        Test the dialer callbacks are recorded, and replaying them makes the same calls
+        """
+        agent_storage.__getitem__.return_value = AgentState.idle
+        PowerDialerInterface.recorder = EventRecorder(self.path)
+        PowerDialer('agent_0001').on_call_started('(212) 555-0100')
+        PowerDialer('agent_0001').on_call_ended('(212) 555-0100')
+        PowerDialerInterface.recorder.close()
+        PowerDialerInterface.recorder = None
+        events = list(read_events(self.path))
+        assert [e.event_type for e in events] == [EventType.call_started, EventType.call_ended], events
+
+        call_metrics.reset_mock()
+        factory = MagicMock(side_effect=PowerDialer)
+        stats = replay(events, factory)
+        assert stats.events == 2, (2, stats.events)
+        assert factory.call_count == 2
+        call_metrics.call_started.assert_called_once_with('agent_0001', '(212) 555-0100')
+        call_metrics.call_ended.assert_called_once_with('agent_0001', '(212) 555-0100')
+        assert set(stats.by_event) == {'on_call_started', 'on_call_ended'}
+
+    def test_paced_replay(self):
+        """
+        Test a paced replay keeps the recorded gaps, scaled by the speed
+        """
+        dialer = MagicMock()
+        events = [e._replace(timestamp=t) for e, t in zip(self._logins(3), (10.0, 10.2, 10.4))]
+        stats = replay(events, lambda agent_id: dialer, paced=True, speed=2.0)
+        assert 0.2 <= stats.elapsed < 0.5, stats.elapsed
+        assert dialer.on_agent_login.call_count == 3
+
+    def _logins(self, count):
+        recorder = EventRecorder(self.path)
+        for _ in range(count):
+            recorder.record(EventType.agent_login, 'agent_0001')
+        recorder.close()
+        return list(read_events(self.path))
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.failure_tracker import FailureTracker
+from power_dialer.number_manager import NumberManager
+
+
+class TestFailureTracker(TestCase):
+
+    def test_backoff(self):
+        """
+        Test a failed number is blocked until its backoff passes, and the backoff doubles
+        """
+        tracker = FailureTracker(base_delay=10)
+        tracker.record_failure('(212) 555-0100', '2125550100', 100)
+        assert tracker.is_blocked('2125550100', 105)
+        assert tracker.dials_saved == 1, (1, tracker.dials_saved)
+        assert tracker.due_retry(105) is None
+        assert tracker.due_retry(110) == '(212) 555-0100'
+        tracker.record_failure('(212) 555-0100', '2125550100', 110)
+        assert tracker.due_retry(125) is None
+        assert tracker.due_retry(130) == '(212) 555-0100'
+
+    def test_max_attempts(self):
+        """
+        Test a number that keeps failing is never retried
+        """
+        tracker = FailureTracker(base_delay=1, max_attempts=2)
+        tracker.record_failure('(212) 555-0100', '2125550100', 0)
+        tracker.record_failure('(212) 555-0100', '2125550100', 0)
+        assert tracker.due_retry(1e9) is None
+        assert tracker.is_blocked('2125550100', 1e9)
+        assert tracker.dead == 1, (1, tracker.dead)
+
+    def test_success_clears(self):
+        """
+        Test a number that connects is forgotten, its pending retry too
+        """
+        tracker = FailureTracker(base_delay=1)
+        tracker.record_failure('(212) 555-0100', '2125550100', 0)
+        tracker.record_success('2125550100')
+        assert not tracker.is_blocked('2125550100', 0)
+        assert tracker.due_retry(10) is None
+
+    def test_lru_eviction(self):
+        """
+        Test only the most recently failed numbers are kept
+        """
+        tracker = FailureTracker(capacity=2)
+        for normalized in ('1', '2', '1', '3'):
+            tracker.record_failure(normalized, normalized, 0)
+        assert len(tracker) == 2, (2, len(tracker))
+        assert tracker.is_blocked('1', 0)
+        assert not tracker.is_blocked('2', 0)
+        assert tracker.evicted == 1, (1, tracker.evicted)
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_get_number_skips_failed(self, mock_number_maker):
+        """
+        Test the number manager doesn't hand out a backed off number
+        """
+        mock_number_maker.side_effect = '(212) 555-0199', '(212) 555-0198'
+        client = NumberManager(5, synchronous=True)
+        failures = client.failures
+        client.failures = FailureTracker()
+        try:
+            client.record_failure('(212) 555-0199')
+            number = client.get_number()
+            assert number == '(212) 555-0198', ('(212) 555-0198', number)
+            assert client.failures.dials_saved == 1
+            assert client.CALL_QUEUE.get_nowait() == number
+        finally:
+            client.failures = failures
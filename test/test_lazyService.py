@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from power_dialer.lazy_service import LazyService, SERVICES
+
+
+class TestLazyService(TestCase):
+
+    def setUp(self):
+        self.service = None
+
+    def tearDown(self):
+        if self.service is not None:
+            SERVICES.remove(self.service)
+
+    def test_built_on_first_use(self):
+        """
+        Test the factory runs once, on first use, and the service is used through the proxy
+        """
+        factory = MagicMock()
+        self.service = LazyService('test', factory)
+        assert not factory.called
+        self.service.call_started('test_id', '(212) 555-0100')
+        self.service['test_id'] = 1
+        self.service.flush()
+        factory.assert_called_once_with()
+        factory().call_started.assert_called_once_with('test_id', '(212) 555-0100')
+        factory().__setitem__.assert_called_once_with('test_id', 1)
+
+    def test_shutdown_before_start(self):
+        """
+        Test shutting down a service that was never used doesn't build it
+        """
+        factory = MagicMock()
+        self.service = LazyService('test', factory)
+        self.service.shutdown()
+        assert not factory.called
+        self.service.start()
+        self.service.shutdown()
+        factory().shutdown.assert_called_once_with()
+
+    def test_import_starts_nothing(self):
+        """
+        Test importing the dialer doesn't start threads or touch the database
+        """
+        script = ('import sys, threading\n'
+                  'import power_dialer.power_dialer as dialer\n'
+                  'assert threading.active_count() == 1, threading.enumerate()\n'
+                  'assert not dialer.CallMetrics.started and not dialer.AgentStorage.started\n'
+                  'assert "sqlite3" not in sys.modules\n')
+        subprocess.run([sys.executable, '-c', script], check=True)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from power_dialer.leads.lead_source import LeadSource, LeadsExhausted
+from power_dialer.number_manager import NumberManager
+
+LEADS = """number,priority
+(212) 555-0100,2
+(212) 555-0101,1
+212.555.0100,1
+not a number,1
+(415) 555-0102,1
+(212) 555-0103,x
+"""
+
+
+class TestLeadSource(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'leads.csv')
+        with open(self.path, 'wt') as f:
+            f.write(LEADS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ingest(self):
+        """
+        Test rows are normalized, deduplicated and counted
+        """
+        source = LeadSource(1000, start_hour=0, end_hour=24)
+        stats = source.ingest(self.path, priority_column=1)
+        assert stats.rows == 6, (6, stats.rows)
+        assert stats.accepted == 3, (3, stats.accepted)
+        assert stats.duplicates == 1, (1, stats.duplicates)
+        assert stats.invalid == 2, (2, stats.invalid)
+        assert len(source) == 3, (3, len(source))
+        source.close()
+
+    def test_country_code(self):
+        """
+        Test numbers with a +1 country code are kept, as the same lead as without it
+        """
+        with open(self.path, 'at') as f:
+            f.write('+1 (646) 555-0104,1\n1-212-555-0101,1\n+1 (212) 555-01044,1\n+44 20 7946 0105,1\n')
+        source = LeadSource(1000, start_hour=0, end_hour=24)
+        stats = source.ingest(self.path, priority_column=1)
+        assert (stats.accepted, stats.duplicates, stats.invalid) == (4, 2, 4), stats
+        leads = [source.next_lead() for _ in range(4)]
+        assert leads == ['(212) 555-0101', '(415) 555-0102', '(646) 555-0104', '(212) 555-0100'], leads
+        source.close()
+
+    def test_priority_order(self):
+        """
+        Test leads come out lowest priority value first, then in file order
+        """
+        source = LeadSource(1000, start_hour=0, end_hour=24)
+        source.ingest(self.path, priority_column=1)
+        leads = [source.next_lead() for _ in range(3)]
+        assert leads == ['(212) 555-0101', '(415) 555-0102', '(212) 555-0100'], leads
+        with self.assertRaises(LeadsExhausted):
+            source.next_lead()
+        source.close()
+
+    def test_out_of_hours(self):
+        """
+        Test leads outside calling hours are held back rather than dialed
+        """
+        source = LeadSource(1000, start_hour=0, end_hour=0)
+        source.ingest(self.path)
+        with self.assertRaises(LeadsExhausted):
+            source.next_lead()
+        assert source.deferred == 4, (4, source.deferred)
+        # Still there for when the zone opens
+        assert len(source) == 4, (4, len(source))
+        source.start_hour, source.end_hour = 0, 24
+        source._callable_minute = None
+        assert source.next_lead() == '(212) 555-0100'
+        source.close()
+
+    def test_number_manager_uses_lead_source(self):
+        """
+        Test the number manager dials from the lead source, skipping recently called numbers
+        """
+        source = LeadSource(1000, start_hour=0, end_hour=24)
+        source.ingest(self.path)
+        client = NumberManager(5, synchronous=True)
+        client.calls['2125550100'] = float('inf')
+        client.lead_source = source
+        try:
+            assert client.get_number() == '(212) 555-0101'
+            # Don't leave it for other tests' listeners
+            assert client.CALL_QUEUE.get_nowait() == '(212) 555-0101'
+        finally:
+            client.lead_source = None
+            del client.calls['2125550100']
+            source.close()
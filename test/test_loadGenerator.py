@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import time
+from collections import Counter
+from unittest import TestCase
+
+from power_dialer.bounded_queue import BoundedQueue
+from power_dialer.event_log import EventType
+from power_dialer.load_generator import AgentPopulation, LoadGenerator, rate_steps
+
+
+class RecordingDialer:
+    """
+    Stands in for `PowerDialer`, notes its events and takes a fixed time over each
+    """
+    events = []
+    delay = 0.0
+
+    def __init__(self, agent_id):
+        self.agent_id = agent_id
+
+    def __getattr__(self, callback):
+        def handle(*args):
+            if RecordingDialer.delay:
+                time.sleep(RecordingDialer.delay)
+            RecordingDialer.events.append((self.agent_id, callback, args))
+        return handle
+
+
+class TestLoadGenerator(TestCase):
+
+    def setUp(self):
+        RecordingDialer.events = []
+        RecordingDialer.delay = 0.0
+
+    def test_population(self):
+        """
+        Test every agent's events follow the state machine: log in first, and only end the call they started
+        """
+        population = AgentPopulation(5, call_fail=0.3, seed=1)
+        started = {}
+        seen = set()
+        for _ in range(2000):
+            agent_id, event_type, number = population.next_event()
+            if agent_id not in seen:
+                assert event_type is EventType.agent_login, event_type
+                seen.add(agent_id)
+            if event_type is EventType.call_started:
+                started[agent_id] = number
+            elif event_type is EventType.call_ended:
+                assert started.pop(agent_id) == number
+        assert seen == set(population.agent_ids)
+
+    def test_step(self):
+        """
+        Test a step offers about the rate asked for, every event is handled and its latency and queue depths kept
+        """
+        queue = BoundedQueue(name='watched')
+        queue.put(1)
+        generator = LoadGenerator(RecordingDialer, AgentPopulation(10, seed=2), workers=2, queues=[queue],
+                                  poisson=False, seed=2)
+        try:
+            step = generator.run_step(500, 0.2)
+        finally:
+            generator.shutdown()
+        assert step.offered == 100, step
+        assert step.completed == step.offered == len(RecordingDialer.events), step
+        assert step.errors == 0 and step.dropped == 0, step
+        assert step.queue_depths == {'watched': 1}, step.queue_depths
+        assert not step.saturated, step
+        callbacks = Counter(callback for _, callback, _ in RecordingDialer.events)
+        assert callbacks['on_agent_login'] >= 1, callbacks
+
+    def test_saturation(self):
+        """
+        Test arrivals keep coming when the workers can't keep up, the latency includes the wait, and the run stops
+        after the saturated steps
+        """
+        RecordingDialer.delay = 0.005
+        generator = LoadGenerator(RecordingDialer, AgentPopulation(10, seed=3), workers=1, poisson=False, seed=3)
+        try:
+            steps = generator.run(rate_steps(50, 450, 5), 0.2, stop_after=2)
+        finally:
+            generator.shutdown()
+        assert [step.rate for step in steps] == [50, 500, 950], [step.rate for step in steps]
+        assert not steps[0].saturated and steps[1].saturated and steps[2].saturated, [s.report() for s in steps]
+        assert steps[2].offered > 150, steps[2]
+        assert steps[2].backlog > 10, steps[2]
+        # The last event waited for everything before it
+        assert steps[2].percentiles()[99.9] > 0.1, steps[2].percentiles()
+        summary = steps[2].summary()
+        assert summary['rate'] == 950 and set(summary['percentiles']) == {'50', '99', '99.9'}, summary
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer import clock
+from power_dialer.bounded_queue import BoundedQueue, OverflowPolicy
+from power_dialer.call_metrics.call_metrics_handler import CallMetricsHandler
+from power_dialer.clock import ManualClock
+from power_dialer.dialer_state_machine import AgentState
+from power_dialer.memory_budget import DictCache, MemoryAccountant, QueueCache, parse_size
+from power_dialer.number_manager import NumberManager
+from power_dialer.power_dialer import DialerNumbers
+
+
+class TestMemoryBudget(TestCase):
+
+    def test_parse_size(self):
+        """
+        Test budgets are read as bytes with optional binary suffixes
+        """
+        assert parse_size('0') == 0
+        assert parse_size('1500') == 1500
+        assert parse_size('64k') == 64 * 1024
+        assert parse_size('1.5M') == 1536 * 1024
+        assert parse_size('2GB') == 2 * 2 ** 30
+
+    def test_dict_cache(self):
+        """
+        Test a dict reports its entries and sheds the oldest, skipping entries it mustn't lose
+        """
+        owner = SimpleNamespace(agents={f'agent_{i}': AgentState.idle if i % 2 else AgentState.offline
+                                        for i in range(10)})
+        cache = DictCache('agents', owner, 'agents', sheddable=lambda agent_id, state: state is AgentState.offline)
+        usage = cache.usage()
+        assert usage.entries == 10 and usage.nbytes > 0, usage
+        assert cache.shed(1) == 1
+        assert 'agent_0' not in owner.agents and 'agent_1' in owner.agents
+        assert cache.shed(10 ** 6) == 4
+        assert all(state is AgentState.idle for state in owner.agents.values()), owner.agents
+
+    def test_enforce(self):
+        """
+        Test nothing is shed under budget, and over it the lowest priority goes first until back under the target
+        """
+        cheap = SimpleNamespace(entries={i: f'number {i}' for i in range(1000)})
+        precious = SimpleNamespace(entries={i: f'number {i}' for i in range(1000)})
+        accountant = MemoryAccountant(budget=0)
+        accountant.register(DictCache('precious', precious, 'entries', priority=3))
+        accountant.register(DictCache('cheap', cheap, 'entries'))
+        total = accountant.total()
+        assert accountant.enforce() == []
+        accountant.budget = total * 10
+        assert accountant.enforce() == []
+
+        events = []
+        accountant.subscribe(events.append)
+        accountant.budget = int(total * 0.75)
+        shed = accountant.enforce()
+        assert [event.cache for event in shed] == ['cheap'], shed
+        assert events == shed and list(accountant.events) == shed
+        assert len(precious.entries) == 1000 and 0 < len(cheap.entries) < 1000, len(cheap.entries)
+        assert accountant.total() <= accountant.budget, (accountant.total(), accountant.budget)
+        # The oldest went
+        assert 999 in cheap.entries and 0 not in cheap.entries
+
+    def test_queue_cache(self):
+        """
+        Test a spilling queue sheds by paging out to disk without losing anything
+        """
+        queue = BoundedQueue(0, OverflowPolicy.spill, name='test_queue')
+        for i in range(100):
+            queue.put(('agent', f'(212) 555-{i:04d}'))
+        cache = QueueCache(queue)
+        before = cache.usage()
+        assert before.entries == 100, before
+        paged = cache.shed(before.nbytes // 2)
+        assert 0 < paged < 100, paged
+        assert cache.usage().entries == 100 - paged
+        assert [queue.get()[1] for _ in range(100)] == [f'(212) 555-{i:04d}' for i in range(100)]
+        queue.close()
+
+    def test_dialer_numbers(self):
+        """
+        Test live dialers' numbers are counted and trimmed to what their last event dialed
+        """
+        numbers = DialerNumbers()
+        # SimpleNamespace can't be weakly referenced
+        dialer = type('Dialer', (), {})()
+        dialer.numbers = [f'(212) 555-{i:04d}' for i in range(5)]
+        dialer._dial_ratio = 2
+        numbers.dialers.add(dialer)
+        assert numbers.usage().entries == 5
+        assert numbers.shed(1) == 3
+        assert dialer.numbers == ['(212) 555-0003', '(212) 555-0004'], dialer.numbers
+        del dialer
+        assert numbers.usage().entries == 0
+
+    def test_shed_call_ends_quietly(self):
+        """
+        Test a call shed while in progress is skipped when it ends rather than raising
+        """
+        instance, CallMetricsHandler._instance = CallMetricsHandler._instance, None
+        try:
+            handler = CallMetricsHandler(':memory:', synchronous=True)
+            handler.call_started('agent_0300', '(212) 555-0300')
+            DictCache('calls_in_progress', handler, '_volatile').shed(10 ** 6)
+            handler.call_ended('agent_0300', '(212) 555-0300')
+            assert handler._storage_queue.qsize() == 0
+        finally:
+            CallMetricsHandler._instance = instance
+
+    def test_live_exclusions_kept(self):
+        """
+        Test shedding recent calls only forgets calls already past every window, however far over budget
+        """
+        previous = clock.use_clock(ManualClock(10000))
+        instance, NumberManager._instance = NumberManager._instance, None
+        try:
+            caches = []
+            with patch('power_dialer.number_manager.account', caches.append):
+                client = NumberManager(300, synchronous=True)
+            client.add_campaign('renewals', 600)
+            client.warm_cache({'(212) 555-0400': 9500, '(212) 555-0401': 9450}, campaign='renewals')
+            client.warm_cache({'(212) 555-0402': 9990})
+            # Dialed in place, after the others in time but first in the dict
+            client.calls['2125550400'] = 9999
+            clock.get_clock().advance(100)
+            accountant = MemoryAccountant(budget=1)
+            for cache in caches:
+                if cache.name in ('recent_calls', 'campaign_members'):
+                    accountant.register(cache)
+            shed = accountant.enforce()
+            assert sorted(client.calls) == ['2125550400', '2125550402'], client.calls
+            assert list(client.campaign_members) == ['2125550400'], client.campaign_members
+            assert [event.entries for event in shed] == [1, 1], shed
+            assert client._excluded('2125550400', clock.now(), client.campaigns['renewals'])
+            assert client._excluded('2125550402', clock.now(), None)
+        finally:
+            NumberManager._instance = instance
+            clock.use_clock(previous)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+from unittest import TestCase
+
+from power_dialer.agent_storage.agent_storage import create_agent_storage_backend
+from power_dialer.agent_storage.mmap_agent_storage import MmapAgentStorage
+from power_dialer.dialer_state_machine import AgentState
+
+
+class TestMmapAgentStorage(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'agents.map')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_set(self):
+        """
+        Test states are stored in place and unknown agents are offline
+        """
+        storage = MmapAgentStorage(self.path)
+        try:
+            assert storage['test_id'] is AgentState.offline
+            storage['test_id'] = AgentState.idle
+            storage['test_id'] = AgentState.busy
+            assert storage['test_id'] is AgentState.busy, storage['test_id']
+            assert storage.get_many(['test_id', 'test_id2']) == [AgentState.busy, AgentState.offline]
+            assert storage.last_transition('test_id') is not None
+            assert storage.last_transition('test_id2') is None
+            storage.flush()
+            assert storage['test_id'] is AgentState.offline and len(storage) == 0
+        finally:
+            storage.close()
+
+    def test_reopen(self):
+        """
+        Test a restarted process reads back every state and when it last changed
+        """
+        storage = MmapAgentStorage(self.path, slots=4)
+        storage.set_many({f'agent_{i}': AgentState.idle for i in range(10)})
+        storage['agent_3'] = AgentState.busy
+        changed = storage.last_transition('agent_3')
+        storage['agent_3'] = AgentState.busy
+        assert storage.last_transition('agent_3') == changed
+        assert storage.capacity == 16, storage.capacity
+        storage.close()
+
+        storage = MmapAgentStorage(self.path, slots=4)
+        try:
+            assert storage.capacity == 16, storage.capacity
+            assert storage['agent_3'] is AgentState.busy
+            assert storage.get_many(['agent_0', 'agent_9']) == [AgentState.idle] * 2
+            assert storage.last_transition('agent_3') == changed
+        finally:
+            storage.close()
+
+    def test_torn_names(self):
+        """
+        Test an agent id cut off by a crash is dropped, and an agent interned without a state reads as offline
+        """
+        storage = MmapAgentStorage(self.path)
+        storage['agent_0'] = AgentState.idle
+        storage._intern('agent_1')
+        storage.close()
+        with open(self.path + '.agents', 'ab') as f:
+            f.write(b'agent_')
+        storage = MmapAgentStorage(self.path)
+        try:
+            assert storage.agents() == ['agent_0', 'agent_1'], storage.agents()
+            assert storage['agent_1'] is AgentState.offline
+            storage['agent_2'] = AgentState.idle
+            assert storage['agent_2'] is AgentState.idle
+        finally:
+            storage.close()
+        with open(self.path + '.agents', 'rb') as f:
+            assert f.read() == b'agent_0\nagent_1\nagent_2\n'
+
+    def test_url(self):
+        """
+        Test mmap:// URLs build the backend
+        """
+        storage = create_agent_storage_backend('mmap://' + self.path)
+        try:
+            assert isinstance(storage, MmapAgentStorage) and storage.path == self.path, storage
+        finally:
+            storage.close()
@@ -2,8 +2,11 @@
 import time
 import random
 from unittest import TestCase
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
+from power_dialer import clock
+from power_dialer.clock import ManualClock
+from power_dialer.exclusion.memory_exclusion import MemoryExclusionStore
 from power_dialer.number_manager import NumberManager
 from power_dialer.services import get_lead_phone_number_to_dial
 
@@ -65,20 +68,20 @@ class TestNumberManager(TestCase):
         times = [now - v for v in client.calls.values()]
         assert all(t <= 5 for t in times), (times, )
 
-    @patch('power_dialer.number_manager.time')
-    def test_number_listener(self, mock_time):
+    def test_number_listener(self):
         """
         Test the listener
         """
-        mock_time.time = MagicMock()
-        mock_time.time.return_value = 5
-
-        client = NumberManager(5, synchronous=True)
-        client.CALL_QUEUE.put('(212) 555-0100')
-        client.CALL_QUEUE.put(None)
-        client.number_listener()
-        assert '2125550100' in client.calls
-        assert client.calls['2125550100'] == 5
+        previous = clock.use_clock(ManualClock(5))
+        try:
+            client = NumberManager(5, synchronous=True)
+            client.CALL_QUEUE.put('(212) 555-0100')
+            client.CALL_QUEUE.put(None)
+            client.number_listener()
+            assert '2125550100' in client.calls
+            assert client.calls['2125550100'] == 5
+        finally:
+            clock.use_clock(previous)
 
     @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
     def test_get_number(self, mock_number_maker):
@@ -98,3 +101,84 @@ class TestNumberManager(TestCase):
         number = client.get_number()
         # The duplicate should be ignored, and we should get the next unique number
         assert number == '(212) 555-0101', ('(212) 555-0101', number)
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_campaigns(self, mock_number_maker):
+        """
+        Test each campaign excludes the numbers it dialed for its own window, from one shared entry per number
+        """
+        previous = clock.use_clock(ManualClock(1000))
+        instance, NumberManager._instance = NumberManager._instance, None
+        try:
+            client = NumberManager(5, synchronous=True)
+            client.add_campaign('short', 10)
+            client.add_campaign('long', 100)
+            client.warm_cache({'(212) 555-0400': 950}, campaign='short')
+            assert client.campaign_members == {'2125550400': 1}, client.campaign_members
+
+            # Another campaign hasn't dialed it
+            mock_number_maker.side_effect = '(212) 555-0400',
+            assert client.get_number('long') == '(212) 555-0400'
+            client.CALL_QUEUE.put(None)
+            client.number_listener()
+            assert client.calls == {'2125550400': 1000} and client.campaign_members == {'2125550400': 3}
+
+            mock_number_maker.side_effect = '(212) 555-0400', '(212) 555-0401'
+            assert client.get_number('long') == '(212) 555-0401'
+            clock.get_clock().advance(50)
+            mock_number_maker.side_effect = '(212) 555-0400', '(212) 555-0402'
+            assert client.get_number('short') == '(212) 555-0400'
+            mock_number_maker.side_effect = '(212) 555-0400', '(212) 555-0403'
+            assert client.get_number('long') == '(212) 555-0403'
+            # Masks are shared rather than one int per number
+            assert client.campaign_members['2125550401'] is client.campaign_members['2125550403']
+            with self.assertRaises(ValueError):
+                client.get_number('unknown')
+
+            # Dialed without a campaign, every campaign counts it
+            client.warm_cache({'(212) 555-0404': clock.now() - 1})
+            mock_number_maker.side_effect = '(212) 555-0404', '(212) 555-0405'
+            assert client.get_number('short') == '(212) 555-0405'
+            mock_number_maker.side_effect = '(212) 555-0401',
+            assert client.get_number() == '(212) 555-0401'
+            client.CALL_QUEUE.put(None)
+            client.number_listener()
+            assert '2125550401' not in client.campaign_members, client.campaign_members
+            mock_number_maker.side_effect = '(212) 555-0401', '(212) 555-0406'
+            assert client.get_number('short') == '(212) 555-0406'
+
+            # Kept for the longest window
+            client.CALL_QUEUE.put(None)
+            client.number_listener()
+            clock.get_clock().advance(60)
+            client.expire_entries()
+            assert '2125550400' in client.calls
+            clock.get_clock().advance(100)
+            client.expire_entries()
+            assert client.calls == {} and client.campaign_members == {}, client.campaign_members
+        finally:
+            NumberManager._instance = instance
+            clock.use_clock(previous)
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_retry_recorded(self, mock_number_maker):
+        """
+        Test a failure retry handed out with an exclusion store is recorded in the store, singly and in a batch
+        """
+        previous = clock.use_clock(ManualClock(1000))
+        instance, NumberManager._instance = NumberManager._instance, None
+        try:
+            client = NumberManager(5, synchronous=True)
+            exclusion = client.exclusion = MemoryExclusionStore()
+            client.reserve_batch = 1
+            client.record_failure('(212) 555-0500')
+            client.record_failure('(212) 555-0501')
+            clock.get_clock().advance(client.failures.base_delay)
+            now = clock.now()
+            assert client.get_number() == '(212) 555-0500'
+            mock_number_maker.side_effect = '(212) 555-0502',
+            assert client.get_numbers(2) == ['(212) 555-0501', '(212) 555-0502']
+            assert exclusion.reserve(['2125550500', '2125550501', '2125550502'], now, 60) == [False] * 3
+        finally:
+            NumberManager._instance = instance
+            clock.use_clock(previous)
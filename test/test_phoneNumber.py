@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import pickle
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.call_metrics.call_metrics_handler import CallMetricsHandler
+from power_dialer.phone_number import PhoneNumber, normalize_number, number_value, parse_numbers
+
+
+class TestPhoneNumber(TestCase):
+
+    def test_parse(self):
+        """
+        Test a number is parsed once into its digits and value, and the same text gets the same object
+        """
+        number = PhoneNumber.parse('(212) 555-0500')
+        assert (number.text, number.digits, number.value) == ('(212) 555-0500', '2125550500', 2125550500), number
+        assert PhoneNumber.parse('(212) 555-0500') is number
+        assert PhoneNumber.parse(number) is number
+        assert normalize_number(number) == '2125550500' and number_value(number) == 2125550500
+        assert PhoneNumber.from_value(2125550500) is number
+        empty = PhoneNumber.parse('ext.')
+        assert (empty.digits, empty.value) == ('', 0), empty
+
+    def test_normalize_text(self):
+        """
+        Test text is normalized to ASCII digits only, as it always was
+        """
+        for text in ('(212) 555-0501', '212.555.0501', '+1 212 555 0501', '２１２555０501', '212-555-0501 ☎'):
+            assert normalize_number(text) == ''.join(c for c in text if c in '0123456789'), text
+
+    def test_stands_in_for_text(self):
+        """
+        Test a parsed number compares, hashes, formats and pickles as its text
+        """
+        number = PhoneNumber.parse('(212) 555-0502')
+        assert number == '(212) 555-0502' and '(212) 555-0502' == number and number != '2125550502'
+        assert {'(212) 555-0502': 1}[number] == 1 and {number: 1}['(212) 555-0502'] == 1
+        assert f'{number}' == '(212) 555-0502' and '%s' % number == '(212) 555-0502'
+        assert pickle.loads(pickle.dumps(number)) is number
+
+    def test_parse_numbers(self):
+        """
+        Test the bulk parser interns like `parse`
+        """
+        numbers = parse_numbers(['(212) 555-0503', '2125550504', '(212) 555-0503'])
+        assert [number.value for number in numbers] == [2125550503, 2125550504, 2125550503], numbers
+        assert numbers[0] is numbers[2] is PhoneNumber.parse('(212) 555-0503')
+
+    def test_intern_limit(self):
+        """
+        Test the table starts over when full, and numbers already handed out still work
+        """
+        first = PhoneNumber.parse('(212) 555-0505')
+        with patch('power_dialer.phone_number.INTERN_SIZE', len(PhoneNumber._interned)):
+            second = PhoneNumber.parse('(212) 555-0506')
+        assert len(PhoneNumber._interned) == 1, len(PhoneNumber._interned)
+        assert PhoneNumber.parse('(212) 555-0505') == first and second.value == 2125550506
+
+    def test_passed_through(self):
+        """
+        Test a number is parsed at the callback and reaches call metrics as the same object
+        """
+        instance, CallMetricsHandler._instance = CallMetricsHandler._instance, None
+        try:
+            handler = CallMetricsHandler(':memory:', synchronous=True)
+            with patch('power_dialer.power_dialer.CallMetrics', handler), \
+                    patch('power_dialer.power_dialer.AgentStorage', {}):
+                from power_dialer.dialer_state_machine import AgentState
+                from power_dialer.power_dialer import PowerDialer
+                dialer = PowerDialer('agent_0507', state=AgentState.idle)
+                dialer.on_call_started('(212) 555-0507')
+            assert handler._volatile['agent_0507'].number is PhoneNumber.parse('(212) 555-0507')
+        finally:
+            CallMetricsHandler._instance = instance
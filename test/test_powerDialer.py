@@ -77,3 +77,15 @@ class TestPowerDialer(TestCase):
         call_metrics.call_ended.assert_called_once_with('test_id', '(212) 555-0100')
         # Agent is idle, we should be starting two calls
         assert len(pd.numbers) == 2, (2, len(pd.numbers))
+
+    @patch('power_dialer.power_dialer.AgentStorage')
+    @patch('power_dialer.power_dialer.CallMetrics')
+    def test_on_call_failed_bad_number(self, call_metrics, agent_storage):
+        """
+        Test a callback given something that isn't a number logs it and still saves the agent, rather than raising
+        """
+        agent_storage.__getitem__.return_value = AgentState.busy
+        pd = PowerDialer('test_id')
+        with self.assertLogs('power_dialer.power_dialer', 'ERROR'):
+            pd.on_call_failed(None)
+        agent_storage.__setitem__.assert_called_once_with('test_id', AgentState.busy)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from power_dialer.agent_storage.agent_storage import create_agent_storage_backend
+from power_dialer.agent_storage.agent_storage_handler import AgentStorageHandler
+from power_dialer.agent_storage.redis_agent_storage import RedisAgentStorage
+from power_dialer.dialer_state_machine import AgentState
+from test.redis_stand_in import RedisStandIn
+
+
+class TestRedisAgentStorage(TestCase):
+
+    def setUp(self):
+        self.server = RedisStandIn()
+        self.storage = create_agent_storage_backend(self.server.url)
+
+    def tearDown(self):
+        self.storage.pool.close()
+        self.server.stop()
+
+    def test_backend_selection(self):
+        """
+        Test the URL scheme picks the backend
+        """
+        assert isinstance(self.storage, RedisAgentStorage)
+        assert isinstance(create_agent_storage_backend('memory://'), AgentStorageHandler)
+        with self.assertRaises(ValueError):
+            create_agent_storage_backend('carrier-pigeon://')
+
+    def test_get_set(self):
+        """
+        Test a state round trips and missing agents are offline
+        """
+        self.storage['test_id'] = AgentState.busy
+        assert self.storage['test_id'] is AgentState.busy
+        assert self.storage['test_id2'] is AgentState.offline
+        # Stored as a single byte
+        assert self.server.hashes[b'power_dialer:agents'][b'test_id'] == b'%d' % AgentState.busy.value
+
+    def test_bulk_is_one_round_trip(self):
+        """
+        Test bulk reads and writes pipeline into a single round trip however big they are
+        """
+        states = {f'agent_{i:04d}': AgentState.idle for i in range(2000)}
+        self.storage.set_many(states)
+        assert self.storage.pool.round_trips == 1, (1, self.storage.pool.round_trips)
+        result = self.storage.get_many(list(states) + ['missing'])
+        assert self.storage.pool.round_trips == 2, (2, self.storage.pool.round_trips)
+        assert result == [AgentState.idle] * 2000 + [AgentState.offline]
+
+    def test_flush(self):
+        """
+        Test flushing forgets every agent
+        """
+        self.storage['test_id'] = AgentState.idle
+        self.storage.flush()
+        assert self.storage['test_id'] is AgentState.offline
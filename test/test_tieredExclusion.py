@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from power_dialer.exclusion.tiered_exclusion import TieredExclusionStore
+from power_dialer.number_manager import NumberManager
+
+DAY = 86400
+NUMBERS = [f'212555{i:04d}' for i in range(1000)]
+
+
+class TestTieredExclusion(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = TieredExclusionStore(os.path.join(self.directory.name, 'exclusion.db'), hot_seconds=60)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_demote_and_screen(self):
+        """
+        Test old reservations move to disk in a batch and are still excluded, with one query per batch
+        """
+        store = self.store
+        assert store.reserve(NUMBERS[:100], 0, 30 * DAY) == [True] * 100
+        assert store.reserve(NUMBERS[100:101], 120, 30 * DAY) == [True]
+        assert len(store.hot) == 1 and store.cold_size() == 100, (len(store.hot), store.cold_size())
+        queries = store.cold_queries
+        reserved = store.reserve(NUMBERS[50:150], 10 * DAY, 30 * DAY)
+        assert reserved == [False] * 51 + [True] * 49, reserved
+        assert store.cold_queries == queries + 1
+        rates = store.hit_rates()
+        assert store.cold_hits == 50 and store.hot_hits == 1, (store.cold_hits, store.hot_hits)
+        assert abs(sum(rates.values()) - 1) < 1e-9, rates
+
+    def test_expire(self):
+        """
+        Test numbers past the window can be dialed again and leave both tiers
+        """
+        store = self.store
+        store.reserve(NUMBERS[:10], 0, DAY)
+        store.demote(0)
+        store.reserve(NUMBERS[10:20], DAY, DAY)
+        assert store.reserve(NUMBERS[:1], DAY + 1, DAY) == [True]
+        store.expire(DAY)
+        assert store.cold_size() == 0 and len(store.hot) == 1, (store.cold_size(), len(store.hot))
+
+    def test_hot_capacity(self):
+        """
+        Test a full hot tier demotes its older half
+        """
+        store = self.store
+        store.hot_capacity = 10
+        for i in range(11):
+            store.reserve(NUMBERS[i:i + 1], i, DAY)
+        assert len(store.hot) == 5 and store.cold_size() == 6, (len(store.hot), store.cold_size())
+        assert store.reserve(NUMBERS[:11], 20, DAY) == [False] * 11
+
+    @patch('power_dialer.number_manager.get_lead_phone_number_to_dial')
+    def test_number_manager(self, mock_number_maker):
+        """
+        Test the number manager screens leads against the cold tier and times get_number
+        """
+        now = time.time()
+        self.store.reserve(['2125550300'], now, DAY)
+        self.store.demote(now)
+        queries = self.store.cold_queries
+        mock_number_maker.side_effect = ['(212) 555-0300', '(212) 555-0301', '(212) 555-0302']
+        client = NumberManager(5, synchronous=True)
+        client.exclusion, client.reserve_batch = self.store, 3
+        try:
+            numbers = [client.get_number(), client.get_number()]
+            assert numbers == ['(212) 555-0301', '(212) 555-0302'], numbers
+            assert self.store.cold_hits == 1 and self.store.cold_queries == queries + 1
+            queued = []
+            while not client.CALL_QUEUE.empty():
+                queued.append(client.CALL_QUEUE.get_nowait())
+            assert queued[-2:] == numbers, queued
+            assert client.latency_percentiles()[50] > 0
+        finally:
+            client.exclusion, client.reserve_batch = None, 8